@@ -0,0 +1,205 @@
+"""Load time, file size and memory of JSON and binary keyframe files.
+
+Converts animations to the binary keyframe format and loads both versions
+with ``KeyFrameAnimation.from_path``. Without paths a synthetic dance shaped
+like the editor's output is generated, every keyframe setting every servo.
+Memory is measured with tracemalloc as the peak heap growth while loading
+one animation and the heap each animation still holds once loaded.
+
+Usage:
+    python -m benchmarks.keyframes --output keyframes.json
+    python -m benchmarks.keyframes animations/test.json animations/dances_open
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from diorama.animation import KeyFrameAnimation
+from diorama.keyframes import KeyframeData, keyframes_path, write_keyframes
+from diorama.validation import find_animations
+
+PERCENTILES = (50, 90, 99)
+
+
+def measure(function: Callable[[], Any], runs: int) -> Dict[str, Any]:
+    """Call ``function`` ``runs`` times and summarize the latencies."""
+    latencies = np.empty(runs)
+    for idx in range(runs):
+        start = time.perf_counter()
+        function()
+        latencies[idx] = time.perf_counter() - start
+    return {
+        "runs": runs,
+        "latency_ms": {
+            **{
+                f"p{percentile}": float(np.percentile(latencies, percentile)) * 1e3
+                for percentile in PERCENTILES
+            },
+            "max": float(latencies.max()) * 1e3,
+            "mean": float(latencies.mean()) * 1e3,
+        },
+    }
+
+
+def measure_memory(function: Callable[[], Any], copies: int) -> Dict[str, float]:
+    """Heap bytes per result of ``function``, while loading and once loaded."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        results: List[Any] = []
+        load_peak = 0
+        for _ in range(copies):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            results.append(function())
+            load_peak = max(load_peak, tracemalloc.get_traced_memory()[1] - before)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "retained_bytes": retained / copies,
+        "peak_bytes": float(load_peak),
+    }
+
+
+def synthetic_dance(channels: int, keyframes: int, fps: int = 10) -> Dict[str, Any]:
+    """Editor JSON with every keyframe setting every channel."""
+    rng = np.random.default_rng(0)
+    names = [f"Servo {idx}: Figur {idx % 7}" for idx in range(channels)]
+    spacing = 5
+    return {
+        "keyframes": [
+            {
+                "frameIndex": idx * spacing,
+                "values": {
+                    name: int(value)
+                    for name, value in zip(names, rng.integers(0, 181, channels))
+                },
+            }
+            for idx in range(keyframes)
+        ],
+        "config": {
+            "totalFrames": keyframes * spacing,
+            "fps": fps,
+            "currentFrameIndex": 0,
+        },
+    }
+
+
+def benchmark_file(file_path: str, runs: int, copies: int) -> Dict[str, Any]:
+    """Convert one JSON animation and compare loading both formats."""
+    with open(file_path) as f:
+        data = KeyframeData.from_json(json.load(f))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        binary_path = keyframes_path(os.path.join(tmp_dir, os.path.basename(file_path)))
+        write_keyframes(binary_path, data)
+        result = {
+            "channels": len(data.channels),
+            "keyframes": len(data.frame_indices),
+            "file_bytes": {
+                "json": os.path.getsize(file_path),
+                "binary": os.path.getsize(binary_path),
+            },
+            "load": {
+                "json": measure(lambda: KeyFrameAnimation.from_path(file_path), runs),
+                "binary": measure(
+                    lambda: KeyFrameAnimation.from_path(binary_path), runs
+                ),
+            },
+            "memory": {
+                "json": measure_memory(
+                    lambda: KeyFrameAnimation.from_path(file_path), copies
+                ),
+                "binary": measure_memory(
+                    lambda: KeyFrameAnimation.from_path(binary_path), copies
+                ),
+            },
+        }
+    result["load_speedup"] = (
+        result["load"]["json"]["latency_ms"]["mean"]
+        / result["load"]["binary"]["latency_ms"]["mean"]
+    )
+    return result
+
+
+def main() -> int:
+    """Run the keyframe format benchmark and print or write the results."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark JSON against binary keyframe files."
+    )
+    parser.add_argument(
+        "paths", nargs="*", help="JSON animations or folders (default: synthetic)"
+    )
+    parser.add_argument("--channels", type=int, default=24)
+    parser.add_argument("--keyframes", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=200, help="Loads per format")
+    parser.add_argument(
+        "--copies", type=int, default=20, help="Animations kept for memory"
+    )
+    parser.add_argument("--output", type=str, help="Write results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = [
+            file_path
+            for file_path in find_animations(args.paths)
+            if file_path.endswith(".json")
+        ]
+        if not files:
+            synthetic = os.path.join(tmp_dir, "synthetic.json")
+            with open(synthetic, "w") as f:
+                json.dump(synthetic_dance(args.channels, args.keyframes), f, indent=4)
+            files = [synthetic]
+        for file_path in files:
+            results[file_path] = benchmark_file(file_path, args.runs, args.copies)
+
+    for file_path, result in results.items():
+        sizes, memory = result["file_bytes"], result["memory"]
+        print(
+            f"{os.path.basename(file_path)}: {result['channels']} channels, "
+            f"{result['keyframes']} keyframes"
+        )
+        print(f"  size     json={sizes['json']}B binary={sizes['binary']}B")
+        for name in ("json", "binary"):
+            load = result["load"][name]["latency_ms"]
+            print(
+                f"  {name:<8} load mean={load['mean']:.3f}ms p99={load['p99']:.3f}ms "
+                f"retained={memory[name]['retained_bytes'] / 1024:.1f}KiB "
+                f"peak={memory[name]['peak_bytes'] / 1024:.1f}KiB"
+            )
+        print(f"  load speedup {result['load_speedup']:.2f}x")
+
+    if args.output:
+        report = {
+            "meta": {
+                "date": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "platform": platform.platform(),
+            },
+            "files": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""Throughput benchmarks of the animation loop on the simulated IoController.
+
+Sweeps servo, animation, keyframe and constraint counts and measures
+``Orchestrator.tick``, ``IoController.tick`` and ``KeyFrameAnimation.tick``
+on synthetic data. Results are written as JSON and can be compared against
+an earlier run to catch regressions in the hot loop.
+
+Usage:
+    python -m benchmarks.loop --output bench.json
+    python -m benchmarks.loop --compare bench.json --tolerance 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+from diorama.animation import KeyFrameAnimation
+from diorama.io import OverlapConstraint, SimulatedIoController
+from diorama.orchestrator import Orchestrator
+
+LOOP_DELTA = 1 / 20
+PERCENTILES = (50, 90, 99)
+
+
+def make_config(n_servos: int) -> Dict[str, Any]:
+    """Create a gpio config with ``n_servos`` servos and range limits."""
+    rng = random.Random(n_servos)
+    servos = {}
+    for idx in range(n_servos):
+        low = rng.choice([0, 30, 60])
+        servos[str(idx)] = {
+            "name": f"servo{idx}",
+            "min": low,
+            "max": rng.choice([120, 150, 180]),
+            "speed": 150,
+        }
+    return {"servos": servos, "gpios": {}}
+
+
+def make_animation_data(
+    channels: Sequence[str], n_keyframes: int, seed: int
+) -> Dict[str, Any]:
+    """Create editor JSON data with random keyframes over ``channels``."""
+    rng = random.Random(seed)
+    total_frames = n_keyframes * 5
+    keyframes = [
+        {
+            "frameIndex": frame,
+            "values": {name: rng.uniform(0, 180) for name in channels},
+        }
+        for frame in range(0, total_frames, 5)
+    ]
+    return {
+        "keyframes": keyframes,
+        "config": {"totalFrames": total_frames, "fps": 30, "currentFrameIndex": 0},
+    }
+
+
+def make_controller(n_servos: int, n_constraints: int) -> SimulatedIoController:
+    """Create a simulated controller with range and overlap constraints."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        controller = SimulatedIoController.from_config(
+            make_config(n_servos), channels=max(16, n_servos)
+        )
+    rng = random.Random(n_constraints)
+    servos = list(controller.servos.values())
+    constraints = list(controller.constraints)
+    for _ in range(n_constraints):
+        servo1, servo2 = rng.sample(servos, 2)
+        constraints.append(
+            OverlapConstraint(servo1, servo2, (0, rng.uniform(20, 90)), (0, 90))
+        )
+    controller.constraints = constraints
+    controller.compile_constraints()
+    return controller
+
+
+def measure(function: Callable[[], None], ticks: int) -> Dict[str, Any]:
+    """Call ``function`` ``ticks`` times and summarize the latencies."""
+    latencies = np.empty(ticks)
+    for idx in range(ticks):
+        start = time.perf_counter()
+        function()
+        latencies[idx] = time.perf_counter() - start
+    total = float(latencies.sum())
+    return {
+        "ticks": ticks,
+        "ticks_per_second": ticks / total if total > 0 else float("inf"),
+        "latency_us": {
+            **{
+                f"p{percentile}": float(np.percentile(latencies, percentile)) * 1e6
+                for percentile in PERCENTILES
+            },
+            "max": float(latencies.max()) * 1e6,
+            "mean": float(latencies.mean()) * 1e6,
+        },
+    }
+
+
+def run_case(
+    n_servos: int, n_animations: int, n_keyframes: int, n_constraints: int, ticks: int
+) -> List[Dict[str, Any]]:
+    """Benchmark one parameter combination for all targets."""
+    controller = make_controller(n_servos, n_constraints)
+    names = list(controller.servos)
+    animations = []
+    for idx in range(n_animations):
+        # Every animation drives a random subset of at least half the servos
+        rng = random.Random(idx)
+        channels = rng.sample(names, max(1, len(names) // 2 + rng.randrange(2)))
+        animations.append(
+            KeyFrameAnimation(
+                make_animation_data(channels, n_keyframes, idx),
+                priority=idx,
+                strength=rng.choice([0.5, 1]),
+            )
+        )
+
+    orchestrator = Orchestrator(controller, 1 / LOOP_DELTA)
+    for animation in animations:
+        orchestrator.add(animation)
+
+    case = {
+        "servos": n_servos,
+        "animations": n_animations,
+        "keyframes": n_keyframes,
+        "constraints": n_constraints,
+    }
+    targets = {
+        "orchestrator": lambda: orchestrator.tick(LOOP_DELTA),
+        "io_controller": lambda: controller.tick(LOOP_DELTA),
+        "keyframe_animation": lambda: animations[0].tick(LOOP_DELTA),
+    }
+    results = []
+    for target, function in targets.items():
+        # Warm up caches before measuring
+        measure(function, min(ticks, 50))
+        results.append({**case, "target": target, **measure(function, ticks)})
+    return results
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Return descriptions of cases slower than the baseline by ``tolerance``."""
+
+    def key(result: Dict[str, Any]) -> tuple:
+        return tuple(
+            result[name]
+            for name in ("target", "servos", "animations", "keyframes", "constraints")
+        )
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        ratio = result["ticks_per_second"] / old["ticks_per_second"]
+        if ratio < 1 - tolerance:
+            regressions.append(
+                f"{key(result)}: {old['ticks_per_second']:.0f} -> "
+                f"{result['ticks_per_second']:.0f} ticks/s ({ratio:.0%})"
+            )
+    return regressions
+
+
+def int_list(value: str) -> List[int]:
+    """Parse a comma separated list of integers."""
+    return [int(item) for item in value.split(",")]
+
+
+def main() -> int:
+    """Run the benchmark sweep and write or compare the results."""
+    parser = argparse.ArgumentParser(description="Benchmark the animation loop.")
+    parser.add_argument("--servos", type=int_list, default=[8, 16, 32])
+    parser.add_argument("--animations", type=int_list, default=[1, 4, 12])
+    parser.add_argument("--keyframes", type=int_list, default=[10, 100, 1000])
+    parser.add_argument("--constraints", type=int_list, default=[0, 16])
+    parser.add_argument("--ticks", type=int, default=500, help="Ticks per case")
+    parser.add_argument("--output", type=str, help="Write results to this file")
+    parser.add_argument("--compare", type=str, help="Baseline results to compare")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative throughput loss against the baseline",
+    )
+    args = parser.parse_args()
+
+    # Keep the per case setup logging out of the measurements
+    logging.disable(logging.INFO)
+
+    results = []
+    for n_servos, n_animations, n_keyframes, n_constraints in itertools.product(
+        args.servos, args.animations, args.keyframes, args.constraints
+    ):
+        for result in run_case(
+            n_servos, n_animations, n_keyframes, n_constraints, args.ticks
+        ):
+            results.append(result)
+            print(
+                f"{result['target']:<20} servos={n_servos:<3} "
+                f"animations={n_animations:<3} keyframes={n_keyframes:<5} "
+                f"constraints={n_constraints:<3} "
+                f"{result['ticks_per_second']:>10.0f} ticks/s "
+                f"p99={result['latency_us']['p99']:.0f}us"
+            )
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
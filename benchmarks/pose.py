@@ -0,0 +1,169 @@
+"""Compare fixed and adaptive pose detection on recorded footage.
+
+Replays a video through an AdaptivePoseDetector in fixed mode (heavy model
+on every full frame, as before) and in adaptive mode, and reports per frame
+latency, CPU use, detection rate and how many frames later than the fixed
+mode the adaptive mode picks up a person.
+
+Usage:
+    python -m benchmarks.pose recording.mp4 --output pose.json
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+from diorama.pose import AdaptivePoseDetector
+
+PERCENTILES = (50, 90, 99)
+
+
+def load_frames(video_path: str, max_frames: int) -> List[NDArray]:
+    """Read up to ``max_frames`` frames from a video file."""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    try:
+        while len(frames) < max_frames:
+            success, frame = cap.read()
+            if not success:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
+def run(detector: AdaptivePoseDetector, frames: List[NDArray]) -> Dict[str, Any]:
+    """Process all frames and collect timing and detection results."""
+    latencies = np.empty(len(frames))
+    detected = []
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for idx, frame in enumerate(frames):
+        start = time.perf_counter()
+        results = detector.process(frame)
+        latencies[idx] = time.perf_counter() - start
+        detected.append(bool(results.pose_landmarks))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    return {
+        "frames": len(frames),
+        "frames_per_second": len(frames) / wall if wall > 0 else float("inf"),
+        "cpu_seconds_per_frame": cpu / len(frames),
+        "cpu_share": cpu / wall if wall > 0 else 0.0,
+        "detection_rate": sum(detected) / len(frames),
+        "tier_switches": detector.switches,
+        "tiers": {
+            tier.value: {
+                "frames": stats.frames,
+                "detections": stats.detections,
+                "mean_duration_ms": stats.mean_duration * 1e3,
+            }
+            for tier, stats in detector.stats.items()
+        },
+        "latency_ms": {
+            **{
+                f"p{percentile}": float(np.percentile(latencies, percentile)) * 1e3
+                for percentile in PERCENTILES
+            },
+            "max": float(latencies.max()) * 1e3,
+            "mean": float(latencies.mean()) * 1e3,
+        },
+        "detected": detected,
+    }
+
+
+def detection_delays(reference: List[bool], candidate: List[bool]) -> List[int]:
+    """Frames the candidate needs to detect a person the reference detects.
+
+    A delay is measured for every frame where the reference starts detecting.
+    Appearances the candidate never picks up are left out.
+    """
+    delays = []
+    for idx, found in enumerate(reference):
+        if not found or (idx > 0 and reference[idx - 1]):
+            continue
+        for delay, candidate_found in enumerate(candidate[idx:]):
+            if candidate_found:
+                delays.append(delay)
+                break
+    return delays
+
+
+def main() -> int:
+    """Run both modes on the video and print or write the comparison."""
+    parser = argparse.ArgumentParser(description="Benchmark pose detection modes.")
+    parser.add_argument("video", type=str, help="Video file to replay")
+    parser.add_argument("--max-frames", type=int, default=1000)
+    parser.add_argument("--min-confidence", type=float, default=0.8)
+    parser.add_argument("--model-complexity", type=int, default=2)
+    parser.add_argument("--search-complexity", type=int, default=0)
+    parser.add_argument("--output", type=str, help="Write results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    frames = load_frames(args.video, args.max_frames)
+    if not frames:
+        print(f"Could not read frames from {args.video}")
+        return 1
+
+    results = {}
+    for mode, adaptive in (("fixed", False), ("adaptive", True)):
+        detector = AdaptivePoseDetector(
+            min_detection_confidence=args.min_confidence,
+            model_complexity=args.model_complexity,
+            search_complexity=args.search_complexity,
+            adaptive=adaptive,
+        )
+        results[mode] = run(detector, frames)
+
+    delays = detection_delays(
+        results["fixed"]["detected"], results["adaptive"]["detected"]
+    )
+    comparison = {
+        "appearances": len(delays),
+        "mean_detection_delay_frames": float(np.mean(delays)) if delays else 0.0,
+        "max_detection_delay_frames": max(delays, default=0),
+        # Frames only the adaptive mode finds a person in, usually false
+        "extra_detections": sum(
+            found and not reference
+            for reference, found in zip(
+                results["fixed"]["detected"], results["adaptive"]["detected"]
+            )
+        ),
+        "cpu_ratio": results["adaptive"]["cpu_seconds_per_frame"]
+        / results["fixed"]["cpu_seconds_per_frame"],
+    }
+
+    for mode, result in results.items():
+        print(
+            f"{mode:<9} {result['frames_per_second']:6.1f} fps "
+            f"cpu/frame={result['cpu_seconds_per_frame'] * 1e3:.1f}ms "
+            f"p99={result['latency_ms']['p99']:.1f}ms "
+            f"detected={result['detection_rate']:.0%}"
+        )
+    print(
+        f"adaptive uses {comparison['cpu_ratio']:.0%} of the fixed CPU time, "
+        f"detection delay mean {comparison['mean_detection_delay_frames']:.1f} "
+        f"max {comparison['max_detection_delay_frames']} frames, "
+        f"{comparison['extra_detections']} extra detections"
+    )
+
+    if args.output:
+        for result in results.values():
+            del result["detected"]
+        with open(args.output, "w") as f:
+            json.dump({"video": args.video, **results, "comparison": comparison}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
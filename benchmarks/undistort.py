@@ -0,0 +1,127 @@
+"""Per frame cost of the fisheye undistortion, before and after.
+
+Compares the original pipeline (float maps over the full frame, cropped
+after the remap) with the FisheyeUndistorter (fixed-point maps computed for
+the crop only) on synthetic frames, and measures map setup with and without
+the on-disk cache.
+
+Usage:
+    python -m benchmarks.undistort --output undistort.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+import cv2
+import numpy as np
+
+from diorama.undistort import DEFAULT_CROP, FisheyeUndistorter
+
+PERCENTILES = (50, 90, 99)
+
+
+def measure(function: Callable[[], Any], runs: int) -> Dict[str, Any]:
+    """Call ``function`` ``runs`` times and summarize the latencies."""
+    latencies = np.empty(runs)
+    for idx in range(runs):
+        start = time.perf_counter()
+        function()
+        latencies[idx] = time.perf_counter() - start
+    return {
+        "runs": runs,
+        "latency_ms": {
+            **{
+                f"p{percentile}": float(np.percentile(latencies, percentile)) * 1e3
+                for percentile in PERCENTILES
+            },
+            "max": float(latencies.max()) * 1e3,
+            "mean": float(latencies.mean()) * 1e3,
+        },
+    }
+
+
+def main() -> int:
+    """Run the undistortion benchmark and print or write the results."""
+    parser = argparse.ArgumentParser(description="Benchmark fisheye undistortion.")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--runs", type=int, default=500, help="Frames per case")
+    parser.add_argument("--output", type=str, help="Write results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    size = (args.width, args.height)
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    top, bottom, left, right = DEFAULT_CROP
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        undistorter = FisheyeUndistorter(cache_dir=cache_dir)
+        full = FisheyeUndistorter(crop=None, cache_dir=None)
+
+        setup = {
+            "float_full": measure(lambda: full.compute_maps(size, cv2.CV_32FC1), 20),
+            "fixed_crop": measure(lambda: undistorter.compute_maps(size), 20),
+        }
+        undistorter.maps(size)
+        setup["fixed_crop_cached"] = measure(lambda: undistorter.maps(size), 20)
+
+        old_maps = full.compute_maps(size, cv2.CV_32FC1)
+
+        def old() -> np.ndarray:
+            return cv2.remap(
+                frame, old_maps[0], old_maps[1], interpolation=cv2.INTER_LINEAR
+            )[top:bottom, left:right]
+
+        undistorter(frame)
+        remap = {
+            "float_full": measure(old, args.runs),
+            "fixed_crop": measure(lambda: undistorter(frame), args.runs),
+        }
+
+        difference = cv2.absdiff(old(), undistorter(frame))
+
+    speedup = (
+        remap["float_full"]["latency_ms"]["mean"]
+        / remap["fixed_crop"]["latency_ms"]["mean"]
+    )
+    for name, result in {**setup, **remap}.items():
+        print(
+            f"{name:<18} mean={result['latency_ms']['mean']:.3f}ms "
+            f"p99={result['latency_ms']['p99']:.3f}ms"
+        )
+    print(
+        f"remap speedup {speedup:.2f}x, max pixel difference "
+        f"{int(difference.max())}, mean {float(difference.mean()):.3f}"
+    )
+
+    if args.output:
+        report = {
+            "meta": {
+                "date": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "machine": platform.machine(),
+                "platform": platform.platform(),
+            },
+            "frame_size": size,
+            "crop": DEFAULT_CROP,
+            "setup": setup,
+            "remap": remap,
+            "speedup": speedup,
+            "max_pixel_difference": int(difference.max()),
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
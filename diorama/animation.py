@@ -1,10 +1,23 @@
 """Animation classes for handling various types of animations with error handling and logging."""
 
+import bisect
 import json
 import os
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterator, List, Optional, Any, Sequence, Tuple
 import random
+from threading import Condition
+
+import numpy as np
+from numpy.typing import NDArray
+
+from diorama.keyframes import KeyframeFormatError, is_keyframes_file, read_keyframes
+from diorama.library import DanceLibrary
+from diorama.timeline import (
+    TIMELINE_EXTENSION,
+    TimelineError,
+    read_timeline,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -20,20 +33,68 @@ class AnimationError(Exception):
 
 
 class Animation:
-    """Base animation class implementing common animation functionality."""
+    """Base animation class implementing common animation functionality.
+
+    Subclasses with a fixed set of output channels may set ``channels`` and
+    implement ``tick_array`` and ``tick_mask`` so their output can be blended
+    without dicts. ``constraint_safe`` is set for animations whose output was
+    validated against the servo constraints.
+    """
+
+    channels: Optional[List[str]] = None
+    constraint_safe: bool = False
 
     def __init__(
         self, priority: int = 5, strength: float = 1, strength_speed: float = 1
     ):
+        self._priority_listeners: List[Callable[["Animation"], None]] = []
         self.priority = priority
         self.strength = strength
         self.target_strength = strength
         self.strength_speed = strength_speed
 
+    @property
+    def priority(self) -> int:
+        """Blend order of the animation, higher priorities are applied last."""
+        return self._priority
+
+    @priority.setter
+    def priority(self, priority: int) -> None:
+        self._priority = priority
+        for listener in self._priority_listeners:
+            listener(self)
+
+    def add_priority_listener(self, listener: Callable[["Animation"], None]) -> None:
+        """Register a callback invoked whenever the priority changes."""
+        self._priority_listeners.append(listener)
+
+    def remove_priority_listener(
+        self, listener: Callable[["Animation"], None]
+    ) -> None:
+        """Unregister a callback added with ``add_priority_listener``."""
+        self._priority_listeners.remove(listener)
+
+    @property
+    def dormant(self) -> bool:
+        """Whether the animation is faded out and stays faded out.
+
+        A dormant animation blends with strength 0 and therefore cannot
+        change any servo value.
+        """
+        return self.strength == 0 and self.target_strength == 0
+
     def animate_strength(self, target_strength: float) -> None:
         """Update the target strength of the animation."""
         self.target_strength = target_strength
 
+    def advance(self, delta: float) -> None:
+        """Update animation state without using its output.
+
+        Called for animations whose output is fully covered by higher
+        priorities. Subclasses override this with a cheaper clock update.
+        """
+        self.tick(delta)
+
     def tick(self, delta: float) -> None:
         """Update animation state based on time delta."""
         try:
@@ -46,6 +107,112 @@ class Animation:
             logger.error(f"Error in Animation.tick: {str(e)}", exc_info=True)
 
 
+class KeyFrameTrack:
+    """Keyframes compiled into dense arrays for fast interpolation.
+
+    The keyframes are stored as a sorted time array and a frames x channels
+    value matrix, with NaN marking channels a keyframe does not set. Lookups
+    use a cursor that advances with forward playback and fall back to a
+    binary search on seeks or wraparound.
+    """
+
+    def __init__(
+        self, times: Sequence[float], values: NDArray, channels: Sequence[str]
+    ) -> None:
+        self.channels = list(channels)
+        self.channel_index = {name: idx for idx, name in enumerate(self.channels)}
+        self.times = np.asarray(times, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self._times = self.times.tolist()
+        self._cursor = 0
+
+        # A channel is interpolated between two keyframes only if both set it
+        present = ~np.isnan(self.values)
+        self._segment_masks = present[:-1] & present[1:]
+        self._segment_names = [
+            [self.channels[idx] for idx in np.flatnonzero(mask)]
+            for mask in self._segment_masks
+        ]
+
+    @classmethod
+    def from_keyframes(cls, keyframes: Sequence[Dict[str, Any]]) -> "KeyFrameTrack":
+        """Compile keyframe dictionaries with ``time`` and ``values`` entries."""
+        channels: Dict[str, int] = {}
+        for keyframe in keyframes:
+            for name in keyframe["values"]:
+                channels.setdefault(name, len(channels))
+
+        values = np.full((len(keyframes), len(channels)), np.nan)
+        for row, keyframe in enumerate(keyframes):
+            for name, value in keyframe["values"].items():
+                values[row, channels[name]] = value
+
+        return cls([kf["time"] for kf in keyframes], values, list(channels))
+
+    def locate(self, time: float) -> Optional[int]:
+        """Return the index of the last keyframe at or before ``time``.
+
+        Returns None if ``time`` is not enclosed by two keyframes.
+        """
+        times = self._times
+        last = len(times) - 1
+        cursor = self._cursor
+        for idx in (cursor, cursor + 1):
+            if idx < last and times[idx] <= time < times[idx + 1]:
+                self._cursor = idx
+                return idx
+
+        idx = bisect.bisect_right(times, time) - 1
+        if idx < 0 or idx >= last:
+            return None
+        self._cursor = idx
+        return idx
+
+    def sample(self, time: float) -> Optional[Tuple[NDArray, NDArray]]:
+        """Interpolate all channels at ``time``.
+
+        Returns:
+            Tuple of the value row and the mask of channels set by both
+            enclosing keyframes, or None if no enclosing keyframes exist.
+        """
+        idx = self.locate(time)
+        if idx is None:
+            return None
+        return self._interpolate(idx, time), self._segment_masks[idx]
+
+    def sample_mask(self, time: float) -> Optional[NDArray]:
+        """Return the channel mask at ``time`` without interpolating values."""
+        idx = self.locate(time)
+        if idx is None:
+            return None
+        return self._segment_masks[idx]
+
+    def sample_dict(self, time: float) -> Optional[Dict[str, float]]:
+        """Interpolate all channels at ``time`` and return them by name."""
+        idx = self.locate(time)
+        if idx is None:
+            return None
+        row = self._interpolate(idx, time)
+        return dict(
+            zip(self._segment_names[idx], row[self._segment_masks[idx]].tolist())
+        )
+
+    def rows(self) -> Iterator[Tuple[float, NDArray, NDArray]]:
+        """Yield the time, values and mask of every keyframe.
+
+        Interpolated values lie between neighbouring keyframes, so these rows
+        hold the extremes of every channel.
+        """
+        present = ~np.isnan(self.values)
+        for time, values, mask in zip(self._times, self.values, present):
+            yield time, values, mask
+
+    def _interpolate(self, idx: int, time: float) -> NDArray:
+        time_before = self._times[idx]
+        progress = (time - time_before) / (self._times[idx + 1] - time_before)
+        return self.values[idx] * (1 - progress) + self.values[idx + 1] * progress
+
+
 class KeyFrameAnimation(Animation):
     """Handles keyframe-based animations with interpolation."""
 
@@ -68,10 +235,10 @@ class KeyFrameAnimation(Animation):
             raise AnimationError(f"Failed to initialize KeyFrameAnimation: {str(e)}")
 
     def _process_keyframes(self, animation: Dict[str, Any]) -> None:
-        """Process and validate keyframe data."""
+        """Process, validate and compile keyframe data into a KeyFrameTrack."""
         try:
             total_frames = animation["config"]["totalFrames"]
-            self.keyframes = sorted(
+            keyframes = sorted(
                 [
                     kf
                     for kf in animation["keyframes"]
@@ -81,17 +248,17 @@ class KeyFrameAnimation(Animation):
             )
 
             # Add wraparound keyframes
-            last_frame = self.keyframes[-1]
-            first_frame = self.keyframes[0]
+            last_frame = keyframes[-1]
+            first_frame = keyframes[0]
 
-            self.keyframes = (
+            keyframes = (
                 [
                     {
                         "frameIndex": last_frame["frameIndex"] - total_frames,
                         "values": last_frame["values"],
                     }
                 ]
-                + self.keyframes
+                + keyframes
                 + [
                     {
                         "frameIndex": first_frame["frameIndex"] + total_frames,
@@ -101,77 +268,155 @@ class KeyFrameAnimation(Animation):
             )
 
             # Convert frame indices to time
-            for keyframe in self.keyframes:
-                keyframe["time"] = keyframe["frameIndex"] / animation["config"]["fps"]
+            fps = animation["config"]["fps"]
+            self.track = KeyFrameTrack.from_keyframes(
+                [
+                    {"time": keyframe["frameIndex"] / fps, "values": keyframe["values"]}
+                    for keyframe in keyframes
+                ]
+            )
 
         except Exception as e:
             logger.error(f"Error processing keyframes: {str(e)}", exc_info=True)
             raise AnimationError(f"Failed to process keyframes: {str(e)}")
 
+    @classmethod
+    def from_track(
+        cls,
+        track: Any,
+        duration: float,
+        fps: float,
+        *args,
+        name: Optional[str] = None,
+        **kwargs,
+    ) -> "KeyFrameAnimation":
+        """Create animation from a compiled track, e.g. a baked timeline."""
+        animation = cls.__new__(cls)
+        Animation.__init__(animation, *args, **kwargs)
+        animation.current_time = 0
+        animation.name = name
+        animation.duration = duration
+        animation.fps = fps
+        animation.track = track
+        animation.repetitions = None
+        return animation
+
     @classmethod
     def from_path(
         cls, file_path: str, *args, name: Optional[str] = None, **kwargs
     ) -> "KeyFrameAnimation":
-        """Create animation from a JSON file."""
-        try:
-            with open(file_path) as f:
-                data = json.load(f)
+        """Create animation from a JSON, binary keyframe or baked timeline file.
 
+        Binary keyframe files are recognized by their content, so they load
+        whatever their extension.
+        """
+        try:
             if name is None:
                 name = os.path.basename(file_path)
 
+            if file_path.endswith(TIMELINE_EXTENSION):
+                track, duration = read_timeline(file_path)
+                return cls.from_track(
+                    track, duration, track.fps, *args, name=name, **kwargs
+                )
+
+            if is_keyframes_file(file_path):
+                data = read_keyframes(file_path)
+                track = KeyFrameTrack(*data.compile())
+                return cls.from_track(
+                    track,
+                    data.total_frames * (1 / data.fps),
+                    data.fps,
+                    *args,
+                    name=name,
+                    **kwargs,
+                )
+
+            with open(file_path) as f:
+                data = json.load(f)
+
             return cls(data, *args, name=name, **kwargs)
 
-        except (json.JSONDecodeError, FileNotFoundError) as e:
+        except (
+            json.JSONDecodeError,
+            KeyframeFormatError,
+            TimelineError,
+            OSError,
+        ) as e:
             raise AnimationError(f"Failed to load animation from {file_path}: {str(e)}")
 
-    def tick(self, delta: float) -> Dict[str, float]:
-        """Update animation state and return interpolated values."""
-        try:
-            super().tick(delta)
-            self.current_time += delta
+    @property
+    def channels(self) -> List[str]:
+        """Channel names in the column order of ``tick_array``."""
+        return self.track.channels
 
-            while self.current_time >= self.duration:
-                self.current_time -= self.duration
-                if self.repetitions is not None:
-                    self.repetitions -= 1
+    def advance(self, delta: float) -> None:
+        """Advance the playback clock and repetition counter."""
+        super().tick(delta)
+        self.current_time += delta
 
-            if self.repetitions is not None and self.repetitions <= 0:
-                self.animate_strength(0)
+        while self.current_time >= self.duration:
+            self.current_time -= self.duration
+            if self.repetitions is not None:
+                self.repetitions -= 1
 
+        if self.repetitions is not None and self.repetitions <= 0:
+            self.animate_strength(0)
+
+    def tick(self, delta: float) -> Dict[str, float]:
+        """Update animation state and return interpolated values."""
+        try:
+            self.advance(delta)
             return self._interpolate_values()
 
         except Exception as e:
             logger.error(f"Error in KeyFrameAnimation.tick: {str(e)}", exc_info=True)
             return {}
 
-    def _interpolate_values(self) -> Dict[str, float]:
-        """Calculate interpolated values between keyframes."""
+    def tick_array(self, delta: float) -> Optional[Tuple[NDArray, NDArray]]:
+        """Update animation state and return values without building a dict.
+
+        Returns:
+            Tuple of values and validity mask, both indexed like ``channels``,
+            or None if there is nothing to interpolate.
+        """
         try:
-            frame_before = None
-            frame_after = None
+            self.advance(delta)
+            sample = self.track.sample(self.current_time)
+            if sample is None:
+                logger.warning("Could not find valid keyframes for interpolation")
+            return sample
+
+        except Exception as e:
+            logger.error(
+                f"Error in KeyFrameAnimation.tick_array: {str(e)}", exc_info=True
+            )
+            return None
 
-            for keyframe in self.keyframes:
-                if keyframe["time"] <= self.current_time:
-                    frame_before = keyframe
-                if keyframe["time"] > self.current_time:
-                    frame_after = keyframe
-                    break
+    def tick_mask(self, delta: float) -> Optional[NDArray]:
+        """Update animation state and return only the channel mask.
 
-            if not frame_before or not frame_after:
-                logger.warning("Could not find valid keyframes for interpolation")
-                return {}
+        This is the cheap path for dormant animations whose values would be
+        blended with strength 0 anyway.
+        """
+        try:
+            self.advance(delta)
+            return self.track.sample_mask(self.current_time)
 
-            interpolation_time = frame_after["time"] - frame_before["time"]
-            progressed_time = self.current_time - frame_before["time"]
-            progress = progressed_time / interpolation_time
+        except Exception as e:
+            logger.error(
+                f"Error in KeyFrameAnimation.tick_mask: {str(e)}", exc_info=True
+            )
+            return None
 
-            return {
-                name: frame_before["values"][name] * (1 - progress)
-                + frame_after["values"][name] * progress
-                for name in frame_before["values"].keys()
-                if name in frame_before["values"] and name in frame_after["values"]
-            }
+    def _interpolate_values(self) -> Dict[str, float]:
+        """Calculate interpolated values between keyframes."""
+        try:
+            values = self.track.sample_dict(self.current_time)
+            if values is None:
+                logger.warning("Could not find valid keyframes for interpolation")
+                return {}
+            return values
 
         except Exception as e:
             logger.error(f"Error interpolating values: {str(e)}", exc_info=True)
@@ -179,23 +424,31 @@ class KeyFrameAnimation(Animation):
 
 
 class MultiKeyframeAnimation(Animation):
-    """Handles multiple keyframe animations in sequence."""
+    """Handles multiple keyframe animations in sequence.
+
+    The dances come from a DanceLibrary, so they are loaded when they are
+    about to play and files added to or deleted from the directory are
+    picked up while running. ``index`` follows the name of the next dance,
+    so changes of the directory never disturb the playback order.
+    """
 
     def __init__(
         self,
-        animations: List[KeyFrameAnimation],
+        library: DanceLibrary,
         *args,
         animation_duration: Optional[float] = None,
         **kwargs,
     ):
         try:
             super().__init__(*args, **kwargs)
-            self.animations = animations
-            self.index = 0
+            self.library = library
             self.is_running = False
             self.animation: Optional[KeyFrameAnimation] = None
             self.animation_duration = animation_duration
             self.elapsed_time = 0.0
+            self._next_name = library.names[0] if len(library) else None
+            self._output_safe = True
+            library.prefetch(self._next_name)
         except Exception as e:
             logger.error(
                 f"Error initializing MultiKeyframeAnimation: {str(e)}", exc_info=True
@@ -204,18 +457,47 @@ class MultiKeyframeAnimation(Animation):
                 f"Failed to initialize MultiKeyframeAnimation: {str(e)}"
             )
 
+    @property
+    def index(self) -> int:
+        """Index of the next dance in the current directory listing."""
+        return self.library.position(self._next_name)
+
+    @property
+    def dance_names(self) -> List[str]:
+        """Names of the dances in playback order."""
+        return self.library.names
+
+    @property
+    def constraint_safe(self) -> bool:
+        """Whether the dance that produced the last output is constraint safe."""
+        return self._output_safe
+
     @classmethod
     def from_path(
-        cls, animations_dir: str, *args, **kwargs
+        cls,
+        animations_dir: str,
+        *args,
+        library_options: Optional[Dict[str, Any]] = None,
+        **kwargs,
     ) -> "MultiKeyframeAnimation":
-        """Create animation from a directory of JSON files."""
+        """Create animation from a directory of JSON files.
+
+        Dances baked with ``python -m diorama.timeline`` are loaded from
+        their timeline instead, unless the JSON file was modified after
+        baking.
+
+        Args:
+            animations_dir: Directory with the dance files.
+            library_options: Keyword arguments for the DanceLibrary, e.g.
+                ``{"max_bytes": 8 * 1024 * 1024}``.
+        """
         try:
-            animations = [
-                KeyFrameAnimation.from_path(os.path.join(animations_dir, file_path))
-                for file_path in sorted(os.listdir(animations_dir))
-                if file_path.endswith(".json")
-            ]
-            return cls(animations, *args, **kwargs)
+            library = DanceLibrary(
+                animations_dir,
+                KeyFrameAnimation.from_path,
+                **(library_options or {}),
+            )
+            return cls(library, *args, **kwargs)
         except Exception as e:
             logger.error(
                 f"Error loading animations from {animations_dir}: {str(e)}",
@@ -228,13 +510,35 @@ class MultiKeyframeAnimation(Animation):
         try:
             self.is_running = True
             self.elapsed_time = 0.0
-            self.animation = self.animations[self.index]
+            index, self.animation = self._load_next()
             self.animation.current_time = 0
             self.animation.repetitions = 1
-            self.index = (self.index + 1) % len(self.animations)
+            names = self.library.names
+            self._next_name = names[(index + 1) % len(names)]
         except Exception as e:
             logger.error(f"Error starting animation: {str(e)}", exc_info=True)
             self.is_running = False
+        # Pick up changed files and load the next dance while this one plays
+        self.library.refresh(prefetch=self._next_name)
+
+    def _load_next(self) -> Tuple[int, KeyFrameAnimation]:
+        """Load the next dance, skipping dances that fail to load.
+
+        Returns:
+            Tuple of the index and the dance
+
+        Raises:
+            AnimationError: If none of the dances can be loaded.
+        """
+        for _ in range(len(self.library)):
+            names = self.library.names
+            index = self.library.position(self._next_name)
+            try:
+                return index, self.library.get(index)
+            except Exception as e:
+                logger.error(f"Skipping dance {names[index]}: {str(e)}")
+                self._next_name = names[(index + 1) % len(names)]
+        raise AnimationError(f"No dance of {self.library.directory} could be loaded")
 
     def tick(self, delta: float) -> Dict[str, float]:
         """Update animation state and return current values."""
@@ -256,11 +560,12 @@ class MultiKeyframeAnimation(Animation):
                     delta = self.animation_duration - self.elapsed_time
 
             values = self.animation.tick(delta)
+            self._output_safe = self.animation.constraint_safe
             self.elapsed_time += delta
 
             # Check if current animation finished
             if self.animation.repetitions <= 0:
-                self.animation = self.animations[self.index]
+                _, self.animation = self._load_next()
                 self.animation.current_time = 0
                 self.animation.repetitions = 1
 
@@ -411,13 +716,23 @@ class HeadAnimation(Animation):
 
 
 class WebUIAnimation(Animation):
-    """Handles web UI-based animations with slider controls."""
+    """Handles web UI-based animations with slider controls.
+
+    Slider values are either replaced as a whole through ``slider_values``
+    or updated partially with ``submit_slider_values``. Partial updates are
+    merged until the next tick, so only the newest value of every slider is
+    applied, however many updates arrived in between.
+    """
 
     def __init__(self, *args, **kwargs):
         try:
             super().__init__(*args, **kwargs)
             self.slider_values: Dict[str, float] = {}
             self.animation: Optional[KeyFrameAnimation] = None
+            self._pending: Dict[str, float] = {}
+            self._submitted = 0
+            self._applied = 0
+            self._applied_condition = Condition()
         except Exception as e:
             logger.error(f"Error initializing WebUIAnimation: {str(e)}", exc_info=True)
             raise AnimationError(f"Failed to initialize WebUIAnimation: {str(e)}")
@@ -448,10 +763,54 @@ class WebUIAnimation(Animation):
         """Stop the current animation."""
         self.animation = None
 
+    def submit_slider_values(self, values: Dict[str, float]) -> int:
+        """Queue slider values to be applied with the next tick.
+
+        Args:
+            values: Values of the sliders that changed.
+
+        Returns:
+            Sequence number to wait for with ``wait_applied``
+        """
+        with self._applied_condition:
+            self._pending.update(values)
+            self._submitted += 1
+            return self._submitted
+
+    def wait_applied(
+        self, sequence: int, timeout: Optional[float] = None
+    ) -> Optional[Dict[str, float]]:
+        """Wait until the values submitted as ``sequence`` were applied.
+
+        Args:
+            sequence: Sequence number returned by ``submit_slider_values``.
+            timeout: Maximum time to wait in seconds.
+
+        Returns:
+            Copy of all slider values after applying, None on timeout
+        """
+        with self._applied_condition:
+            if not self._applied_condition.wait_for(
+                lambda: self._applied >= sequence, timeout
+            ):
+                return None
+            return dict(self.slider_values)
+
+    def _apply_pending(self) -> None:
+        """Merge the values submitted since the last tick."""
+        with self._applied_condition:
+            # Copy, so readers of the previous dict never see it change
+            self.slider_values = {**self.slider_values, **self._pending}
+            self._pending = {}
+            self._applied = self._submitted
+            self._applied_condition.notify_all()
+
     def tick(self, delta: float) -> Dict[str, float]:
         """Update animation state and return current values."""
         try:
             super().tick(delta)
+            if self._applied != self._submitted:
+                self._apply_pending()
             if self.animation is not None:
                 return self.animation.tick(delta)
             return self.slider_values
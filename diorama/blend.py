@@ -0,0 +1,160 @@
+"""Vectorized blending of animation outputs onto servo targets."""
+
+import logging
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from diorama.io import Servo
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class ServoBlender:
+    """Blends animation values for all servos at once.
+
+    Every servo gets a fixed column. Animations are pushed as layers from the
+    highest priority downward. A layer with strength 1 fully covers the
+    servos it sets, so lower layers are dropped on those columns. ``apply``
+    then blends the remaining layers bottom-up, starting from the current
+    servo positions, with ``strength * value + (1 - strength) * previous``,
+    which gives exactly the same targets as blending every layer.
+    """
+
+    def __init__(self, servos: Sequence[Servo]) -> None:
+        self.servos: List[Servo] = list(servos)
+        self.names = [servo.name for servo in self.servos]
+        self.columns = {name: idx for idx, name in enumerate(self.names)}
+        self.out = np.zeros(len(self.servos))
+        self.touched = np.zeros(len(self.servos), dtype=bool)
+        self.covered = np.zeros(len(self.servos), dtype=bool)
+        self._layers: List[Tuple[float, NDArray, NDArray]] = []
+        self._channel_maps: Dict[Tuple[str, ...], Tuple[NDArray, NDArray]] = {}
+        self._unknown: Set[str] = set()
+
+    def begin(self) -> None:
+        """Start a blend pass."""
+        self.touched[:] = False
+        self.covered[:] = False
+        self._layers.clear()
+
+    @property
+    def fully_covered(self) -> bool:
+        """Whether every servo is covered by a layer pushed so far."""
+        return bool(self.covered.all())
+
+    @property
+    def fully_touched(self) -> bool:
+        """Whether every servo gets a target from this pass."""
+        return bool(self.touched.all())
+
+    def is_covered(self, channels: List[str]) -> bool:
+        """Whether all servos of ``channels`` are covered already."""
+        _, target = self._channel_map(channels)
+        return bool(self.covered[target].all())
+
+    def push_array(
+        self,
+        strength: float,
+        channels: List[str],
+        values: NDArray,
+        mask: NDArray,
+    ) -> None:
+        """Push a layer given in the column order of ``channels``.
+
+        Args:
+            strength: Weight of the animation in [0, 1].
+            channels: Channel names of ``values`` and ``mask``.
+            values: Channel values.
+            mask: Boolean mask of the channels that carry a value.
+        """
+        source, target = self._channel_map(channels)
+        layer_values = np.zeros(len(self.servos))
+        layer_mask = np.zeros(len(self.servos), dtype=bool)
+        layer_mask[target] = mask[source]
+        layer_values[target] = values[source]
+        self._push(strength, layer_values, layer_mask)
+
+    def push_dict(self, strength: float, values: Dict[str, float]) -> None:
+        """Push a layer given by servo name."""
+        layer_values = np.zeros(len(self.servos))
+        layer_mask = np.zeros(len(self.servos), dtype=bool)
+        for name, value in values.items():
+            idx = self.columns.get(name)
+            if idx is None:
+                self._warn_unknown(name)
+                continue
+            layer_values[idx] = value
+            layer_mask[idx] = True
+        self._push(strength, layer_values, layer_mask)
+
+    def touch_array(self, channels: List[str], mask: NDArray) -> None:
+        """Mark channels as set without changing their value.
+
+        Used for animations blended with strength 0, which leave the values
+        unchanged but still make their servos take the blended target.
+        """
+        source, target = self._channel_map(channels)
+        self.touched[target] |= mask[source]
+
+    def touch_dict(self, names: Iterable[str]) -> None:
+        """Mark servos as set by name without changing their value."""
+        for name in names:
+            idx = self.columns.get(name)
+            if idx is None:
+                self._warn_unknown(name)
+                continue
+            self.touched[idx] = True
+
+    def apply(self) -> None:
+        """Blend the pushed layers and set the targets of all touched servos."""
+        self.out[:] = [servo.position for servo in self.servos]
+        for strength, values, mask in reversed(self._layers):
+            blended = strength * values + (1 - strength) * self.out
+            np.copyto(self.out, blended, where=mask)
+
+        indices = np.flatnonzero(self.touched)
+        for idx, value in zip(indices.tolist(), self.out[indices].tolist()):
+            self.servos[idx].set_target(value)
+
+    def _push(self, strength: float, values: NDArray, mask: NDArray) -> None:
+        mask &= ~self.covered
+        if not mask.any():
+            return
+        self.touched |= mask
+        if strength == 1:
+            self.covered |= mask
+        self._layers.append((strength, values, mask))
+
+    def _channel_map(self, channels: List[str]) -> Tuple[NDArray, NDArray]:
+        """Map channel positions to servo columns, cached per channel names.
+
+        Keyed by the names rather than the list, so animations rebuilt with
+        the same channels, e.g. on every web UI play, share one entry.
+        """
+        key = tuple(channels)
+        cached = self._channel_maps.get(key)
+        if cached is not None:
+            return cached
+
+        source, target = [], []
+        for idx, name in enumerate(channels):
+            column = self.columns.get(name)
+            if column is None:
+                self._warn_unknown(name)
+                continue
+            source.append(idx)
+            target.append(column)
+        mapping = (np.array(source, dtype=np.intp), np.array(target, dtype=np.intp))
+        self._channel_maps[key] = mapping
+        return mapping
+
+    def _warn_unknown(self, name: str) -> None:
+        if name not in self._unknown:
+            self._unknown.add(name)
+            logger.warning(f"Servo {name} not found")
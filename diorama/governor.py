@@ -0,0 +1,189 @@
+"""Rate governor keeping background work from starving the animation loop."""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from diorama.scheduler import TickScheduler
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GovernorStats:
+    """State of a RateGovernor, measured over the last window.
+
+    CPU shares are in cores, so a share of 1.0 means one core fully busy.
+    """
+
+    rate: float = 0.0
+    target_rate: float = 0.0
+    measured_rate: float = 0.0
+    cpu_share: float = 0.0
+    process_cpu_share: float = 0.0
+    loop_miss_ratio: float = 0.0
+    loop_load: float = 0.0
+    decreases: int = 0
+    increases: int = 0
+
+
+class RateGovernor:
+    """Paces a worker loop and adapts its rate to the main loop's health.
+
+    The worker calls ``throttle`` before each iteration, which sleeps until
+    the next slot at the current rate, and ``record`` with the CPU time it
+    spent. Once per ``interval`` the governor looks at the watched
+    TickScheduler: if the loop missed more than ``miss_threshold`` of its
+    deadlines the rate is multiplied by ``decrease``, and if it missed none
+    and used less than ``headroom`` of its period the rate grows by
+    ``increase`` frames per second, up to the target rate.
+
+    Example:
+        governor = RateGovernor(10)
+        governor.watch(scheduler)
+        while running:
+            governor.throttle()
+            start = time.thread_time()
+            work()
+            governor.record(time.thread_time() - start)
+    """
+
+    def __init__(
+        self,
+        fps: float,
+        min_fps: float = 2.0,
+        interval: float = 2.0,
+        miss_threshold: float = 0.02,
+        headroom: float = 0.5,
+        decrease: float = 0.7,
+        increase: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        process_clock: Callable[[], float] = time.process_time,
+    ) -> None:
+        """Initialize the governor.
+
+        Args:
+            fps: Target and maximum rate in iterations per second.
+            min_fps: Lowest rate the governor backs off to.
+            interval: Seconds between rate adjustments.
+            miss_threshold: Fraction of missed loop deadlines that triggers
+                a decrease.
+            headroom: Maximum loop work, relative to its period, that still
+                allows an increase.
+            decrease: Factor applied to the rate on a decrease.
+            increase: Frames per second added on an increase.
+            clock: Monotonic clock returning seconds.
+            sleep: Function used to wait for the next slot.
+            process_clock: CPU time of the whole process in seconds.
+        """
+        if fps <= 0:
+            raise ValueError(f"fps must be positive, got {fps}")
+        self.target_rate = fps
+        self.min_rate = min(min_fps, fps)
+        self.interval = interval
+        self.miss_threshold = miss_threshold
+        self.headroom = headroom
+        self.decrease = decrease
+        self.increase = increase
+        self.rate = fps
+        self.stats = GovernorStats(rate=fps, target_rate=fps)
+
+        self._clock = clock
+        self._sleep = sleep
+        self._process_clock = process_clock
+        self._scheduler: Optional[TickScheduler] = None
+        self._next_slot: Optional[float] = None
+
+        self._window_start = clock()
+        self._window_process_time = process_clock()
+        self._window_frames = 0
+        self._window_cpu = 0.0
+        self._window_ticks = 0
+        self._window_misses = 0
+
+    def watch(self, scheduler: TickScheduler) -> None:
+        """Adapt the rate to the deadline misses of ``scheduler``."""
+        self._scheduler = scheduler
+        self._window_ticks, self._window_misses = self._loop_counts()
+
+    def throttle(self) -> None:
+        """Sleep until the next slot at the current rate."""
+        now = self._clock()
+        self._update(now)
+
+        period = 1 / self.rate
+        if self._next_slot is None:
+            self._next_slot = now
+        wait = self._next_slot - now
+        if wait > 0:
+            self._sleep(wait)
+        elif -wait > period:
+            # Fell behind by more than a slot, do not try to catch up
+            self._next_slot = now
+        self._next_slot += period
+
+    def record(self, cpu_time: float) -> None:
+        """Record one finished iteration and the CPU time it used."""
+        self._window_frames += 1
+        self._window_cpu += cpu_time
+
+    def _loop_counts(self) -> Tuple[int, int]:
+        if self._scheduler is None:
+            return 0, 0
+        stats = self._scheduler.stats
+        return stats.ticks, stats.overruns + stats.skipped_ticks
+
+    def _update(self, now: float) -> None:
+        """Refresh the statistics and adjust the rate once per interval."""
+        elapsed = now - self._window_start
+        if elapsed < self.interval:
+            return
+
+        process_time = self._process_clock()
+        ticks, misses = self._loop_counts()
+        # A restarted scheduler resets its counters
+        if ticks < self._window_ticks:
+            self._window_ticks, self._window_misses = 0, 0
+        window_ticks = ticks - self._window_ticks
+        window_misses = misses - self._window_misses
+
+        stats = self.stats
+        stats.measured_rate = self._window_frames / elapsed
+        stats.cpu_share = self._window_cpu / elapsed
+        stats.process_cpu_share = (process_time - self._window_process_time) / elapsed
+        stats.loop_miss_ratio = window_misses / window_ticks if window_ticks else 0.0
+        if self._scheduler is not None:
+            stats.loop_load = self._scheduler.stats.mean_work / self._scheduler.period
+
+        if window_ticks:
+            if stats.loop_miss_ratio > self.miss_threshold:
+                self._set_rate(max(self.min_rate, self.rate * self.decrease))
+            elif window_misses == 0 and stats.loop_load < self.headroom:
+                self._set_rate(min(self.target_rate, self.rate + self.increase))
+
+        self._window_start = now
+        self._window_process_time = process_time
+        self._window_frames = 0
+        self._window_cpu = 0.0
+        self._window_ticks, self._window_misses = ticks, misses
+
+    def _set_rate(self, rate: float) -> None:
+        if rate == self.rate:
+            return
+        if rate < self.rate:
+            self.stats.decreases += 1
+            logger.info(
+                f"Main loop missed {self.stats.loop_miss_ratio:.0%} of its "
+                f"deadlines, lowering rate to {rate:.1f}/s"
+            )
+        else:
+            self.stats.increases += 1
+            logger.debug(f"Raising rate to {rate:.1f}/s")
+        self.rate = rate
+        self.stats.rate = rate
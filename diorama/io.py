@@ -1,10 +1,22 @@
 """Servo control module for RPi with error handling and logging capabilities."""
 
 import logging
-from typing import Dict, Optional, Sequence
+import time
+from dataclasses import dataclass, field
+from threading import Thread
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
 import traceback
-from adafruit_servokit import ServoKit
-import RPi.GPIO as GPIO
+import numpy as np
+from utils.mailbox import Mailbox
+
+try:
+    from adafruit_servokit import ServoKit
+    import RPi.GPIO as GPIO
+except ImportError:
+    # Without the hardware libraries only SimulatedIoController is usable
+    ServoKit = None
+    GPIO = None
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -59,7 +71,14 @@ class Servo:
 
 
 class Constraint:
-    """Base class for servo movement constraints."""
+    """Base class for servo movement constraints.
+
+    Subclasses should set ``servos`` to the servos the constraint depends on,
+    so it is only evaluated for those. Constraints leaving it at None are
+    evaluated for every servo.
+    """
+
+    servos: Optional[Tuple[Servo, ...]] = None
 
     def is_allowed(self, servo: Servo) -> bool:
         """Check if servo position is allowed."""
@@ -71,9 +90,16 @@ class RangeConstraint(Constraint):
 
     def __init__(self, servo: Servo, min_position: float, max_position: float) -> None:
         self.servo = servo
+        self.servos = (servo,)
         self.min_position = min_position
         self.max_position = max_position
 
+    def __repr__(self) -> str:
+        return (
+            f"RangeConstraint({self.servo.name}, "
+            f"{self.min_position}, {self.max_position})"
+        )
+
     def is_allowed(self, servo: Servo) -> bool:
         if servo != self.servo:
             return True
@@ -92,9 +118,16 @@ class OverlapConstraint(Constraint):
     ) -> None:
         self.servo1 = servo1
         self.servo2 = servo2
+        self.servos = (servo1, servo2)
         self.range1 = range1
         self.range2 = range2
 
+    def __repr__(self) -> str:
+        return (
+            f"OverlapConstraint({self.servo1.name}, {self.servo2.name}, "
+            f"{self.range1}, {self.range2})"
+        )
+
     def is_allowed(self, servo: Servo) -> bool:
         if servo not in (self.servo1, self.servo2):
             return True
@@ -103,6 +136,100 @@ class OverlapConstraint(Constraint):
         return not (in_range1 and in_range2)
 
 
+class ConstraintEngine:
+    """Constraints compiled into a per servo index for fast evaluation.
+
+    Servo movement is computed for all servos at once. Plain RangeConstraints
+    become min/max arrays, all other constraints are only evaluated for the
+    servos they reference. A servo that moves from an allowed into a
+    disallowed position is reverted to its previous position, exactly as if
+    every constraint were checked before and after every servo tick.
+    """
+
+    def __init__(
+        self, servos: Sequence[Servo], constraints: Sequence[Constraint]
+    ) -> None:
+        self.servos = list(servos)
+        columns = {id(servo): idx for idx, servo in enumerate(self.servos)}
+        self.index = {servo.name: idx for idx, servo in enumerate(self.servos)}
+        self.speed = np.array([servo.speed for servo in self.servos], dtype=float)
+        self.min_position = np.full(len(self.servos), -np.inf)
+        self.max_position = np.full(len(self.servos), np.inf)
+        self.generic: List[List[Constraint]] = [[] for _ in self.servos]
+        global_constraints: List[Constraint] = []
+
+        has_range = np.zeros(len(self.servos), dtype=bool)
+        for constraint in constraints:
+            if type(constraint) is RangeConstraint:
+                idx = columns.get(id(constraint.servo))
+                if idx is None:
+                    continue
+                if not has_range[idx]:
+                    self.min_position[idx] = constraint.min_position
+                    self.max_position[idx] = constraint.max_position
+                    has_range[idx] = True
+                    continue
+            if constraint.servos is None:
+                global_constraints.append(constraint)
+                continue
+            for servo in constraint.servos:
+                idx = columns.get(id(servo))
+                if idx is not None:
+                    self.generic[idx].append(constraint)
+
+        if global_constraints:
+            for generic in self.generic:
+                generic.extend(global_constraints)
+
+    def tick(self, delta_time: float, check: bool = True) -> None:
+        """Move all servos towards their targets respecting constraints.
+
+        Args:
+            delta_time: Time elapsed since the last tick in seconds.
+            check: Whether to evaluate the range constraints. Only disable
+                this if all targets are known to be within range. All other
+                constraints are always evaluated, since servos pass through
+                positions between their targets that were never validated.
+        """
+        servos = self.servos
+        old = np.array([servo.position for servo in servos], dtype=float)
+        target = np.array([servo.target_position for servo in servos], dtype=float)
+
+        # Same stepping as Servo.tick
+        step = self.speed * delta_time
+        moved = np.where(
+            old < target,
+            np.minimum(old + step, target),
+            np.where(old > target, np.maximum(old - step, target), old),
+        )
+        if check:
+            lower, upper = self.min_position, self.max_position
+            range_revert = ((lower <= old) & (old <= upper)) & ~(
+                (lower <= moved) & (moved <= upper)
+            )
+            allowed = np.where(range_revert, old, moved)
+        else:
+            range_revert = np.zeros(len(servos), dtype=bool)
+            allowed = moved
+
+        for idx, (servo, constraints, position, revert) in enumerate(
+            zip(servos, self.generic, allowed.tolist(), range_revert.tolist())
+        ):
+            if not constraints:
+                servo.position = position
+                continue
+            try:
+                old_position = servo.position
+                before = [constraint.is_allowed(servo) for constraint in constraints]
+                servo.position = moved[idx].item()
+                after = [constraint.is_allowed(servo) for constraint in constraints]
+                if revert or any(bef and not aft for bef, aft in zip(before, after)):
+                    servo.position = old_position
+            except Exception as e:
+                logger.error(f"Error in tick for servo {servo.name}: {str(e)}")
+                logger.debug(traceback.format_exc())
+
+
 class IoController:
     """Base class for IO control operations."""
 
@@ -111,33 +238,52 @@ class IoController:
     ) -> None:
         self.servos = {servo.name: servo for servo in servos}
         self.constraints = constraints
+        # Set by the orchestrator when only validated animations drive the servos
+        self.constraints_verified = False
+        self.compile_constraints()
         logger.info(f"Initialized IoController with {len(servos)} servos")
 
     def get_servo(self, name: str) -> Optional[Servo]:
         """Get servo by name."""
         return self.servos.get(name)
 
+    def compile_constraints(self) -> None:
+        """Rebuild the constraint engine, needed after changing constraints."""
+        self._engine = ConstraintEngine(self.servos.values(), self.constraints)
+
+    def clamp(self, values: Dict[str, float]) -> Dict[str, float]:
+        """Limit target positions to the range constraints of their servos.
+
+        Values of unknown servos are dropped.
+        """
+        engine = self._engine
+        clamped = {}
+        for name, value in values.items():
+            idx = engine.index.get(name)
+            if idx is None:
+                continue
+            lower, upper = engine.min_position[idx], engine.max_position[idx]
+            clamped[name] = float(min(max(value, lower), upper))
+        return clamped
+
     def tick(self, delta_time: float) -> None:
-        """Update all servos respecting constraints."""
-        for servo in self.servos.values():
-            try:
-                old_position = servo.position
-                before = [
-                    constraint.is_allowed(servo) for constraint in self.constraints
-                ]
-                servo.tick(delta_time)
-                after = [
-                    constraint.is_allowed(servo) for constraint in self.constraints
-                ]
-                if any(bef and not aft for bef, aft in zip(before, after)):
-                    servo.position = old_position
-            except Exception as e:
-                logger.error(f"Error in tick for servo {servo.name}: {str(e)}")
-                logger.debug(traceback.format_exc())
+        """Update all servos respecting constraints.
+
+        Range constraint checks are skipped while ``constraints_verified`` is
+        set, all other constraints are still evaluated.
+        """
+        try:
+            self._engine.tick(delta_time, check=not self.constraints_verified)
+        except Exception as e:
+            logger.error(f"Error in IoController tick: {str(e)}")
+            logger.debug(traceback.format_exc())
 
     @classmethod
-    def from_config(cls, config: Dict) -> "IoController":
-        """Create IoController instance from configuration dictionary."""
+    def from_config(cls, config: Dict, **kwargs) -> "IoController":
+        """Create IoController instance from configuration dictionary.
+
+        Additional keyword arguments are passed on to the constructor.
+        """
         try:
             servos = {}
             for idx, cfg in config["servos"].items():
@@ -161,25 +307,278 @@ class IoController:
                 )
                 for cfg in config["servos"].values()
             ]
-            return cls(servos.values(), constraints)
+            return cls(servos.values(), constraints, **kwargs)
         except Exception as e:
             logger.error(f"Error creating IoController from config: {str(e)}")
             logger.debug(traceback.format_exc())
             raise ServoError(f"Failed to create IoController: {str(e)}")
 
 
+@dataclass
+class WriteStats:
+    """Bus traffic caused by one output update."""
+
+    channels: int = 0
+    transactions: int = 0
+    bytes: int = 0
+    gpio_writes: int = 0
+
+    def add(self, other: "WriteStats") -> None:
+        """Accumulate the counters of another update."""
+        self.channels += other.channels
+        self.transactions += other.transactions
+        self.bytes += other.bytes
+        self.gpio_writes += other.gpio_writes
+
+
+class Pca9685OutputStage:
+    """Writes servo angles to a PCA9685, sending only channels that changed.
+
+    Angles are quantized to the 12 bit PWM resolution of the chip. A channel
+    is written only if its quantized value differs from the last written one
+    and the angle moved by at least ``dead_band`` degrees. Changed channels
+    that are close together are sent as one block write using the register
+    auto increment of the PCA9685, filling small gaps with the values already
+    on the chip.
+    """
+
+    LED0_ON_L = 0x06
+    REGISTER_BYTES = 4
+
+    def __init__(
+        self,
+        kit: "ServoKit",
+        dead_band: float = 0.0,
+        max_gap: int = 1,
+        min_pulse: int = 750,
+        max_pulse: int = 2250,
+        actuation_range: float = 180,
+    ) -> None:
+        """Initialize the output stage.
+
+        Args:
+            kit: ServoKit driving the PCA9685.
+            dead_band: Minimum angle change in degrees that triggers a write.
+            max_gap: Number of unchanged channels that may be rewritten to
+                join two block writes into one.
+            min_pulse: Pulse width in microseconds at angle 0.
+            max_pulse: Pulse width in microseconds at ``actuation_range``.
+            actuation_range: Angle range of the servos in degrees.
+        """
+        self.kit = kit
+        self.dead_band = dead_band
+        self.max_gap = max_gap
+        self.actuation_range = actuation_range
+        self._angles: Dict[int, float] = {}
+        self._counts: Dict[int, int] = {}
+
+        try:
+            pca = kit._pca
+            self._device = pca.i2c_device
+            frequency = pca.frequency
+        except AttributeError:
+            logger.warning("No direct PCA9685 access, using per channel writes")
+            self._device = None
+            frequency = 50
+
+        # Same duty cycle math as adafruit_motor.servo and adafruit_pca9685
+        self._min_duty = int((min_pulse * frequency) / 1000000 * 0xFFFF)
+        max_duty = (max_pulse * frequency) / 1000000 * 0xFFFF
+        self._duty_range = int(max_duty - self._min_duty)
+
+    def to_counts(self, angle: float) -> int:
+        """Convert an angle to the 12 bit off count of a PWM channel."""
+        fraction = max(0.0, min(1.0, angle / self.actuation_range))
+        duty_cycle = self._min_duty + int(fraction * self._duty_range)
+        return (duty_cycle + 1) >> 4
+
+    def invalidate(self) -> None:
+        """Forget the written values so the next update writes every channel."""
+        self._angles.clear()
+        self._counts.clear()
+
+    def write(self, angles: Dict[int, float]) -> WriteStats:
+        """Write the given angles by channel, skipping unchanged channels."""
+        changed: Dict[int, int] = {}
+        for channel, angle in angles.items():
+            counts = self.to_counts(angle)
+            last_angle = self._angles.get(channel)
+            if last_angle is not None and (
+                counts == self._counts[channel]
+                or abs(angle - last_angle) < self.dead_band
+            ):
+                continue
+            changed[channel] = counts
+            self._angles[channel] = angle
+
+        stats = WriteStats(channels=len(changed))
+        if not changed:
+            return stats
+
+        if self._device is None:
+            for channel in changed:
+                self.kit.servo[channel].angle = self._angles[channel]
+                stats.transactions += 1
+                stats.bytes += 1 + self.REGISTER_BYTES
+            self._counts.update(changed)
+            return stats
+
+        self._counts.update(changed)
+        for first, last in self._runs(sorted(changed)):
+            buffer = bytearray(
+                [self.LED0_ON_L + self.REGISTER_BYTES * first]
+            )
+            for channel in range(first, last + 1):
+                # ON count 0, OFF count as little endian 16 bit words
+                counts = self._counts[channel]
+                buffer += bytes((0, 0, counts & 0xFF, counts >> 8))
+            with self._device as i2c:
+                i2c.write(buffer)
+            stats.transactions += 1
+            stats.bytes += len(buffer)
+        return stats
+
+    def _runs(self, channels: List[int]) -> List[Tuple[int, int]]:
+        """Group sorted channels into ranges that are written as one block."""
+        runs: List[Tuple[int, int]] = []
+        for channel in channels:
+            if runs:
+                first, last = runs[-1]
+                gap = range(last + 1, channel)
+                if len(gap) <= self.max_gap and all(
+                    idx in self._counts for idx in gap
+                ):
+                    runs[-1] = (first, channel)
+                    continue
+            runs.append((channel, channel))
+        return runs
+
+
+@dataclass
+class OutputFrame:
+    """Hardware state computed by one tick."""
+
+    angles: Dict[int, float] = field(default_factory=dict)
+    gpio_levels: Dict[int, bool] = field(default_factory=dict)
+
+
+@dataclass
+class WriterStats:
+    """Timing statistics of an OutputWriter, all times in seconds."""
+
+    frames: int = 0
+    dropped: int = 0
+    errors: int = 0
+    last_latency: float = 0.0
+    last_duration: float = 0.0
+    mean_duration: float = 0.0
+    max_duration: float = 0.0
+
+
+class OutputWriter:
+    """Thread writing the latest OutputFrame to the hardware.
+
+    Frames are passed through a single slot mailbox. If the bus is slower
+    than the animation loop, frames that were not written yet are replaced
+    by newer ones instead of queueing up.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[OutputFrame], None],
+        smoothing: float = 0.05,
+        name: str = "output-writer",
+    ) -> None:
+        """Initialize the OutputWriter.
+
+        Args:
+            write: Function writing a frame to the hardware.
+            smoothing: Weight of the newest sample in the mean duration.
+            name: Name of the writer thread.
+        """
+        self._write = write
+        self._smoothing = smoothing
+        self._name = name
+        self._mailbox: Mailbox[OutputFrame] = Mailbox()
+        self._thread: Optional[Thread] = None
+        self.stats = WriterStats()
+
+    @property
+    def running(self) -> bool:
+        """Whether the writer thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self.running:
+            return
+        self._mailbox = Mailbox()
+        self._thread = Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame: OutputFrame) -> None:
+        """Hand a frame to the writer, replacing a frame not written yet."""
+        self._mailbox.put(frame)
+        self.stats.dropped = self._mailbox.dropped
+
+    def stop(self, timeout: Optional[float] = 1.0) -> None:
+        """Write the pending frame, if any, and stop the writer thread."""
+        self._mailbox.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("Output writer did not stop in time")
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            taken = self._mailbox.take()
+            if taken is None:
+                return
+            frame, stamp = taken
+            start = time.monotonic()
+            try:
+                self._write(frame)
+            except Exception as e:
+                self.stats.errors += 1
+                logger.error(f"Error in output writer: {str(e)}")
+                logger.debug(traceback.format_exc())
+            self._record(start - stamp, time.monotonic() - start)
+
+    def _record(self, latency: float, duration: float) -> None:
+        stats = self.stats
+        stats.frames += 1
+        stats.last_latency = latency
+        stats.last_duration = duration
+        stats.max_duration = max(stats.max_duration, duration)
+        stats.mean_duration += self._smoothing * (duration - stats.mean_duration)
+
+
 class ServoKitIoController(IoController):
-    """IoController implementation for ServoKit hardware."""
+    """IoController implementation for ServoKit hardware.
+
+    While used as a context manager, the hardware writes run on an
+    OutputWriter thread so slow bus transactions do not stall the animation
+    loop. Outside of a ``with`` block frames are written inline.
+    """
 
     def __init__(
         self,
         servos: Sequence[Servo],
         constraints: Sequence[Constraint],
         channels: int = 16,
+        dead_band: float = 0.0,
+        threaded: bool = True,
     ) -> None:
         super().__init__(servos, constraints)
+        self._gpio_levels: Dict[int, bool] = {}
+        self.write_stats = WriteStats()
+        self.total_write_stats = WriteStats()
+        self.threaded = threaded
+        self.writer = OutputWriter(self._write_frame, name="servokit-writer")
         try:
-            self.kit = ServoKit(channels=channels)
+            self.kit = self._create_kit(channels)
+            self.output = Pca9685OutputStage(self.kit, dead_band=dead_band)
             self._initialize_servos()
         except Exception as e:
             raise e
@@ -187,12 +586,26 @@ class ServoKitIoController(IoController):
             logger.debug(traceback.format_exc())
             raise ServoError(f"ServoKit initialization failed: {str(e)}")
 
+    def _create_kit(self, channels: int) -> "ServoKit":
+        """Create the ServoKit driving the PCA9685."""
+        if ServoKit is None:
+            raise ServoError("adafruit_servokit is not installed")
+        return ServoKit(channels=channels)
+
+    def _setup_gpio(self, pin: int) -> None:
+        """Configure a GPIO pin as output."""
+        GPIO.setup(pin, GPIO.OUT)
+
+    def _output_gpio(self, pin: int, level: bool) -> None:
+        """Set the level of a GPIO output pin."""
+        GPIO.output(pin, level)
+
     def _initialize_servos(self) -> None:
         """Initialize all servos with their starting positions."""
         for servo in self.servos.values():
             try:
                 if servo.binary:
-                    GPIO.setup(servo.gpio_pin, GPIO.OUT)
+                    self._setup_gpio(servo.gpio_pin)
                 else:
                     current_angle = self.kit.servo[servo.gpio_pin].angle
                     servo.position = current_angle if current_angle is not None else 90
@@ -201,21 +614,48 @@ class ServoKitIoController(IoController):
                 logger.debug(traceback.format_exc())
 
     def tick(self, delta_time: float) -> None:
-        """Update servo positions on hardware."""
+        """Update servo positions and hand the resulting frame to the hardware."""
         super().tick(delta_time)
+        frame = OutputFrame()
         for servo in self.servos.values():
+            if servo.binary:
+                frame.gpio_levels[servo.gpio_pin] = servo.position > 90
+            else:
+                frame.angles[servo.gpio_pin] = max(0, min(180, servo.position))
+
+        if self.writer.running:
+            self.writer.submit(frame)
+        else:
+            self._write_frame(frame)
+
+    def _write_frame(self, frame: OutputFrame) -> None:
+        """Write a frame to the hardware, skipping unchanged channels."""
+        gpio_writes = 0
+        for pin, level in frame.gpio_levels.items():
             try:
-                angle = servo.position
-                if servo.binary:
-                    GPIO.output(servo.gpio_pin, angle > 90)
-                else:
-                    angle = max(0, min(180, angle))
-                    self.kit.servo[servo.gpio_pin].angle = angle
+                if self._gpio_levels.get(pin) != level:
+                    self._output_gpio(pin, level)
+                    self._gpio_levels[pin] = level
+                    gpio_writes += 1
             except Exception as e:
-                logger.error(f"Error setting position for servo {servo.name}: {str(e)}")
+                logger.error(f"Error setting GPIO {pin}: {str(e)}")
                 logger.debug(traceback.format_exc())
 
+        try:
+            write_stats = self.output.write(frame.angles)
+        except Exception as e:
+            # The chip state is unknown after a failed write, resend everything
+            self.output.invalidate()
+            write_stats = WriteStats()
+            logger.error(f"Error writing servo positions: {str(e)}")
+            logger.debug(traceback.format_exc())
+        write_stats.gpio_writes = gpio_writes
+        self.total_write_stats.add(write_stats)
+        self.write_stats = write_stats
+
     def __enter__(self) -> "ServoKitIoController":
+        if self.threaded:
+            self.writer.start()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback) -> None:
@@ -224,7 +664,90 @@ class ServoKitIoController(IoController):
                 if servo.binary:
                     servo.set_target(0)
                     servo.position = 0
-                self.tick(0.01)
+            self.tick(0.01)
         except Exception as e:
             logger.error(f"Error in cleanup: {str(e)}")
-            logger.debug(traceback.format_exc())
+        finally:
+            # Flushes the final frame before the thread exits
+            self.writer.stop()
+
+
+class RecordingI2CDevice:
+    """Stand-in for an I2C device that records the buffers written to it."""
+
+    def __init__(self, max_records: Optional[int] = None) -> None:
+        self.writes: Deque[bytes] = deque(maxlen=max_records)
+
+    def __enter__(self) -> "RecordingI2CDevice":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    def write(self, buffer: bytes) -> None:
+        """Record a write transaction."""
+        self.writes.append(bytes(buffer))
+
+
+class SimulatedServo:
+    """Stand-in for a ServoKit servo channel."""
+
+    def __init__(self) -> None:
+        self.angle: Optional[float] = None
+
+
+class SimulatedPca9685:
+    """Stand-in for the PCA9685 driver of a ServoKit."""
+
+    def __init__(self, frequency: float, device: RecordingI2CDevice) -> None:
+        self.frequency = frequency
+        self.i2c_device = device
+
+
+class SimulatedServoKit:
+    """Stand-in for ServoKit recording all bus writes."""
+
+    def __init__(
+        self, channels: int, frequency: float = 50, max_records: Optional[int] = None
+    ) -> None:
+        self._pca = SimulatedPca9685(frequency, RecordingI2CDevice(max_records))
+        self.servo = [SimulatedServo() for _ in range(channels)]
+
+
+class SimulatedIoController(ServoKitIoController):
+    """ServoKitIoController without hardware, for profiling and development.
+
+    Servo writes go through the same output stage as on the Pi and are
+    recorded as raw I2C buffers in ``i2c_writes``. GPIO writes are recorded
+    as ``(pin, level)`` tuples in ``gpio_writes``. Frames are written inline
+    unless ``threaded`` is set.
+    """
+
+    def __init__(
+        self,
+        servos: Sequence[Servo],
+        constraints: Sequence[Constraint],
+        channels: int = 16,
+        dead_band: float = 0.0,
+        threaded: bool = False,
+        max_records: Optional[int] = 10000,
+    ) -> None:
+        self.max_records = max_records
+        self.gpio_writes: Deque[Tuple[int, bool]] = deque(maxlen=max_records)
+        super().__init__(
+            servos, constraints, channels, dead_band=dead_band, threaded=threaded
+        )
+
+    @property
+    def i2c_writes(self) -> Deque[bytes]:
+        """Raw buffers written to the simulated PCA9685."""
+        return self.kit._pca.i2c_device.writes
+
+    def _create_kit(self, channels: int) -> SimulatedServoKit:
+        return SimulatedServoKit(channels, max_records=self.max_records)
+
+    def _setup_gpio(self, pin: int) -> None:
+        pass
+
+    def _output_gpio(self, pin: int, level: bool) -> None:
+        self.gpio_writes.append((pin, level))
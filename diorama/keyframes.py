@@ -0,0 +1,456 @@
+"""Compact binary keyframe files, a lossless encoding of the editor's JSON.
+
+The editor stores every keyframe as a dict repeating all servo names. The
+binary format stores the names once and the values as one typed block, so
+files are small and load without parsing or building dicts.
+
+File layout (little endian):
+    header       magic, version, value type, flags, fps, total frames,
+                 keyframe count, channel count and the extra JSON length
+    channels     per channel a uint16 byte length and the UTF-8 name
+    extra        UTF-8 JSON with all other fields of the editor JSON,
+                 e.g. ``currentFrameIndex``, empty if there are none
+    frames       keyframes x int32 frame indices
+    presence     keyframes x channels bits, set where a keyframe has a value
+    values       the present values in row order as uint8, int32, float32
+                 or float64, the smallest type that holds them exactly
+    integers     only if integers and floats are mixed, one bit per present
+                 value, set where the JSON had an integer
+
+Usage:
+    python -m diorama.keyframes animations/test.json
+    python -m diorama.keyframes --to-json animations/test.keyframes
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+KEYFRAMES_EXTENSION = ".keyframes"
+MAGIC = b"DRKF"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBdIIHxxI")
+VALUE_TYPES = {
+    1: np.dtype("u1"),
+    2: np.dtype("<i4"),
+    3: np.dtype("<f4"),
+    4: np.dtype("<f8"),
+}
+# Flags restoring the JSON number types
+FLAG_INTEGER_VALUES = 1
+FLAG_INTEGER_FPS = 2
+FLAG_MIXED_VALUES = 4
+
+# Limits of the stored frame numbers and of integers a float64 holds exactly
+INT32_MIN, INT32_MAX = -(2**31), 2**31 - 1
+UINT32_MAX = 2**32 - 1
+MAX_EXACT_INT = 2**53
+
+KNOWN_KEYFRAME_KEYS = ("frameIndex", "values")
+KNOWN_CONFIG_KEYS = ("totalFrames", "fps")
+
+
+class KeyframeFormatError(Exception):
+    """Exception raised for invalid keyframe files or unencodable animations."""
+
+    pass
+
+
+@dataclass
+class KeyframeData:
+    """Keyframes of an animation in array form.
+
+    Attributes:
+        fps: Frame rate of the frame indices
+        total_frames: Loop length in frames
+        channels: Channel names of the value columns
+        frame_indices: Frame index of every keyframe, in file order
+        values: Keyframes x channels values, NaN where a keyframe sets none
+        integer_values: Whether the JSON values were integers
+        integer_fps: Whether the JSON fps was an integer
+        integer_cells: Cells whose JSON value was an integer, only set if
+            integers and floats are mixed
+        extra: All other JSON fields, see ``to_json``
+    """
+
+    fps: float
+    total_frames: int
+    channels: List[str]
+    frame_indices: NDArray
+    values: NDArray
+    integer_values: bool = True
+    integer_fps: bool = True
+    extra: Dict[str, Any] = field(default_factory=dict)
+    integer_cells: Optional[NDArray] = None
+
+    @classmethod
+    def from_json(cls, animation: Dict[str, Any]) -> "KeyframeData":
+        """Convert the editor's animation JSON.
+
+        Raises:
+            KeyframeFormatError: If the animation cannot be stored exactly.
+        """
+        try:
+            config = animation["config"]
+            keyframes = animation["keyframes"]
+            fps = config["fps"]
+            total_frames = config["totalFrames"]
+        except (KeyError, TypeError) as e:
+            raise KeyframeFormatError(f"Missing animation field {e}")
+
+        channels: Dict[str, int] = {}
+        for keyframe in keyframes:
+            for name in keyframe["values"]:
+                channels.setdefault(name, len(channels))
+
+        frame_indices = np.empty(len(keyframes), dtype=np.int32)
+        values = np.full((len(keyframes), len(channels)), np.nan)
+        integer_cells = np.zeros(values.shape, dtype=bool)
+        extra_keyframes = {}
+        for row, keyframe in enumerate(keyframes):
+            frame_index = keyframe["frameIndex"]
+            if not _is_int(frame_index):
+                raise KeyframeFormatError(f"Frame index {frame_index!r} is no integer")
+            if not INT32_MIN <= frame_index <= INT32_MAX:
+                raise KeyframeFormatError(f"Frame index {frame_index} is out of range")
+            frame_indices[row] = frame_index
+            for name, value in keyframe["values"].items():
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    raise KeyframeFormatError(f"Value {value!r} of {name} is no number")
+                if _is_int(value) and abs(value) > MAX_EXACT_INT:
+                    raise KeyframeFormatError(f"Value {value} of {name} is too large")
+                integer_cells[row, channels[name]] = _is_int(value)
+                values[row, channels[name]] = value
+            other = {k: v for k, v in keyframe.items() if k not in KNOWN_KEYFRAME_KEYS}
+            if other:
+                extra_keyframes[str(row)] = other
+
+        if not _is_int(total_frames) or not 0 <= total_frames <= UINT32_MAX:
+            raise KeyframeFormatError(f"Total frames {total_frames!r} is invalid")
+        if not isinstance(fps, (int, float)) or isinstance(fps, bool):
+            raise KeyframeFormatError(f"Frame rate {fps!r} is invalid")
+
+        extra: Dict[str, Any] = {}
+        other = {k: v for k, v in animation.items() if k not in ("keyframes", "config")}
+        if other:
+            extra["animation"] = other
+        other = {k: v for k, v in config.items() if k not in KNOWN_CONFIG_KEYS}
+        if other:
+            extra["config"] = other
+        if extra_keyframes:
+            extra["keyframes"] = extra_keyframes
+
+        present = ~np.isnan(values)
+        integer_values = bool(np.all(integer_cells[present]))
+        mixed = not integer_values and bool(np.any(integer_cells))
+        return cls(
+            fps=float(fps),
+            total_frames=int(total_frames),
+            channels=list(channels),
+            frame_indices=frame_indices,
+            values=values,
+            integer_values=integer_values,
+            integer_fps=_is_int(fps),
+            extra=extra,
+            integer_cells=integer_cells if mixed else None,
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        """Convert back to the editor's animation JSON."""
+        if self.integer_cells is not None:
+            integer_cells = self.integer_cells.tolist()
+        else:
+            integer_cells = [[self.integer_values] * len(self.channels)] * len(
+                self.values
+            )
+        extra_keyframes = self.extra.get("keyframes", {})
+        keyframes = []
+        for row, (frame_index, values, integers) in enumerate(
+            zip(self.frame_indices.tolist(), self.values.tolist(), integer_cells)
+        ):
+            keyframe = {
+                "frameIndex": frame_index,
+                "values": {
+                    name: int(value) if integer else value
+                    for name, value, integer in zip(self.channels, values, integers)
+                    if value == value
+                },
+            }
+            keyframe.update(extra_keyframes.get(str(row), {}))
+            keyframes.append(keyframe)
+
+        config = {
+            "totalFrames": self.total_frames,
+            "fps": int(self.fps) if self.integer_fps else self.fps,
+            **self.extra.get("config", {}),
+        }
+        return {
+            "keyframes": keyframes,
+            "config": config,
+            **self.extra.get("animation", {}),
+        }
+
+    def compile(self) -> Tuple[NDArray, NDArray, List[str]]:
+        """Prepare the keyframes for playback like ``KeyFrameAnimation`` does.
+
+        Keyframes outside the loop are dropped, the rest is sorted by frame
+        and wrapped around with the last and first keyframe.
+
+        Returns:
+            Tuple of keyframe times, values and channel names for a
+            ``KeyFrameTrack``
+        """
+        frames = self.frame_indices
+        keep = np.flatnonzero((frames >= 0) & (frames <= self.total_frames))
+        if not len(keep):
+            raise KeyframeFormatError("Animation has no keyframes within its frames")
+        order = keep[np.argsort(frames[keep], kind="stable")]
+        order = np.concatenate([order[-1:], order, order[:1]])
+
+        frame_times = frames[order].astype(np.float64)
+        frame_times[0] -= self.total_frames
+        frame_times[-1] += self.total_frames
+        values = self.values[order]
+
+        # Channels only set by dropped keyframes do not exist for playback
+        used = ~np.all(np.isnan(values), axis=0)
+        channels = [name for name, is_used in zip(self.channels, used) if is_used]
+        return frame_times / self.fps, values[:, used], channels
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _value_type(values: NDArray, integer: bool) -> int:
+    """Smallest value type code that stores ``values`` exactly."""
+    if integer:
+        if not values.size or (values.min() >= 0 and values.max() <= 255):
+            return 1
+        if values.min() >= -(2**31) and values.max() < 2**31:
+            return 2
+        return 4
+    if np.array_equal(values.astype(np.float32), values):
+        return 3
+    return 4
+
+
+def encode_keyframes(data: KeyframeData) -> bytes:
+    """Encode keyframes in the binary format.
+
+    Raises:
+        KeyframeFormatError: If a name, count or frame number exceeds the
+            limits of the format.
+    """
+    present = ~np.isnan(data.values)
+    values = data.values[present]
+    code = _value_type(values, data.integer_values)
+    flags = (FLAG_INTEGER_VALUES if data.integer_values else 0) | (
+        FLAG_INTEGER_FPS if data.integer_fps else 0
+    )
+    integers = b""
+    if data.integer_cells is not None:
+        flags |= FLAG_MIXED_VALUES
+        integers = np.packbits(data.integer_cells[present], bitorder="little").tobytes()
+
+    extra = json.dumps(data.extra).encode("utf-8") if data.extra else b""
+    try:
+        table = bytearray()
+        for name in data.channels:
+            encoded = name.encode("utf-8")
+            table += struct.pack("<H", len(encoded)) + encoded
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            code,
+            flags,
+            data.fps,
+            data.total_frames,
+            len(data.frame_indices),
+            len(data.channels),
+            len(extra),
+        )
+    except struct.error as e:
+        raise KeyframeFormatError(f"Animation exceeds the format limits: {e}")
+    return b"".join(
+        (
+            header,
+            bytes(table),
+            extra,
+            data.frame_indices.astype("<i4").tobytes(),
+            np.packbits(present, axis=None, bitorder="little").tobytes(),
+            values.astype(VALUE_TYPES[code]).tobytes(),
+            integers,
+        )
+    )
+
+
+def decode_keyframes(buffer: bytes) -> KeyframeData:
+    """Decode keyframes from the binary format."""
+    if len(buffer) < HEADER.size:
+        raise KeyframeFormatError("Too short for a keyframe file")
+    (
+        magic,
+        version,
+        code,
+        flags,
+        fps,
+        total_frames,
+        n_keyframes,
+        n_channels,
+        extra_length,
+    ) = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION or code not in VALUE_TYPES:
+        raise KeyframeFormatError("Not a supported keyframe file")
+
+    try:
+        offset = HEADER.size
+        channels = []
+        for _ in range(n_channels):
+            (length,) = struct.unpack_from("<H", buffer, offset)
+            channels.append(buffer[offset + 2 : offset + 2 + length].decode("utf-8"))
+            offset += 2 + length
+        extra = {}
+        if extra_length:
+            extra = json.loads(buffer[offset : offset + extra_length])
+            offset += extra_length
+
+        frame_indices = np.frombuffer(buffer, "<i4", n_keyframes, offset)
+        offset += frame_indices.nbytes
+        n_cells = n_keyframes * n_channels
+        packed = np.frombuffer(buffer, np.uint8, (n_cells + 7) // 8, offset)
+        offset += packed.nbytes
+        present = np.unpackbits(packed, count=n_cells, bitorder="little").astype(bool)
+        value_type = VALUE_TYPES[code]
+        n_present = int(present.sum())
+        stored = np.frombuffer(buffer, value_type, n_present, offset)
+        offset += stored.nbytes
+        integer_cells = None
+        if flags & FLAG_MIXED_VALUES:
+            packed = np.frombuffer(buffer, np.uint8, (n_present + 7) // 8, offset)
+            integer_cells = np.zeros(n_cells, dtype=bool)
+            integer_cells[present] = np.unpackbits(
+                packed, count=n_present, bitorder="little"
+            ).astype(bool)
+            integer_cells = integer_cells.reshape(n_keyframes, n_channels)
+    except (struct.error, ValueError, UnicodeDecodeError) as e:
+        raise KeyframeFormatError(f"Truncated or corrupt keyframe file: {e}")
+
+    values = np.full(n_cells, np.nan)
+    values[present] = stored
+    return KeyframeData(
+        fps=fps,
+        total_frames=total_frames,
+        channels=channels,
+        frame_indices=frame_indices.astype(np.int32),
+        values=values.reshape(n_keyframes, n_channels),
+        integer_values=bool(flags & FLAG_INTEGER_VALUES),
+        integer_fps=bool(flags & FLAG_INTEGER_FPS),
+        extra=extra,
+        integer_cells=integer_cells,
+    )
+
+
+def is_keyframes_file(file_path: str) -> bool:
+    """Whether the file starts like a binary keyframe file."""
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_keyframes(file_path: str) -> KeyframeData:
+    """Read a binary keyframe file."""
+    with open(file_path, "rb") as f:
+        buffer = f.read()
+    try:
+        return decode_keyframes(buffer)
+    except KeyframeFormatError as e:
+        raise KeyframeFormatError(f"{file_path}: {e}")
+
+
+def write_keyframes(file_path: str, data: KeyframeData) -> None:
+    """Write a binary keyframe file, replacing it atomically."""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_keyframes(data))
+    os.replace(tmp_path, file_path)
+
+
+def write_json(file_path: str, data: KeyframeData) -> None:
+    """Write keyframes as the editor's JSON, replacing the file atomically."""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data.to_json(), f, indent=4)
+    os.replace(tmp_path, file_path)
+
+
+def keyframes_path(file_path: str) -> str:
+    """Return the binary keyframe file that belongs to a JSON animation."""
+    return os.path.splitext(file_path)[0] + KEYFRAMES_EXTENSION
+
+
+def main() -> int:
+    """Convert animations between the editor's JSON and the binary format."""
+    parser = argparse.ArgumentParser(
+        description="Convert animations to binary keyframe files and back."
+    )
+    parser.add_argument("paths", nargs="+", help="Animation files or folders")
+    parser.add_argument(
+        "--to-json",
+        action="store_true",
+        help="Convert binary keyframe files back to JSON",
+    )
+    args = parser.parse_args()
+
+    source_ext = KEYFRAMES_EXTENSION if args.to_json else ".json"
+    failed = False
+    for path in args.paths:
+        if os.path.isdir(path):
+            files = [
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.endswith(source_ext)
+            ]
+        else:
+            files = [path]
+        for file_path in files:
+            try:
+                if args.to_json:
+                    target = os.path.splitext(file_path)[0] + ".json"
+                    data = read_keyframes(file_path)
+                    if os.path.exists(target):
+                        print(f"Replacing existing {target}")
+                    write_json(target, data)
+                else:
+                    target = keyframes_path(file_path)
+                    with open(file_path) as f:
+                        data = KeyframeData.from_json(json.load(f))
+                    write_keyframes(target, data)
+                print(f"Converted {file_path} -> {target}")
+            except (
+                KeyframeFormatError,
+                ValueError,
+                OverflowError,
+                struct.error,
+                OSError,
+            ) as e:
+                print(f"Failed to convert {file_path}: {e}")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Lazily loaded, hot reloading library of dance files."""
+
+import bisect
+import logging
+import os
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock, Thread
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from diorama.keyframes import KEYFRAMES_EXTENSION
+from diorama.timeline import TIMELINE_EXTENSION, timeline_path
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def list_dances(directory: str) -> List[Tuple[str, str]]:
+    """List the dances of a directory in playback order.
+
+    Dances are JSON or binary keyframe files. A binary file next to a JSON
+    file of the same name is loaded instead of the JSON, unless the JSON was
+    modified after converting. Dances baked with ``python -m diorama.timeline``
+    are likewise loaded from their timeline, unless the source file was
+    modified after baking.
+
+    Returns:
+        Tuples of the dance name, i.e. the file name of its JSON, binary
+        keyframe file or timeline, and the path of the file to load
+    """
+    dances = []
+    for name in sorted(os.listdir(directory)):
+        file_path = os.path.join(directory, name)
+        stem = os.path.splitext(file_path)[0]
+        if name.endswith(KEYFRAMES_EXTENSION) and os.path.exists(stem + ".json"):
+            # Listed under the name of its JSON
+            continue
+        if name.endswith((".json", KEYFRAMES_EXTENSION)):
+            for derived in (stem + KEYFRAMES_EXTENSION, timeline_path(file_path)):
+                if (
+                    derived != file_path
+                    and os.path.exists(derived)
+                    and os.path.getmtime(derived) >= os.path.getmtime(file_path)
+                ):
+                    file_path = derived
+        elif (
+            not name.endswith(TIMELINE_EXTENSION)
+            or os.path.exists(stem + ".json")
+            or os.path.exists(stem + KEYFRAMES_EXTENSION)
+        ):
+            continue
+        dances.append((name, file_path))
+    return dances
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate the heap bytes held by a compiled dance.
+
+    Numpy arrays count with their buffers, memory mapped timelines are not
+    counted since their pages belong to the file cache.
+    """
+    if isinstance(value, np.memmap):
+        return sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (0 if value.base is not None else value.nbytes)
+    size = sys.getsizeof(value)
+    if _depth > 6:
+        return size
+    if isinstance(value, dict):
+        return size + sum(estimate_size(item, _depth + 1) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return size + sum(estimate_size(item, _depth + 1) for item in value)
+    if hasattr(value, "__dict__"):
+        return size + estimate_size(vars(value), _depth + 1)
+    return size
+
+
+@dataclass
+class DanceEntry:
+    """A dance file known to the library."""
+
+    name: str
+    path: str
+    mtime_ns: int
+    size: int
+
+
+@dataclass
+class DanceLibraryStats:
+    """Usage of a DanceLibrary, sizes in bytes."""
+
+    dances: int = 0
+    cached_dances: int = 0
+    cached_bytes: int = 0
+    hits: int = 0
+    loads: int = 0
+    prefetches: int = 0
+    evictions: int = 0
+    failed_loads: int = 0
+    scans: int = 0
+
+
+class DanceLibrary:
+    """Index of a dance directory that loads dances only when they play.
+
+    The directory is indexed by file name, modification time and size.
+    Dances are loaded on first use, or ahead of time with ``prefetch``, and
+    kept in a least recently used cache bounded by ``max_bytes``. A file
+    changed on disk is loaded again the next time it is used. ``scan``
+    picks up added and deleted files and can run in the background with
+    ``refresh``, so the animation loop never waits for the disk unless a
+    dance was neither cached nor prefetched.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        loader: Callable[[str], Any],
+        max_bytes: int = 16 * 1024 * 1024,
+        on_load: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        """Initialize the library and index the directory.
+
+        Args:
+            directory: Directory with the dance files.
+            loader: Function loading a dance from a path, e.g.
+                ``KeyFrameAnimation.from_path``.
+            max_bytes: Memory bound of the cached dances. The dance returned
+                last is kept even if it alone exceeds the bound.
+            on_load: Function called with every loaded dance before it is
+                cached, e.g. to validate it.
+        """
+        self.directory = directory
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.on_load = on_load
+        self.stats = DanceLibraryStats()
+        # Increased whenever dances were added or deleted
+        self.version = 0
+
+        self._entries: List[DanceEntry] = []
+        self._names: List[str] = []
+        self._cache: "OrderedDict[str, Tuple[DanceEntry, Any, int]]" = OrderedDict()
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self._worker: Optional[Thread] = None
+        self._worker_request: Optional[Tuple[bool, Optional[str]]] = None
+        self.scan()
+
+    @property
+    def names(self) -> List[str]:
+        """Names of the dances in playback order."""
+        return self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def position(self, name: Optional[str]) -> int:
+        """Index of ``name``, or of the dance following it if it was deleted."""
+        names = self._names
+        if not names or name is None:
+            return 0
+        idx = bisect.bisect_left(names, name)
+        return idx if idx < len(names) else 0
+
+    def scan(self) -> bool:
+        """Update the index from the directory.
+
+        Returns:
+            Whether dances were added or deleted
+        """
+        entries = []
+        try:
+            for name, path in list_dances(self.directory):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append(DanceEntry(name, path, stat.st_mtime_ns, stat.st_size))
+        except OSError as e:
+            logger.error(f"Could not scan dances in {self.directory}: {e}")
+            return False
+
+        names = [entry.name for entry in entries]
+        with self._lock:
+            self.stats.scans += 1
+            changed = names != self._names
+            self._entries, self._names = entries, names
+            # Drop dances whose file is gone, changed files are reloaded on use
+            for name in set(self._cache) - set(names):
+                self._drop(name)
+            if changed:
+                self.version += 1
+            self.stats.dances = len(entries)
+        if changed:
+            logger.info(f"Indexed {len(entries)} dances in {self.directory}")
+        return changed
+
+    def get(self, index: int) -> Any:
+        """Return the dance at ``index``, loading it if it is not cached.
+
+        Raises:
+            IndexError: If the library has no dance at ``index``.
+        """
+        entry = self._entries[index]
+        dance = self._cached(entry)
+        if dance is not None:
+            with self._lock:
+                self.stats.hits += 1
+            return dance
+        logger.debug(f"Dance {entry.name} was not prefetched")
+        return self._load(entry)
+
+    def prefetch(self, name: Optional[str]) -> None:
+        """Load the dance ``name``, or the one following it, in the background."""
+        self._request(scan=False, name=name)
+
+    def refresh(self, prefetch: Optional[str] = None) -> None:
+        """Scan the directory in the background, then prefetch a dance.
+
+        Args:
+            prefetch: Name of the dance to prefetch after the scan, the
+                following one is prefetched if it was deleted.
+        """
+        self._request(scan=True, name=prefetch)
+
+    def _request(self, scan: bool, name: Optional[str]) -> None:
+        with self._lock:
+            if self._worker_request is not None:
+                scan = scan or self._worker_request[0]
+                if name is None:
+                    name = self._worker_request[1]
+            self._worker_request = (scan, name)
+            if self._worker is None:
+                self._worker = Thread(target=self._work, daemon=True)
+                self._worker.start()
+
+    def _work(self) -> None:
+        """Worker thread handling background scans and prefetches."""
+        while True:
+            with self._lock:
+                request, self._worker_request = self._worker_request, None
+                if request is None:
+                    self._worker = None
+                    return
+            scan, name = request
+            if scan:
+                self.scan()
+            entries = self._entries
+            if name is None or not entries:
+                continue
+            entry = entries[self.position(name)]
+            if self._cached(entry) is None:
+                try:
+                    self._load(entry)
+                    with self._lock:
+                        self.stats.prefetches += 1
+                except Exception as e:
+                    logger.error(f"Could not prefetch dance {entry.name}: {e}")
+
+    def _cached(self, entry: DanceEntry) -> Optional[Any]:
+        with self._lock:
+            cached = self._cache.get(entry.name)
+            if cached is None or cached[0] != entry:
+                return None
+            self._cache.move_to_end(entry.name)
+            return cached[1]
+
+    def _load(self, entry: DanceEntry) -> Any:
+        # One load at a time, a prefetch in progress is waited for instead
+        with self._load_lock:
+            dance = self._cached(entry)
+            if dance is not None:
+                return dance
+            try:
+                dance = self.loader(entry.path)
+                if self.on_load is not None:
+                    self.on_load(dance)
+            except Exception:
+                with self._lock:
+                    self.stats.failed_loads += 1
+                raise
+            size = estimate_size(dance)
+
+            with self._lock:
+                self.stats.loads += 1
+                if entry.name in self._cache:
+                    self._drop(entry.name)
+                self._cache[entry.name] = (entry, dance, size)
+                self.stats.cached_bytes += size
+                # Evict least recently used dances, never the new one
+                while self.stats.cached_bytes > self.max_bytes and len(self._cache) > 1:
+                    name = next(iter(self._cache))
+                    self._drop(name)
+                    self.stats.evictions += 1
+                self.stats.cached_dances = len(self._cache)
+            logger.debug(f"Loaded dance {entry.name} ({size} bytes)")
+            return dance
+
+    def _drop(self, name: str) -> None:
+        _, _, size = self._cache.pop(name)
+        self.stats.cached_bytes -= size
+        self.stats.cached_dances = len(self._cache)
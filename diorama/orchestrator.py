@@ -2,8 +2,9 @@
 
 import logging
 import traceback
-from typing import Dict, List
+from typing import List
 from diorama.animation import Animation
+from diorama.blend import ServoBlender
 from diorama.io import IoController
 
 # Configure logging
@@ -26,6 +27,14 @@ class Orchestrator:
         self._io_controller = io_controller
         self._fps = fps
         self._animations: List[Animation] = []
+        self._blender = ServoBlender(io_controller.servos.values())
+        self._order_dirty = False
+        self._verified = False
+
+    @property
+    def fps(self) -> float:
+        """Target frames per second for animation updates."""
+        return self._fps
 
     def add(self, animation: Animation) -> None:
         """Add an animation to the orchestrator.
@@ -35,6 +44,8 @@ class Orchestrator:
         """
         try:
             self._animations.append(animation)
+            animation.add_priority_listener(self._invalidate_order)
+            self._order_dirty = True
             logger.info(f"Added animation: {animation.__class__.__name__}")
         except Exception as exc:
             logger.error("Failed to add animation", exc_info=True)
@@ -51,6 +62,7 @@ class Orchestrator:
         """
         try:
             self._animations.remove(animation)
+            animation.remove_priority_listener(self._invalidate_order)
             logger.info(f"Removed animation: {animation.__class__.__name__}")
         except ValueError:
             logger.error(
@@ -62,38 +74,64 @@ class Orchestrator:
             logger.error("Unexpected error while removing animation", exc_info=True)
             raise
 
+    def _invalidate_order(self, animation: Animation) -> None:
+        """Mark the priority order as stale after a priority change."""
+        self._order_dirty = True
+
+    def _evaluate(self, animation: Animation, delta: float) -> None:
+        """Tick a single animation and push its output to the blender."""
+        blender = self._blender
+        channels = animation.channels
+
+        if blender.fully_covered or (
+            channels is not None and blender.is_covered(channels)
+        ):
+            animation.advance(delta)
+        elif animation.dormant:
+            # Strength 0 keeps all values, only the covered servos are marked
+            if channels is not None:
+                mask = animation.tick_mask(delta)
+                if mask is not None:
+                    blender.touch_array(channels, mask)
+            else:
+                blender.touch_dict(animation.tick(delta))
+        elif channels is not None:
+            sample = animation.tick_array(delta)
+            if sample is not None:
+                self._verified &= animation.constraint_safe
+                blender.push_array(animation.strength, channels, *sample)
+        else:
+            values = animation.tick(delta)
+            self._verified &= animation.constraint_safe
+            blender.push_dict(animation.strength, values)
+
     def tick(self, delta: float) -> None:
         """Update all animations and apply their effects to servos.
 
+        Animations are evaluated from the highest priority downward. Once a
+        servo is covered by an animation at full strength, lower priorities
+        no longer contribute to it, and animations whose servos are all
+        covered, as well as dormant ones, only advance their clocks. The
+        resulting targets are the same as blending every animation.
+
         Args:
             delta: Time elapsed since last tick in seconds.
         """
         try:
-            # Sort animations by priority once
-            self._animations.sort(key=lambda x: x.priority)
+            # Sort animations by priority only when the order may have changed
+            if self._order_dirty:
+                self._animations.sort(key=lambda x: x.priority)
+                self._order_dirty = False
 
-            out_values: Dict[str, float] = {}
+            self._blender.begin()
+            self._verified = True
 
-            # Process each animation
-            for animation in self._animations:
+            # Process each animation, highest priority first
+            for animation in reversed(self._animations):
                 try:
-                    values = animation.tick(delta)
-
-                    for name, value in values.items():
-                        if name not in out_values:
-                            servo = self._io_controller.get_servo(name)
-                            if servo is None:
-                                logger.warning(f"Servo {name} not found")
-                                continue
-                            out_values[name] = servo.position
-
-                        # Calculate weighted position
-                        out_values[name] = (
-                            animation.strength * value
-                            + (1 - animation.strength) * out_values[name]
-                        )
-
+                    self._evaluate(animation, delta)
                 except Exception:
+                    self._verified = False
                     logger.error(
                         f"Error processing animation {animation.__class__.__name__}",
                         exc_info=True,
@@ -102,15 +140,17 @@ class Orchestrator:
                     continue
 
             # Update servo positions
-            for name, value in out_values.items():
-                try:
-                    servo = self._io_controller.get_servo(name)
-                    if servo is not None:
-                        servo.set_target(value)
-                except Exception:
-                    logger.error(
-                        f"Failed to set target for servo {name}", exc_info=True
-                    )
+            try:
+                self._blender.apply()
+            except Exception:
+                self._verified = False
+                logger.error("Failed to set servo targets", exc_info=True)
+
+            # Range checks can be skipped if validated animations set the
+            # target of every servo, other constraints are always checked
+            self._io_controller.constraints_verified = (
+                self._verified and self._blender.fully_touched
+            )
 
             # Tick the I/O controller
             try:
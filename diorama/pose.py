@@ -5,15 +5,21 @@ and MediaPipe frameworks for real-time human pose detection and tracking.
 """
 
 import logging
+from dataclasses import dataclass
+from enum import Enum
 from threading import Thread
 import time
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import cv2
 import mediapipe as mp
 import numpy as np
 from numpy.typing import NDArray
 
+from diorama.governor import RateGovernor
+from diorama.undistort import FisheyeUndistorter
+from utils.mailbox import Mailbox
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -21,86 +27,446 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class PoseTiming:
+    """Per stage timing of the pose pipeline, all times in seconds."""
+
+    captured_frames: int = 0
+    processed_frames: int = 0
+    dropped_frames: int = 0
+    frame_age: float = 0.0
+    inference_duration: float = 0.0
+    mean_frame_age: float = 0.0
+    mean_inference_duration: float = 0.0
+    tier: str = ""
+    gated_frames: int = 0
+    motion_score: float = 0.0
+
+
+class DetectionTier(Enum):
+    """Detection modes of the AdaptivePoseDetector."""
+
+    SEARCH = "search"
+    TRACK = "track"
+
+
+@dataclass
+class TierStats:
+    """Usage of one detection tier, durations in seconds."""
+
+    frames: int = 0
+    detections: int = 0
+    total_duration: float = 0.0
+
+    @property
+    def mean_duration(self) -> float:
+        """Mean processing time per frame."""
+        return self.total_duration / self.frames if self.frames else 0.0
+
+
+class AdaptivePoseDetector:
+    """MediaPipe pose detection that only pays for the heavy model when needed.
+
+    While nobody is in front of the camera, a light model searches a
+    downscaled frame. Once a person is found in ``enter_frames`` consecutive
+    frames, the heavy model takes over. It runs in MediaPipe's tracking mode,
+    which only looks at a region of interest around the previous landmarks
+    and runs the person detector again only when it loses track. After
+    ``exit_frames`` consecutive misses it falls back to searching. With
+    ``adaptive`` disabled the heavy model processes every frame.
+
+    The heavy model always gets full frames. Its tracking reuses the
+    previous normalized landmarks as the next region, which is only valid
+    while the frame geometry stays the same, so crops of changing size or
+    position would make it re-detect. The light model runs in static image
+    mode, so it never resumes from landmarks of a scene it stopped looking
+    at while the heavy model was tracking.
+    """
+
+    def __init__(
+        self,
+        min_detection_confidence: float = 0.8,
+        model_complexity: int = 2,
+        search_complexity: int = 0,
+        search_scale: float = 0.5,
+        enter_frames: int = 2,
+        exit_frames: int = 10,
+        adaptive: bool = True,
+    ) -> None:
+        """Initialize the detector.
+
+        Args:
+            min_detection_confidence: Minimum confidence for a detection.
+            model_complexity: Complexity of the tracking model.
+            search_complexity: Complexity of the search model.
+            search_scale: Scale factor applied to frames while searching.
+            enter_frames: Consecutive detections needed to start tracking.
+            exit_frames: Consecutive misses needed to go back to searching.
+            adaptive: Whether to use the tiers at all.
+        """
+        self.adaptive = adaptive
+        self.search_scale = search_scale
+        self.enter_frames = enter_frames
+        self.exit_frames = exit_frames
+
+        self._track_detector = self._create(model_complexity, min_detection_confidence)
+        self._search_detector = (
+            self._create(
+                search_complexity, min_detection_confidence, static_image_mode=True
+            )
+            if adaptive
+            else None
+        )
+
+        self.tier = DetectionTier.SEARCH if adaptive else DetectionTier.TRACK
+        self.switches = 0
+        self.stats: Dict[DetectionTier, TierStats] = {
+            tier: TierStats() for tier in DetectionTier
+        }
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _create(
+        complexity: int,
+        min_detection_confidence: float,
+        static_image_mode: bool = False,
+    ) -> Any:
+        return mp.solutions.pose.Pose(
+            static_image_mode=static_image_mode,
+            model_complexity=complexity,
+            enable_segmentation=False,
+            min_detection_confidence=min_detection_confidence,
+        )
+
+    def process(self, image: NDArray) -> Any:
+        """Detect the pose in an image.
+
+        Returns:
+            MediaPipe results with landmarks relative to the full image.
+        """
+        start = time.monotonic()
+        tier = self.tier
+        if tier == DetectionTier.SEARCH:
+            results = self._search(image)
+        else:
+            results = self._track(image)
+
+        stats = self.stats[tier]
+        stats.frames += 1
+        stats.total_duration += time.monotonic() - start
+        if results.pose_landmarks:
+            stats.detections += 1
+        return results
+
+    def _search(self, image: NDArray) -> Any:
+        small = image
+        if self.search_scale != 1:
+            small = cv2.resize(
+                image,
+                None,
+                fx=self.search_scale,
+                fy=self.search_scale,
+                interpolation=cv2.INTER_AREA,
+            )
+        # Landmarks are normalized, so they need no rescaling
+        results = self._search_detector.process(small)
+
+        self._hits = self._hits + 1 if results.pose_landmarks else 0
+        if self._hits >= self.enter_frames:
+            self._switch(DetectionTier.TRACK)
+        return results
+
+    def _track(self, image: NDArray) -> Any:
+        results = self._track_detector.process(image)
+        if results.pose_landmarks:
+            self._misses = 0
+        else:
+            self._misses += 1
+            if self.adaptive and self._misses >= self.exit_frames:
+                self._switch(DetectionTier.SEARCH)
+        return results
+
+    def _switch(self, tier: DetectionTier) -> None:
+        logger.debug(f"Pose detection switching to {tier.value}")
+        self.tier = tier
+        self.switches += 1
+        self._hits = 0
+        self._misses = 0
+
+
+class MotionGate:
+    """Cheap scene change detection in front of the pose detector.
+
+    Frames are reduced to a small blurred grayscale image and compared with
+    a running average background. The score is the fraction of pixels that
+    differ from the background by more than ``pixel_threshold``. A frame
+    counts as static if the score stays below ``threshold``. Every
+    ``max_gated_frames`` static frames one frame is let through anyway, so
+    slow movements and lighting changes are picked up eventually.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        width: int = 80,
+        pixel_threshold: int = 25,
+        threshold: float = 0.01,
+        background_rate: float = 0.05,
+        max_gated_frames: int = 20,
+    ) -> None:
+        """Initialize the gate.
+
+        Args:
+            enabled: Whether frames are gated at all.
+            width: Width in pixels of the downscaled comparison image.
+            pixel_threshold: Minimum gray value difference of a changed pixel.
+            threshold: Minimum fraction of changed pixels to pass a frame.
+            background_rate: Weight of the newest frame in the background.
+            max_gated_frames: Number of consecutive gated frames after which
+                a frame is passed regardless of the score.
+        """
+        self.enabled = enabled
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.threshold = threshold
+        self.background_rate = background_rate
+        self.max_gated_frames = max_gated_frames
+
+        self.score = 0.0
+        self.gated_frames = 0
+        self._consecutive = 0
+        self._background: Optional[NDArray] = None
+
+    def update(self, frame: NDArray) -> bool:
+        """Score a frame against the background and update the background.
+
+        Returns:
+            True if the scene changed since the background was learned.
+        """
+        height, width = frame.shape[:2]
+        small = cv2.resize(
+            frame,
+            (self.width, max(1, height * self.width // width)),
+            interpolation=cv2.INTER_AREA,
+        )
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0).astype(np.float32)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray
+            self.score = 1.0
+            return True
+
+        difference = cv2.absdiff(gray, self._background)
+        self.score = float(np.count_nonzero(difference > self.pixel_threshold)) / (
+            difference.size
+        )
+        cv2.accumulateWeighted(gray, self._background, self.background_rate)
+        return self.score >= self.threshold
+
+    def gate(self, frame: NDArray, tracking: bool) -> bool:
+        """Decide whether a frame can skip pose detection.
+
+        Args:
+            frame: Raw camera frame.
+            tracking: Whether a person is currently detected. Frames are
+                never gated while somebody is tracked.
+
+        Returns:
+            True if the frame should be skipped.
+        """
+        if not self.enabled:
+            return False
+        changed = self.update(frame)
+        if changed or tracking or self._consecutive >= self.max_gated_frames:
+            self._consecutive = 0
+            return False
+        self._consecutive += 1
+        self.gated_frames += 1
+        return True
+
+
+def capture_frames(
+    frames: Mailbox, timing: PoseTiming, running: Callable[[], bool]
+) -> None:
+    """Grab webcam frames into a mailbox until ``running`` returns False.
+
+    Reopens the webcam if it fails and keeps the capture counters of
+    ``timing`` up to date.
+    """
+    while running():
+        cap = cv2.VideoCapture(0)
+        if not cap.isOpened():
+            logger.error("Could not open Webcam, will try again in 10 seconds")
+            time.sleep(10)
+            continue
+
+        # Keep the driver from queueing up stale frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        try:
+            while running() and cap.isOpened():
+                success, frame = cap.read()
+                if not success:
+                    logger.error("Could not read frame from Webcam")
+                    break
+
+                frames.put(frame)
+                timing.captured_frames = frames.put_count
+                timing.dropped_frames = frames.dropped
+        finally:
+            cap.release()
+
+
+def nose_pose_x(landmarks: Any) -> float:
+    """Horizontal position of the nose, mirrored so 0 is the left edge."""
+    return 1 - landmarks.landmark[mp.solutions.pose.PoseLandmark.NOSE].x
+
+
+def is_waving(landmarks: Any) -> bool:
+    """Whether at least one wrist is raised above the shoulders."""
+    landmark = landmarks.landmark
+    shoulder_height = (
+        landmark[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER].y
+        + landmark[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER].y
+    ) / 2
+
+    return (
+        landmark[mp.solutions.pose.PoseLandmark.LEFT_WRIST].y < shoulder_height
+        or landmark[mp.solutions.pose.PoseLandmark.RIGHT_WRIST].y < shoulder_height
+    )
+
+
 class PoseEstimator:
     """A threaded real-time pose estimation class using MediaPipe.
 
-    This class handles webcam capture and pose detection in a separate thread,
-    tracking presence time and wave gestures.
+    A capture thread continuously grabs webcam frames into a single slot
+    mailbox and an inference thread always processes the newest frame,
+    dropping frames that arrived while it was busy. This keeps the detected
+    pose close to reality even if inference is slower than the camera.
+    Presence time and wave gestures are tracked from the processed frames.
 
     Attributes:
         fps: Target frames per second for pose detection
         running: Flag indicating if the pose detection thread is active
         detecting: Flag to enable/disable pose detection processing
+        image_id: Counter increased with every new processed image
     """
 
-    def __init__(self, fps: int = 10, min_detection_confidence: float = 0.8) -> None:
+    def __init__(
+        self,
+        fps: int = 10,
+        min_detection_confidence: float = 0.8,
+        detector_options: Optional[Dict[str, Any]] = None,
+        motion_gate_options: Optional[Dict[str, Any]] = None,
+        undistorter: Optional[FisheyeUndistorter] = None,
+        governor_options: Optional[Dict[str, Any]] = None,
+    ) -> None:
         """Initialize the PoseEstimator.
 
         Args:
             fps: Target frames per second for pose detection. Defaults to 10.
             min_detection_confidence: Minimum confidence value ([0.0, 1.0]) for pose
                 detection to be considered successful. Defaults to 0.8.
+            detector_options: Keyword arguments for the AdaptivePoseDetector,
+                e.g. ``{"adaptive": False}`` to always run the heavy model.
+            motion_gate_options: Keyword arguments for the MotionGate, e.g.
+                ``{"enabled": False}`` to process every frame.
+            undistorter: Fisheye correction applied to every processed frame,
+                defaults to the built-in camera intrinsics and crop.
+            governor_options: Keyword arguments for the RateGovernor that
+                paces inference at up to ``fps`` frames per second.
         """
         self.fps = fps
         self.running: bool = False
         self.detecting: bool = True
 
-        self._pose_detector = mp.solutions.pose.Pose(
-            static_image_mode=False,
-            model_complexity=2,
-            enable_segmentation=False,
+        self._pose_detector = AdaptivePoseDetector(
             min_detection_confidence=min_detection_confidence,
+            **(detector_options or {}),
         )
+        self._motion_gate = MotionGate(**(motion_gate_options or {}))
+        self.governor = RateGovernor(fps, **(governor_options or {}))
 
         self.image: Optional[NDArray] = None
+        self.image_id: int = 0
+        self._frame: Optional[Tuple[int, NDArray, Any]] = None
         self.pose: Optional[mp.solutions.pose.Pose] = None
         self.pose_x: Optional[float] = None
+        self.timing = PoseTiming()
+        self._frames: Mailbox[NDArray] = Mailbox()
+        self._capture_thread: Optional[Thread] = None
         self._thread: Optional[Thread] = None
+        self._last_frame_time: Optional[float] = None
 
         self.presence_time: float = 0.0
         self.wave_time: float = 0.0
 
-        # Fisheye Lense Correction
-        fx = 542.0
-        fy = 393.0
-        cx = 320.0
-        cy = 240.0
-        k1 = -0.14
-        k2 = -0.36
-        p1 = 0.03
-        p2 = -0.04
+        # Fisheye lens correction
+        self.undistorter = undistorter or FisheyeUndistorter()
+
+        self._listeners: List[Callable[["PoseEstimator"], None]] = []
 
-        # Camera matrix and distortion coefficients
-        self.K = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]])
-        self.D = np.array([k1, k2, p1, p2])
+    def add_listener(self, listener: Callable[["PoseEstimator"], None]) -> None:
+        """Call ``listener`` with the estimator after every processed frame.
 
-        self.rectify_maps = None
+        Listeners run on the inference thread and must return quickly.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                logger.error(f"Pose listener failed: {e}")
+
+    def _capture(self) -> None:
+        """Capture thread grabbing webcam frames into the frame mailbox."""
+        capture_frames(self._frames, self.timing, lambda: self.running)
 
     def _run(self) -> None:
-        """Main thread function handling webcam capture and pose detection."""
+        """Inference thread running pose detection on the newest frame."""
         while self.running:
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                logger.error("Could not open Webcam, will try again in 10 seconds")
-                time.sleep(10)
+            # Pace inference, the mailbox keeps only the newest frame anyway
+            self.governor.throttle()
+            taken = self._frames.take(timeout=1)
+            if taken is None:
                 continue
+            frame, captured_at = taken
+
+            # Presence and wave times advance by the time between the frames
+            delta = 0.0
+            if self._last_frame_time is not None:
+                delta = captured_at - self._last_frame_time
+            self._last_frame_time = captured_at
+
+            if self.detecting:
+                start = time.monotonic()
+                cpu_start = time.thread_time()
+                self._process_frame(frame, delta)
+                self.governor.record(time.thread_time() - cpu_start)
+                self._record_timing(start - captured_at, time.monotonic() - start)
+                self._notify()
+
+    def _record_timing(
+        self, frame_age: float, inference_duration: float, smoothing: float = 0.1
+    ) -> None:
+        """Update the pipeline timing statistics.
 
-            try:
-                last_time = time.time()
-                while self.running and cap.isOpened():
-                    current_time = time.time()
-                    delta = current_time - last_time
-                    last_time = current_time
-
-                    success, frame = cap.read()
-                    if not success:
-                        logger.error("Could not read frame from Webcam")
-                        break
-
-                    if self.detecting:
-                        self._process_frame(frame, delta)
-            finally:
-                cap.release()
+        Args:
+            frame_age: Time from capture to the start of inference
+            inference_duration: Time spent processing the frame
+            smoothing: Weight of the newest sample in the running means
+        """
+        timing = self.timing
+        timing.processed_frames += 1
+        timing.frame_age = frame_age
+        timing.inference_duration = inference_duration
+        timing.mean_frame_age += smoothing * (frame_age - timing.mean_frame_age)
+        timing.mean_inference_duration += smoothing * (
+            inference_duration - timing.mean_inference_duration
+        )
 
     def _process_frame(self, frame: NDArray, delta: float) -> None:
         """Process a single frame for pose detection.
@@ -109,24 +475,25 @@ class PoseEstimator:
             frame: Input frame from webcam
             delta: Time elapsed since last frame
         """
-        if self.rectify_maps is None:
-            h, w = frame.shape[:2]
-            new_K = cv2.fisheye.estimateNewCameraMatrixForUndistortRectify(
-                self.K, self.D, (w, h), np.eye(3)
-            )
-            self.rectify_maps = cv2.fisheye.initUndistortRectifyMap(
-                self.K, self.D, np.eye(3), new_K, (w, h), cv2.CV_32FC1
-            )
+        # Nothing moved and nobody is there: the previous result still holds,
+        # and with no pose detected presence and wave times are already zero
+        gated = self._motion_gate.gate(frame, tracking=self.pose_x is not None)
+        self.timing.gated_frames = self._motion_gate.gated_frames
+        self.timing.motion_score = self._motion_gate.score
+        if gated:
+            self._update_pose_time(delta)
+            self._update_wave_time(delta)
+            return
 
-        self.image = cv2.remap(
-            frame,
-            self.rectify_maps[0],
-            self.rectify_maps[1],
-            interpolation=cv2.INTER_LINEAR,
-        )[50:440, 108:550]
-        # self.image = cv2.flip(frame, 1)
+        image = self.undistorter(frame)
+        # image = cv2.flip(frame, 1)
 
-        self.pose = self._pose_detector.process(self.image)
+        pose = self._pose_detector.process(image)
+        self.image, self.pose = image, pose
+        self.image_id += 1
+        # Published as one tuple so readers never mix up images and poses
+        self._frame = (self.image_id, image, pose)
+        self.timing.tier = self._pose_detector.tier.value
         self._update_pose_time(delta)
         self._update_wave_time(delta)
 
@@ -138,10 +505,7 @@ class PoseEstimator:
         """
         pose_x = None
         if self.pose and self.pose.pose_landmarks:
-            nose_landmark = self.pose.pose_landmarks.landmark[
-                mp.solutions.pose.PoseLandmark.NOSE
-            ]
-            pose_x = 1 - nose_landmark.x
+            pose_x = nose_pose_x(self.pose.pose_landmarks)
 
         self.pose_x = pose_x
         if self.pose_x is not None:
@@ -159,18 +523,7 @@ class PoseEstimator:
             self.wave_time = 0
             return
 
-        landmarks = self.pose.pose_landmarks.landmark
-        shoulder_height = (
-            landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER].y
-            + landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER].y
-        ) / 2
-
-        wrists_above_shoulders = (
-            landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST].y < shoulder_height
-            or landmarks[mp.solutions.pose.PoseLandmark.RIGHT_WRIST].y < shoulder_height
-        )
-
-        if wrists_above_shoulders:
+        if is_waving(self.pose.pose_landmarks):
             self.wave_time += delta
         else:
             self.wave_time = 0
@@ -184,30 +537,49 @@ class PoseEstimator:
         Returns:
             Annotated image if available, None otherwise
         """
-        if self.image is None:
+        frame = self.get_frame(annotate)
+        return None if frame is None else frame[1]
+
+    def get_frame(self, annotate: bool = True) -> Optional[Tuple[int, NDArray]]:
+        """Get the latest processed image together with its image id.
+
+        Args:
+            annotate: Whether to draw pose landmarks on the image
+
+        Returns:
+            Tuple of the image id and a copy of the image, None if no image
+            has been processed yet
+        """
+        if self._frame is None:
             return None
 
-        out = np.copy(self.image)
-        if self.pose is not None and self.pose.pose_landmarks and annotate:
+        image_id, image, pose = self._frame
+        out = np.copy(image)
+        if pose is not None and pose.pose_landmarks and annotate:
             mp.solutions.drawing_utils.draw_landmarks(
                 out,
-                self.pose.pose_landmarks,
+                pose.pose_landmarks,
                 mp.solutions.pose.POSE_CONNECTIONS,
                 mp.solutions.drawing_styles.get_default_pose_landmarks_style(),
             )
-        return out
+        return image_id, out
 
     def __enter__(self) -> "PoseEstimator":
-        """Start the pose estimation thread."""
+        """Start the capture and pose estimation threads."""
         logger.info("Starting Pose Estimator")
         self.running = True
+        self._frames = Mailbox()
+        self._capture_thread = Thread(target=self._capture, daemon=True)
+        self._capture_thread.start()
         self._thread = Thread(target=self._run, daemon=True)
         self._thread.start()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback) -> None:
-        """Stop the pose estimation thread."""
+        """Stop the capture and pose estimation threads."""
         logger.info("Stopping Pose Estimator")
         self.running = False
-        if self._thread is not None:
-            self._thread.join()
+        self._frames.close()
+        for thread in (self._thread, self._capture_thread):
+            if thread is not None:
+                thread.join()
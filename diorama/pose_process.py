@@ -0,0 +1,502 @@
+"""Pose estimation in a separate worker process.
+
+MediaPipe inference and the Python work around it compete for the GIL with
+the animation loop and the web server when they run in the main process.
+The ProcessPoseEstimator keeps only webcam capture in the main process and
+hands frames to a worker process through a ring of shared memory slots.
+The worker undistorts the frame into the same slot and sends back a small
+result with the landmarks and the derived pose values.
+
+Slots are owned by exactly one side at a time: the main process writes a
+frame into a free slot and sends its index to the worker, the worker
+returns the index with the result, and the slot of the newest image is
+held back for the web UI until a newer image replaces it.
+"""
+
+import logging
+import os
+import queue
+import time
+from dataclasses import dataclass
+from multiprocessing import get_context, shared_memory
+from multiprocessing.connection import Connection
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+from numpy.typing import NDArray
+
+from diorama.governor import RateGovernor
+from diorama.pose import (
+    AdaptivePoseDetector,
+    MotionGate,
+    PoseTiming,
+    capture_frames,
+    is_waving,
+    nose_pose_x,
+)
+from diorama.undistort import FisheyeUndistorter
+from utils.mailbox import Mailbox
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoseResult:
+    """Result of one frame sent back by the worker, times in seconds.
+
+    ``landmarks`` holds x, y, z and visibility per landmark. Frames the
+    worker skipped because a newer one was waiting have ``processed`` set to
+    False and carry no pose.
+    """
+
+    slot: int
+    frame_id: int
+    captured_at: float
+    processed: bool = True
+    started_at: float = 0.0
+    inference_duration: float = 0.0
+    cpu_time: float = 0.0
+    pose_x: Optional[float] = None
+    waving: bool = False
+    landmarks: Optional[NDArray] = None
+    has_image: bool = False
+    tier: str = ""
+    gated_frames: int = 0
+    motion_score: float = 0.0
+
+
+class FrameRing:
+    """Shared memory slots holding a camera frame and its processed image."""
+
+    def __init__(
+        self,
+        slots: int,
+        frame_shape: Tuple[int, ...],
+        image_shape: Tuple[int, ...],
+        name: Optional[str] = None,
+    ) -> None:
+        """Create a new ring or attach to an existing one by name.
+
+        Args:
+            slots: Number of slots.
+            frame_shape: Shape of the uint8 camera frames.
+            image_shape: Shape of the uint8 processed images.
+            name: Name of an existing ring to attach to.
+        """
+        frame_bytes = slots * int(np.prod(frame_shape))
+        image_bytes = slots * int(np.prod(image_shape))
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=name is None, size=frame_bytes + image_bytes
+        )
+        self.frames = np.ndarray(
+            (slots, *frame_shape), dtype=np.uint8, buffer=self.shm.buf
+        )
+        self.images = np.ndarray(
+            (slots, *image_shape),
+            dtype=np.uint8,
+            buffer=self.shm.buf,
+            offset=frame_bytes,
+        )
+
+    @property
+    def name(self) -> str:
+        """Name to attach to the ring from another process."""
+        return self.shm.name
+
+    def close(self) -> None:
+        """Detach from the shared memory."""
+        # The views export the buffer and have to go before it can close
+        del self.frames
+        del self.images
+        self.shm.close()
+
+
+def _worker_main(
+    requests: Connection,
+    results: Connection,
+    ring_name: str,
+    slots: int,
+    frame_shape: Tuple[int, ...],
+    image_shape: Tuple[int, ...],
+    undistorter: FisheyeUndistorter,
+    detector_options: Dict[str, Any],
+    motion_gate_options: Dict[str, Any],
+    cpu_affinity: Optional[Sequence[int]],
+) -> None:
+    """Entry point of the worker process."""
+    if cpu_affinity:
+        os.sched_setaffinity(0, cpu_affinity)
+
+    ring = FrameRing(slots, frame_shape, image_shape, name=ring_name)
+    detector = AdaptivePoseDetector(**detector_options)
+    motion_gate = MotionGate(**motion_gate_options)
+    tracking = False
+    try:
+        while True:
+            request = requests.recv()
+            # Only the newest frame is worth processing, hand back the others
+            while request is not None and requests.poll():
+                slot, frame_id, captured_at = request
+                results.send(PoseResult(slot, frame_id, captured_at, processed=False))
+                request = requests.recv()
+            if request is None:
+                break
+
+            slot, frame_id, captured_at = request
+            result = PoseResult(slot, frame_id, captured_at)
+            result.started_at = time.monotonic()
+            cpu_start = time.process_time()
+
+            frame = ring.frames[slot]
+            if not motion_gate.gate(frame, tracking=tracking):
+                ring.images[slot] = undistorter(frame)
+                result.has_image = True
+                pose = detector.process(ring.images[slot])
+                if pose.pose_landmarks:
+                    result.pose_x = nose_pose_x(pose.pose_landmarks)
+                    result.waving = is_waving(pose.pose_landmarks)
+                    result.landmarks = np.array(
+                        [
+                            (landmark.x, landmark.y, landmark.z, landmark.visibility)
+                            for landmark in pose.pose_landmarks.landmark
+                        ],
+                        dtype=np.float32,
+                    )
+            tracking = result.pose_x is not None
+
+            result.tier = detector.tier.value
+            result.gated_frames = motion_gate.gated_frames
+            result.motion_score = motion_gate.score
+            result.inference_duration = time.monotonic() - result.started_at
+            result.cpu_time = time.process_time() - cpu_start
+            results.send(result)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        ring.close()
+
+
+class ProcessPoseEstimator:
+    """Pose estimation with inference in a separate process.
+
+    Offers the attributes of PoseEstimator that the state machine, the
+    animations and the web UI use: ``pose_x``, ``presence_time``,
+    ``wave_time``, ``timing``, ``governor`` and ``get_image``. Presence and
+    wave times are accumulated in the main process from the worker results,
+    so they can be reset there like with the threaded estimator.
+
+    Attributes:
+        fps: Target frames per second for pose detection
+        running: Flag indicating if the pose detection threads are active
+        detecting: Flag to enable/disable pose detection processing
+        landmarks: Landmarks of the newest result as x, y, z, visibility
+        image_id: Counter increased with every new processed image
+    """
+
+    def __init__(
+        self,
+        fps: int = 10,
+        min_detection_confidence: float = 0.8,
+        detector_options: Optional[Dict[str, Any]] = None,
+        motion_gate_options: Optional[Dict[str, Any]] = None,
+        undistorter: Optional[FisheyeUndistorter] = None,
+        governor_options: Optional[Dict[str, Any]] = None,
+        cpu_affinity: Optional[Sequence[int]] = None,
+        frame_shape: Tuple[int, int, int] = (480, 640, 3),
+        slots: int = 3,
+    ) -> None:
+        """Initialize the ProcessPoseEstimator.
+
+        Args:
+            fps: Target frames per second for pose detection.
+            min_detection_confidence: Minimum confidence value ([0.0, 1.0]) for
+                pose detection to be considered successful.
+            detector_options: Keyword arguments for the AdaptivePoseDetector.
+            motion_gate_options: Keyword arguments for the MotionGate.
+            undistorter: Fisheye correction applied to every processed frame.
+            governor_options: Keyword arguments for the RateGovernor.
+            cpu_affinity: CPU cores the worker process is pinned to, e.g.
+                ``[2, 3]`` to keep it away from the animation loop.
+            frame_shape: Shape of the camera frames, other frames are resized.
+            slots: Number of shared memory slots, at least 3 so one can be
+                written while one is processed and one is displayed.
+        """
+        if slots < 3:
+            raise ValueError(f"At least 3 slots are needed, got {slots}")
+        self.fps = fps
+        self.running: bool = False
+        self.detecting: bool = True
+
+        self.pose_x: Optional[float] = None
+        self.presence_time: float = 0.0
+        self.wave_time: float = 0.0
+        self.landmarks: Optional[NDArray] = None
+        self.image_id: int = 0
+        self.timing = PoseTiming()
+        self.governor = RateGovernor(fps, **(governor_options or {}))
+
+        self.undistorter = undistorter or FisheyeUndistorter()
+        self.frame_shape = tuple(frame_shape)
+        width, height = self.undistorter.output_size(
+            (self.frame_shape[1], self.frame_shape[0])
+        )
+        self.image_shape = (height, width, self.frame_shape[2])
+        self.slots = slots
+        self.cpu_affinity = list(cpu_affinity) if cpu_affinity else None
+        self._detector_options = {
+            "min_detection_confidence": min_detection_confidence,
+            **(detector_options or {}),
+        }
+        self._motion_gate_options = dict(motion_gate_options or {})
+
+        self._frames: Mailbox[NDArray] = Mailbox()
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        self._ring: Optional[FrameRing] = None
+        self._image_slot: Optional[int] = None
+        self._image_landmarks: Optional[NDArray] = None
+        self._image_lock = Lock()
+        self._process: Optional[Any] = None
+        self._requests: Optional[Connection] = None
+        self._results: Optional[Connection] = None
+        self._threads: List[Thread] = []
+        self._frame_id = 0
+        self._last_frame_time: Optional[float] = None
+        self._listeners: List[Callable[["ProcessPoseEstimator"], None]] = []
+
+    def add_listener(
+        self, listener: Callable[["ProcessPoseEstimator"], None]
+    ) -> None:
+        """Call ``listener`` with the estimator after every applied result.
+
+        Listeners run on the result thread and must return quickly.
+        """
+        self._listeners.append(listener)
+
+    @property
+    def image(self) -> Optional[NDArray]:
+        """Copy of the newest processed image."""
+        return self.get_image(annotate=False)
+
+    def _feed(self) -> None:
+        """Feeder thread writing the newest frame into a free slot."""
+        height, width = self.frame_shape[:2]
+        while self.running:
+            self.governor.throttle()
+            taken = self._frames.take(timeout=1)
+            if taken is None or not self.detecting:
+                continue
+            frame, captured_at = taken
+
+            try:
+                slot = self._free_slots.get(timeout=1)
+            except queue.Empty:
+                logger.warning("No free frame slot, pose worker is stalled")
+                continue
+            if frame.shape != self.frame_shape:
+                frame = cv2.resize(frame, (width, height))
+            self._ring.frames[slot] = frame
+            self._frame_id += 1
+            try:
+                self._requests.send((slot, self._frame_id, captured_at))
+            except (OSError, ValueError):
+                break
+
+    def _collect(self) -> None:
+        """Result thread applying worker results to the public attributes."""
+        while self.running:
+            try:
+                if not self._results.poll(1):
+                    continue
+                result: PoseResult = self._results.recv()
+            except (EOFError, OSError):
+                if self.running:
+                    logger.error("Pose worker process died")
+                break
+
+            if not result.processed:
+                self._free_slots.put(result.slot)
+                continue
+            self._apply(result)
+            for listener in self._listeners:
+                try:
+                    listener(self)
+                except Exception as e:
+                    logger.error(f"Pose listener failed: {e}")
+
+    def _apply(self, result: PoseResult) -> None:
+        """Update pose values, timing and the displayed image from a result."""
+        # Presence and wave times advance by the time between the frames
+        delta = 0.0
+        if self._last_frame_time is not None:
+            delta = result.captured_at - self._last_frame_time
+        self._last_frame_time = result.captured_at
+
+        self.pose_x = result.pose_x
+        self.landmarks = result.landmarks
+        if result.pose_x is not None:
+            self.presence_time += delta
+        else:
+            self.presence_time = 0
+        if result.waving:
+            self.wave_time += delta
+        else:
+            self.wave_time = 0
+
+        timing = self.timing
+        timing.tier = result.tier
+        timing.gated_frames = result.gated_frames
+        timing.motion_score = result.motion_score
+        self._record_timing(
+            result.started_at - result.captured_at, result.inference_duration
+        )
+        self.governor.record(result.cpu_time)
+
+        if not result.has_image:
+            self._free_slots.put(result.slot)
+            return
+        with self._image_lock:
+            previous, self._image_slot = self._image_slot, result.slot
+            self._image_landmarks = result.landmarks
+            self.image_id += 1
+        if previous is not None:
+            self._free_slots.put(previous)
+
+    def _record_timing(
+        self, frame_age: float, inference_duration: float, smoothing: float = 0.1
+    ) -> None:
+        timing = self.timing
+        timing.processed_frames += 1
+        timing.frame_age = frame_age
+        timing.inference_duration = inference_duration
+        timing.mean_frame_age += smoothing * (frame_age - timing.mean_frame_age)
+        timing.mean_inference_duration += smoothing * (
+            inference_duration - timing.mean_inference_duration
+        )
+
+    def get_image(self, annotate: bool = True) -> Optional[NDArray]:
+        """Get the latest processed image.
+
+        Args:
+            annotate: Whether to draw pose landmarks on the image
+
+        Returns:
+            Annotated image if available, None otherwise
+        """
+        frame = self.get_frame(annotate)
+        return None if frame is None else frame[1]
+
+    def get_frame(self, annotate: bool = True) -> Optional[Tuple[int, NDArray]]:
+        """Get the latest processed image together with its image id.
+
+        Args:
+            annotate: Whether to draw pose landmarks on the image
+
+        Returns:
+            Tuple of the image id and a copy of the image, None if no image
+            has been processed yet
+        """
+        with self._image_lock:
+            if self._ring is None or self._image_slot is None:
+                return None
+            image_id = self.image_id
+            landmarks = self._image_landmarks
+            out = np.copy(self._ring.images[self._image_slot])
+
+        if landmarks is not None and annotate:
+            landmark_list = landmark_pb2.NormalizedLandmarkList(
+                landmark=[
+                    landmark_pb2.NormalizedLandmark(
+                        x=x, y=y, z=z, visibility=visibility
+                    )
+                    for x, y, z, visibility in landmarks.tolist()
+                ]
+            )
+            mp.solutions.drawing_utils.draw_landmarks(
+                out,
+                landmark_list,
+                mp.solutions.pose.POSE_CONNECTIONS,
+                mp.solutions.drawing_styles.get_default_pose_landmarks_style(),
+            )
+        return image_id, out
+
+    def __enter__(self) -> "ProcessPoseEstimator":
+        """Start the worker process and the capture, feeder and result threads."""
+        logger.info("Starting Pose Estimator worker process")
+        self._ring = FrameRing(self.slots, self.frame_shape, self.image_shape)
+        self._free_slots = queue.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+        self._image_slot = None
+
+        # Forking a process with running threads is unsafe, so spawn
+        context = get_context("spawn")
+        requests_reader, self._requests = context.Pipe(duplex=False)
+        self._results, results_writer = context.Pipe(duplex=False)
+        self._process = context.Process(
+            target=_worker_main,
+            args=(
+                requests_reader,
+                results_writer,
+                self._ring.name,
+                self.slots,
+                self.frame_shape,
+                self.image_shape,
+                self.undistorter,
+                self._detector_options,
+                self._motion_gate_options,
+                self.cpu_affinity,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+        requests_reader.close()
+        results_writer.close()
+
+        self.running = True
+        self._frames = Mailbox()
+        self._threads = [
+            Thread(
+                target=capture_frames,
+                args=(self._frames, self.timing, lambda: self.running),
+                daemon=True,
+            ),
+            Thread(target=self._feed, daemon=True),
+            Thread(target=self._collect, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Stop the threads and the worker process and free the shared memory."""
+        logger.info("Stopping Pose Estimator worker process")
+        self.running = False
+        self._frames.close()
+        for thread in self._threads:
+            thread.join()
+
+        try:
+            self._requests.send(None)
+        except (OSError, ValueError):
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            logger.warning("Pose worker did not stop, terminating it")
+            self._process.terminate()
+            self._process.join()
+        self._requests.close()
+        self._results.close()
+
+        with self._image_lock:
+            self._image_slot = None
+            ring, self._ring = self._ring, None
+        ring.close()
+        ring.shm.unlink()
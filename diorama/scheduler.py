@@ -0,0 +1,147 @@
+"""Fixed-rate tick scheduler driving the main animation loop."""
+
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Iterator
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TickStats:
+    """Timing statistics of a TickScheduler, all times in seconds."""
+
+    ticks: int = 0
+    overruns: int = 0
+    skipped_ticks: int = 0
+    last_delta: float = 0.0
+    last_jitter: float = 0.0
+    mean_jitter: float = 0.0
+    max_jitter: float = 0.0
+    last_work: float = 0.0
+    mean_work: float = 0.0
+    max_work: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the statistics as a JSON serializable dictionary."""
+        return asdict(self)
+
+
+class TickScheduler:
+    """Runs a loop at a fixed rate using drift compensated monotonic deadlines.
+
+    Deadlines are computed as multiples of the period from the previous
+    deadline rather than from the time the loop woke up, so sleep inaccuracies
+    do not accumulate. If a tick overruns by more than ``max_catch_up``
+    periods, the missed deadlines are dropped and the schedule restarts from
+    now instead of firing a burst of back-to-back ticks.
+
+    Example:
+        scheduler = TickScheduler(orchestrator.fps)
+        for delta in scheduler:
+            orchestrator.tick(delta)
+    """
+
+    def __init__(
+        self,
+        fps: float,
+        max_catch_up: int = 2,
+        smoothing: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize the TickScheduler.
+
+        Args:
+            fps: Target ticks per second.
+            max_catch_up: Number of periods a tick may lag behind its deadline
+                before the schedule is reset. Defaults to 2.
+            smoothing: Weight of the newest sample in the running means.
+            clock: Monotonic clock returning seconds.
+            sleep: Function used to wait until the next deadline.
+        """
+        if fps <= 0:
+            raise ValueError(f"fps must be positive, got {fps}")
+        self.period = 1 / fps
+        self.max_catch_up = max_catch_up
+        self.smoothing = smoothing
+        self.stats = TickStats()
+        self.running = False
+        self._clock = clock
+        self._sleep = sleep
+        self._deadline: float = 0.0
+        self._last_tick: float = 0.0
+        self._work_start: float = 0.0
+
+    @property
+    def fps(self) -> float:
+        """Target ticks per second."""
+        return 1 / self.period
+
+    def start(self) -> None:
+        """Reset the schedule so the first tick fires immediately."""
+        now = self._clock()
+        self._deadline = now
+        self._last_tick = now
+        self._work_start = now
+        self.stats = TickStats()
+        self.running = True
+
+    def stop(self) -> None:
+        """Stop iteration after the current tick."""
+        self.running = False
+
+    def wait(self) -> float:
+        """Sleep until the next deadline and return the time since the last tick.
+
+        Returns:
+            Elapsed monotonic time in seconds since the previous tick.
+        """
+        now = self._clock()
+        self._record_work(now - self._work_start)
+
+        self._deadline += self.period
+        lag = now - self._deadline
+        if lag > self.max_catch_up * self.period:
+            skipped = int(lag // self.period)
+            self.stats.skipped_ticks += skipped
+            logger.debug(f"Tick overran by {lag:.4f}s, skipping {skipped} ticks")
+            self._deadline = now
+        elif lag > 0:
+            self.stats.overruns += 1
+        else:
+            self._sleep(-lag)
+            now = self._clock()
+
+        self._record_jitter(now - self._deadline)
+        delta = now - self._last_tick
+        self._last_tick = now
+        self._work_start = now
+        self.stats.ticks += 1
+        self.stats.last_delta = delta
+        return delta
+
+    def _record_work(self, work: float) -> None:
+        stats = self.stats
+        stats.last_work = work
+        stats.max_work = max(stats.max_work, work)
+        stats.mean_work += self.smoothing * (work - stats.mean_work)
+
+    def _record_jitter(self, jitter: float) -> None:
+        stats = self.stats
+        jitter = max(jitter, 0.0)
+        stats.last_jitter = jitter
+        stats.max_jitter = max(stats.max_jitter, jitter)
+        stats.mean_jitter += self.smoothing * (jitter - stats.mean_jitter)
+
+    def __iter__(self) -> Iterator[float]:
+        """Yield the elapsed time for each tick until stopped."""
+        self.start()
+        yield 0.0
+        while self.running:
+            yield self.wait()
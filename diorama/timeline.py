@@ -0,0 +1,328 @@
+"""Baked servo timelines: animations rendered to fixed-rate binary frames.
+
+A timeline file stores one row of servo values per frame, so playback is a
+single row lookup per tick. Files are read through ``numpy.memmap`` and
+therefore cost almost no heap, no matter how long the dance is.
+
+File layout (little endian):
+    header       magic, version, sample type, fps, duration, frame count,
+                 channel count, scale, offset and the offset of the frames
+    channels     per channel a uint16 byte length and the UTF-8 name
+    frames       frames x channels float32, or uint16 scaled by
+                 ``value = raw * scale + offset``
+
+Missing values are stored as NaN (float32) or 0xFFFF (uint16).
+
+Usage:
+    python -m diorama.timeline animations/dances_open animations/dances_closed
+"""
+
+import argparse
+import logging
+import math
+import os
+import struct
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+TIMELINE_EXTENSION = ".timeline"
+MAGIC = b"DRTL"
+VERSION = 1
+HEADER = struct.Struct("<4sHBxddIHxxddI")
+DATA_ALIGNMENT = 64
+UINT16_MISSING = 0xFFFF
+SAMPLE_TYPES = {1: np.dtype("<f4"), 2: np.dtype("<u2")}
+SAMPLE_CODES = {"float32": 1, "uint16": 2}
+
+
+class TimelineError(Exception):
+    """Exception raised for invalid timeline files."""
+
+    pass
+
+
+class TimelineTrack:
+    """Fixed-rate servo frames with the lookup interface of KeyFrameTrack.
+
+    ``sample`` returns the row of the frame containing the given time.
+    """
+
+    def __init__(
+        self,
+        frames: NDArray,
+        channels: Sequence[str],
+        fps: float,
+        scale: float = 1.0,
+        offset: float = 0.0,
+    ) -> None:
+        self.frames = frames
+        self.channels = list(channels)
+        self.channel_index = {name: idx for idx, name in enumerate(self.channels)}
+        self.fps = fps
+        self.scale = scale
+        self.offset = offset
+        self._quantized = frames.dtype.kind == "u"
+
+    def locate(self, time: float) -> Optional[int]:
+        """Return the index of the frame containing ``time``."""
+        idx = int(time * self.fps)
+        if idx < 0 or not len(self.frames):
+            return None
+        return min(idx, len(self.frames) - 1)
+
+    def sample(self, time: float) -> Optional[Tuple[NDArray, NDArray]]:
+        """Return the values and validity mask of the frame at ``time``."""
+        idx = self.locate(time)
+        if idx is None:
+            return None
+        return self._row(idx)
+
+    def rows(self) -> Iterator[Tuple[float, NDArray, NDArray]]:
+        """Yield the start time, values and validity mask of every frame."""
+        for idx in range(len(self.frames)):
+            yield (idx / self.fps, *self._row(idx))
+
+    def sample_mask(self, time: float) -> Optional[NDArray]:
+        """Return the validity mask of the frame at ``time``."""
+        sample = self.sample(time)
+        return None if sample is None else sample[1]
+
+    def sample_dict(self, time: float) -> Optional[Dict[str, float]]:
+        """Return the values of the frame at ``time`` by channel name."""
+        sample = self.sample(time)
+        if sample is None:
+            return None
+        values, mask = sample
+        return {
+            name: value
+            for name, value, present in zip(
+                self.channels, values.tolist(), mask.tolist()
+            )
+            if present
+        }
+
+    def _row(self, idx: int) -> Tuple[NDArray, NDArray]:
+        row = self.frames[idx]
+        if self._quantized:
+            mask = row != UINT16_MISSING
+            return row * self.scale + self.offset, mask
+        values = row.astype(np.float64)
+        return values, ~np.isnan(values)
+
+
+def render(animation: Any, fps: float) -> NDArray:
+    """Render an animation to a frames x channels float array.
+
+    Args:
+        animation: KeyFrameAnimation to render, its clock is not touched.
+        fps: Frame rate of the rendered timeline.
+
+    Returns:
+        Float64 array with NaN for channels without a value.
+    """
+    track = animation.track
+    n_frames = max(1, math.ceil(animation.duration * fps))
+    frames = np.full((n_frames, len(track.channels)), np.nan)
+    for idx in range(n_frames):
+        sample = track.sample(idx / fps)
+        if sample is not None:
+            values, mask = sample
+            frames[idx, mask] = values[mask]
+    return frames
+
+
+def write_timeline(
+    file_path: str,
+    frames: NDArray,
+    channels: Sequence[str],
+    fps: float,
+    duration: float,
+    sample_type: str = "float32",
+) -> None:
+    """Write rendered frames to a timeline file.
+
+    Args:
+        file_path: Destination file.
+        frames: Frames x channels values, NaN for missing values.
+        channels: Channel names of the columns.
+        fps: Frame rate of ``frames``.
+        duration: Loop duration of the animation in seconds.
+        sample_type: ``float32`` or ``uint16``.
+    """
+    code = SAMPLE_CODES.get(sample_type)
+    if code is None:
+        raise TimelineError(f"Unknown sample type {sample_type}")
+
+    scale, offset = 1.0, 0.0
+    if code == SAMPLE_CODES["uint16"]:
+        finite = frames[~np.isnan(frames)]
+        if finite.size:
+            offset = float(finite.min())
+            value_range = float(finite.max()) - offset
+            scale = value_range / (UINT16_MISSING - 1) if value_range > 0 else 1.0
+        data = np.full(frames.shape, UINT16_MISSING, dtype=SAMPLE_TYPES[code])
+        present = ~np.isnan(frames)
+        data[present] = np.round((frames[present] - offset) / scale)
+    else:
+        data = frames.astype(SAMPLE_TYPES[code])
+
+    table = bytearray()
+    for name in channels:
+        encoded = name.encode("utf-8")
+        table += struct.pack("<H", len(encoded)) + encoded
+
+    data_offset = HEADER.size + len(table)
+    data_offset += -data_offset % DATA_ALIGNMENT
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        code,
+        fps,
+        duration,
+        data.shape[0],
+        len(channels),
+        scale,
+        offset,
+        data_offset,
+    )
+
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(table)
+        f.write(b"\0" * (data_offset - HEADER.size - len(table)))
+        f.write(np.ascontiguousarray(data).tobytes())
+    os.replace(tmp_path, file_path)
+
+
+def read_timeline(file_path: str) -> Tuple[TimelineTrack, float]:
+    """Open a timeline file as a memory mapped track.
+
+    Returns:
+        Tuple of the track and the loop duration in seconds.
+    """
+    with open(file_path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise TimelineError(f"{file_path} is too short for a timeline")
+        (
+            magic,
+            version,
+            code,
+            fps,
+            duration,
+            n_frames,
+            n_channels,
+            scale,
+            offset,
+            data_offset,
+        ) = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or code not in SAMPLE_TYPES:
+            raise TimelineError(f"{file_path} is not a supported timeline")
+
+        try:
+            channels: List[str] = []
+            for _ in range(n_channels):
+                (length,) = struct.unpack("<H", f.read(2))
+                name = f.read(length)
+                if len(name) < length:
+                    raise TimelineError("channel table is truncated")
+                channels.append(name.decode("utf-8"))
+        except (struct.error, UnicodeDecodeError) as e:
+            raise TimelineError(f"{file_path} has a corrupt channel table: {e}")
+        table_end = f.tell()
+        file_size = os.fstat(f.fileno()).st_size
+
+    frame_bytes = n_frames * n_channels * SAMPLE_TYPES[code].itemsize
+    if data_offset < table_end or data_offset + frame_bytes > file_size:
+        raise TimelineError(
+            f"{file_path} is truncated, expected {frame_bytes} frame bytes "
+            f"at offset {data_offset} in {file_size} bytes"
+        )
+    try:
+        frames = np.memmap(
+            file_path,
+            dtype=SAMPLE_TYPES[code],
+            mode="r",
+            offset=data_offset,
+            shape=(n_frames, n_channels),
+        )
+    except ValueError as e:
+        raise TimelineError(f"{file_path} cannot be mapped: {e}")
+    return TimelineTrack(frames, channels, fps, scale, offset), duration
+
+
+def bake(
+    animation: Any, file_path: str, fps: float, sample_type: str = "float32"
+) -> None:
+    """Render a KeyFrameAnimation and write it as a timeline file."""
+    frames = render(animation, fps)
+    write_timeline(
+        file_path,
+        frames,
+        animation.track.channels,
+        fps,
+        animation.duration,
+        sample_type,
+    )
+
+
+def timeline_path(file_path: str) -> str:
+    """Return the timeline file that belongs to an animation file."""
+    return os.path.splitext(file_path)[0] + TIMELINE_EXTENSION
+
+
+def main() -> int:
+    """Bake animation files or directories to timelines next to them."""
+    from diorama.animation import AnimationError, KeyFrameAnimation
+
+    parser = argparse.ArgumentParser(description="Bake animations to timelines.")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=["animations/dances_open", "animations/dances_closed"],
+        help="Animation files or folders (default: both dance folders)",
+    )
+    parser.add_argument(
+        "--fps", type=float, default=20, help="Timeline frame rate (default: 20)"
+    )
+    parser.add_argument(
+        "--type",
+        choices=sorted(SAMPLE_CODES),
+        default="float32",
+        help="Sample type (default: float32)",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.paths:
+        if os.path.isdir(path):
+            files = [
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.endswith(".json")
+            ]
+        else:
+            files = [path]
+        for file_path in files:
+            try:
+                animation = KeyFrameAnimation.from_path(file_path)
+                bake(animation, timeline_path(file_path), args.fps, args.type)
+                print(f"Baked {file_path} -> {timeline_path(file_path)}")
+            except (AnimationError, TimelineError, OSError) as e:
+                print(f"Failed to bake {file_path}: {e}")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Fisheye undistortion of camera frames into a cropped output region.
+
+The rectify maps are only computed for the region that is kept after
+undistortion and stored in OpenCV's fixed-point ``CV_16SC2`` format, which
+``cv2.remap`` processes considerably faster than float maps. Maps are cached
+on disk, keyed by the camera intrinsics, the resolution and the crop, so
+they are only computed once per camera setup.
+"""
+
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+MAP_VERSION = 1
+
+# Output region as (top, bottom, left, right) in undistorted image pixels
+DEFAULT_CROP = (50, 440, 108, 550)
+
+
+@dataclass
+class FisheyeIntrinsics:
+    """Camera matrix and fisheye distortion coefficients."""
+
+    fx: float = 542.0
+    fy: float = 393.0
+    cx: float = 320.0
+    cy: float = 240.0
+    k1: float = -0.14
+    k2: float = -0.36
+    p1: float = 0.03
+    p2: float = -0.04
+
+    @property
+    def K(self) -> NDArray:
+        """Camera matrix."""
+        return np.array([[self.fx, 0, self.cx], [0, self.fy, self.cy], [0, 0, 1]])
+
+    @property
+    def D(self) -> NDArray:
+        """Distortion coefficients."""
+        return np.array([self.k1, self.k2, self.p1, self.p2])
+
+
+class FisheyeUndistorter:
+    """Undistorts frames and crops them in a single remap.
+
+    Attributes:
+        intrinsics: Camera intrinsics used to build the maps
+        crop: Kept region as (top, bottom, left, right)
+        cache_dir: Directory for cached maps, None disables the cache
+    """
+
+    def __init__(
+        self,
+        intrinsics: Optional[FisheyeIntrinsics] = None,
+        crop: Optional[Sequence[int]] = DEFAULT_CROP,
+        cache_dir: Optional[str] = "cache/undistort",
+    ) -> None:
+        """Initialize the undistorter.
+
+        Args:
+            intrinsics: Camera intrinsics, defaults to the diorama camera.
+            crop: Region (top, bottom, left, right) to keep, None for the
+                full frame.
+            cache_dir: Directory to cache maps in, None to always compute.
+        """
+        self.intrinsics = intrinsics or FisheyeIntrinsics()
+        self.crop = tuple(crop) if crop is not None else None
+        self.cache_dir = cache_dir
+        self._maps: Optional[Tuple[NDArray, NDArray]] = None
+        self._size: Optional[Tuple[int, int]] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "FisheyeUndistorter":
+        """Create an undistorter from the ``pose`` config section."""
+        kwargs: Dict[str, Any] = {}
+        if "camera" in config:
+            kwargs["intrinsics"] = FisheyeIntrinsics(**config["camera"])
+        if "crop" in config:
+            kwargs["crop"] = config["crop"]
+        if "map_cache" in config:
+            kwargs["cache_dir"] = config["map_cache"]
+        return cls(**kwargs)
+
+    def __call__(self, frame: NDArray) -> NDArray:
+        """Undistort and crop a frame."""
+        h, w = frame.shape[:2]
+        if self._maps is None or self._size != (w, h):
+            self._maps = self.maps((w, h))
+            self._size = (w, h)
+        return cv2.remap(
+            frame, self._maps[0], self._maps[1], interpolation=cv2.INTER_LINEAR
+        )
+
+    def output_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """Size (width, height) of the output for frames of ``size``."""
+        if self.crop is None:
+            return size
+        top, bottom, left, right = self.crop
+        return right - left, bottom - top
+
+    def maps(self, size: Tuple[int, int]) -> Tuple[NDArray, NDArray]:
+        """Return the fixed-point maps for a frame size, cached if possible.
+
+        Args:
+            size: Frame size as (width, height).
+        """
+        cache_path = self._cache_path(size)
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    return cached["map1"], cached["map2"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring broken map cache {cache_path}: {e}")
+
+        maps = self.compute_maps(size)
+        if cache_path is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = cache_path + ".tmp.npz"
+                np.savez(tmp_path, map1=maps[0], map2=maps[1])
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                logger.warning(f"Could not cache undistortion maps: {e}")
+        return maps
+
+    def compute_maps(
+        self, size: Tuple[int, int], map_type: int = cv2.CV_16SC2
+    ) -> Tuple[NDArray, NDArray]:
+        """Compute maps that produce the cropped undistorted image.
+
+        Shifting the principal point of the new camera matrix by the crop
+        offset and shrinking the output size gives exactly the crop of the
+        full size maps, without computing the discarded pixels.
+
+        Args:
+            size: Frame size as (width, height).
+            map_type: OpenCV map type, ``CV_16SC2`` or ``CV_32FC1``.
+        """
+        K, D = self.intrinsics.K, self.intrinsics.D
+        new_K = cv2.fisheye.estimateNewCameraMatrixForUndistortRectify(
+            K, D, size, np.eye(3)
+        )
+        if self.crop is not None:
+            top, _, left, _ = self.crop
+            new_K = new_K.copy()
+            new_K[0, 2] -= left
+            new_K[1, 2] -= top
+        return cv2.fisheye.initUndistortRectifyMap(
+            K, D, np.eye(3), new_K, self.output_size(size), map_type
+        )
+
+    def _cache_path(self, size: Tuple[int, int]) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        key = repr(
+            (
+                MAP_VERSION,
+                self.intrinsics.K.tolist(),
+                self.intrinsics.D.tolist(),
+                size,
+                self.crop,
+                cv2.__version__,
+            )
+        )
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"fisheye-{size[0]}x{size[1]}-{digest}.npz")
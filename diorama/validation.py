@@ -0,0 +1,251 @@
+"""Offline validation of keyframe animations against servo constraints.
+
+Animations are sampled at the loop rate and every sample is checked against
+the constraints of an IoController. Animations without violations are marked
+``constraint_safe``, which lets the controller skip runtime range checks on
+ticks where only such animations drive the servos. Other constraints are still
+checked at runtime, servos move between the sampled targets with their speed
+limits and may cross a forbidden region no sample lies in.
+
+Usage:
+    python -m diorama.validation --config config/default.json animations/
+"""
+
+import argparse
+import copy
+import json
+import logging
+import math
+import os
+import sys
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+from numpy.typing import NDArray
+
+from diorama.animation import AnimationError, KeyFrameAnimation
+from diorama.io import Constraint, IoController, Servo
+from diorama.keyframes import KEYFRAMES_EXTENSION
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Violation:
+    """A constraint violated by an animation sample."""
+
+    tick: int
+    frame: int
+    time: float
+    constraint: str
+    values: Dict[str, float]
+
+
+@dataclass
+class ValidationReport:
+    """Result of validating one animation."""
+
+    name: Optional[str]
+    ticks: int = 0
+    violations: List[Violation] = field(default_factory=list)
+    unproven: List[str] = field(default_factory=list)
+
+    @property
+    def safe(self) -> bool:
+        """Whether every constraint was checked and none was violated."""
+        return not self.violations and not self.unproven
+
+
+class AnimationValidator:
+    """Checks keyframe animations against the constraints of an IoController.
+
+    The validator works on copies of the controller's servos, so it can be
+    used while the controller is running. Validations are serialized, so
+    dances loaded in the background can be validated concurrently.
+    """
+
+    def __init__(self, io_controller: IoController, fps: float) -> None:
+        """Initialize the validator.
+
+        Args:
+            io_controller: Controller whose constraints are checked.
+            fps: Loop rate at which animations are sampled.
+        """
+        servos, constraints = copy.deepcopy(
+            (list(io_controller.servos.values()), list(io_controller.constraints))
+        )
+        self.servos = {servo.name: servo for servo in servos}
+        self.constraints: List[Constraint] = constraints
+        self.fps = fps
+        self._lock = Lock()
+
+    def validate(self, animation: KeyFrameAnimation) -> ValidationReport:
+        """Sample one loop of ``animation`` and check every sample."""
+        with self._lock:
+            return self._validate(animation)
+
+    def _validate(self, animation: KeyFrameAnimation) -> ValidationReport:
+        report = ValidationReport(animation.name)
+        track = animation.track
+        driven = {
+            name: self.servos[name] for name in track.channels if name in self.servos
+        }
+
+        # Constraints that depend on servos the animation does not drive
+        # cannot be proven by looking at the animation alone
+        checked: List[Constraint] = []
+        for constraint in self.constraints:
+            servos = constraint.servos
+            if servos is None or any(servo.name not in driven for servo in servos):
+                if servos is None or any(servo.name in driven for servo in servos):
+                    report.unproven.append(repr(constraint))
+                continue
+            checked.append(constraint)
+
+        report.ticks = max(1, math.ceil(animation.duration * self.fps))
+        for tick in range(report.ticks):
+            time = tick / self.fps
+            sample = track.sample(time)
+            if sample is not None:
+                frame = int(time * animation.fps)
+                self._check(
+                    report, animation, checked, driven, tick, time, frame, *sample
+                )
+
+        # Keyframes between two loop ticks are never sampled, but they hold
+        # the extremes every servo is driven to
+        for time, values, mask in track.rows():
+            if 0 <= time <= animation.duration:
+                tick, frame = int(time * self.fps), round(time * animation.fps)
+                self._check(
+                    report, animation, checked, driven, tick, time, frame, values, mask
+                )
+        return report
+
+    def _check(
+        self,
+        report: ValidationReport,
+        animation: KeyFrameAnimation,
+        checked: List[Constraint],
+        driven: Dict[str, Servo],
+        tick: int,
+        time: float,
+        frame: int,
+        values: NDArray,
+        mask: NDArray,
+    ) -> None:
+        """Move the driven servos to one sample and check the constraints."""
+        positions = {
+            name: value
+            for name, value, present in zip(
+                animation.track.channels, values.tolist(), mask.tolist()
+            )
+            if present and name in driven
+        }
+        for name, position in positions.items():
+            driven[name].position = position
+
+        for constraint in checked:
+            if any(
+                servo.name in positions and not constraint.is_allowed(servo)
+                for servo in constraint.servos
+            ):
+                report.violations.append(
+                    Violation(
+                        tick=tick,
+                        frame=frame,
+                        time=time,
+                        constraint=repr(constraint),
+                        values={
+                            servo.name: servo.position for servo in constraint.servos
+                        },
+                    )
+                )
+
+    def mark(self, animations: Iterable[KeyFrameAnimation]) -> List[ValidationReport]:
+        """Validate animations and set their ``constraint_safe`` flag."""
+        reports = []
+        for animation in animations:
+            report = self.validate(animation)
+            animation.constraint_safe = report.safe
+            if report.violations:
+                logger.warning(
+                    f"Animation {animation.name} violates constraints in "
+                    f"{len(report.violations)} of {report.ticks} ticks"
+                )
+            reports.append(report)
+        return reports
+
+
+def find_animations(paths: Iterable[str]) -> List[str]:
+    """Collect animation files from files and directories."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.endswith((".json", KEYFRAMES_EXTENSION))
+                )
+        else:
+            files.append(path)
+    return files
+
+
+def main() -> int:
+    """Batch check animation files against the configured constraints."""
+    parser = argparse.ArgumentParser(
+        description="Check animations against the servo constraints."
+    )
+    parser.add_argument(
+        "paths", nargs="*", default=["animations"], help="Animation files or folders"
+    )
+    parser.add_argument(
+        "--config",
+        type=str,
+        default="config/default.json",
+        help="Path to the configuration file (default: config/default.json)",
+    )
+    parser.add_argument(
+        "--fps", type=float, default=20, help="Loop rate to sample at (default: 20)"
+    )
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    validator = AnimationValidator(IoController.from_config(config["gpio"]), args.fps)
+
+    failed = False
+    for file_path in find_animations(args.paths):
+        try:
+            animation = KeyFrameAnimation.from_path(file_path)
+        except AnimationError as e:
+            print(f"ERROR   {file_path}: {e}")
+            failed = True
+            continue
+
+        report = validator.validate(animation)
+        if report.violations:
+            failed = True
+            print(f"FAIL    {file_path}: {len(report.violations)} violations")
+            for violation in report.violations:
+                print(
+                    f"        frame {violation.frame} (tick {violation.tick}, "
+                    f"{violation.time:.2f}s): {violation.constraint} "
+                    f"{violation.values}"
+                )
+        elif report.unproven:
+            print(f"UNSAFE  {file_path}: cannot prove {', '.join(report.unproven)}")
+        else:
+            print(f"OK      {file_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,15 +4,19 @@ Main module for the Marionette control system.
 Handles GPIO setup, pose estimation, and web UI integration.
 """
 import os
-import json
-import time
 import threading
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Optional
 import argparse
 import socket
 import RPi.GPIO as GPIO
 from webui import webui
+from webui.events import LiveEvents
+from webui.routes import frame_summary, pose_summary, state_summary
+from webui.sliders import SliderChannel
+from webui.stream import JpegCache, MjpegStreamer
 from diorama.pose import PoseEstimator
+from diorama.pose_process import ProcessPoseEstimator
+from diorama.undistort import FisheyeUndistorter
 from diorama.io import ServoKitIoController
 from diorama.animation import (
     WebUIAnimation,
@@ -20,6 +24,10 @@ from diorama.animation import (
     MultiKeyframeAnimation,
 )
 from diorama.orchestrator import Orchestrator
+from diorama.scheduler import TickScheduler
+from diorama.validation import AnimationValidator
+from utils.config_store import ConfigStore
+from utils.show_log import ShowLog
 from utils.state import StateMachine, StateContext
 
 
@@ -50,9 +58,15 @@ def setup_inputs(pin_config: Dict[str, Any]) -> None:
 
 
 def create_animations(
-    config: Dict, pose_estimator: PoseEstimator
+    config: Dict,
+    pose_estimator: PoseEstimator,
+    on_dance_load: Optional[Callable[[KeyFrameAnimation], None]] = None,
 ) -> Dict[str, KeyFrameAnimation]:
-    """Create and return all animations used by the system."""
+    """Create and return all animations used by the system.
+
+    Dances are loaded lazily, ``on_dance_load`` is called with each of them
+    once it is loaded.
+    """
     animations = {}
     # Web UI animation
     animations["webui"] = WebUIAnimation(priority=50, strength=0)
@@ -77,17 +91,23 @@ def create_animations(
     if not os.path.exists(dances_closed_path):
         os.makedirs(dances_closed_path)
 
+    library_options = {
+        **config["animations"].get("library", {}),
+        "on_load": on_dance_load,
+    }
     animations["dances_open"] = MultiKeyframeAnimation.from_path(
         dances_open_path,
         priority=11,
         strength=0,
         animation_duration=45,
+        library_options=library_options,
     )
     animations["dances_closed"] = MultiKeyframeAnimation.from_path(
         dances_closed_path,
         priority=11,
         strength=0,
         animation_duration=45,
+        library_options=library_options,
     )
     animations["off"] = KeyFrameAnimation.from_path(
         config["animations"]["off"], priority=100, strength=1, strength_speed=1
@@ -134,20 +154,55 @@ def main() -> None:
     )
     args = parser.parse_args()
     # Load configuration
-    with open(args.config) as f:
-        config = json.load(f)
+    config_store = ConfigStore(args.config)
+    config = config_store.get()
     # Initialize GPIO
     setup_inputs(config["gpio"]["inputs"])
     # Initialize pose estimation and I/O controller
     min_confidence = config.get("gpio", {}).get("min_detection_confidence", 0.8)
+    dead_band = config.get("gpio", {}).get("dead_band", 0.0)
+    pose_config = config.get("pose", {})
+    pose_options = {
+        "min_detection_confidence": min_confidence,
+        "detector_options": pose_config.get("detector"),
+        "motion_gate_options": pose_config.get("motion_gate"),
+        "undistorter": FisheyeUndistorter.from_config(pose_config),
+        "governor_options": pose_config.get("governor"),
+    }
+    # Optionally run inference in a worker process to keep it off the GIL
+    if pose_config.get("backend") == "process":
+        pose_estimator_cls = ProcessPoseEstimator
+        pose_options["cpu_affinity"] = pose_config.get("cpu_affinity")
+    else:
+        pose_estimator_cls = PoseEstimator
     with (
-        PoseEstimator(min_detection_confidence=min_confidence) as pose_estimator,
-        ServoKitIoController.from_config(config["gpio"]) as io_controller,
+        pose_estimator_cls(**pose_options) as pose_estimator,
+        ServoKitIoController.from_config(
+            config["gpio"], dead_band=dead_band
+        ) as io_controller,
+        ShowLog(
+            config.get("show_log", {}).get("path", "animation-log.log")
+        ) as show_log,
     ):
         # Create orchestrator
         orchestrator = Orchestrator(io_controller, 20)
+        scheduler = TickScheduler(orchestrator.fps)
+        # Back off pose inference when the animation loop misses deadlines
+        pose_estimator.governor.watch(scheduler)
+        # Validate keyframe animations so proven safe ones skip runtime checks,
+        # dances are validated when the library loads them
+        validator = AnimationValidator(io_controller, orchestrator.fps)
         # Create animations
-        animations = create_animations(config, pose_estimator)
+        animations = create_animations(
+            config,
+            pose_estimator,
+            on_dance_load=lambda dance: validator.mark([dance]),
+        )
+        validator.mark(
+            animation
+            for animation in animations.values()
+            if isinstance(animation, KeyFrameAnimation)
+        )
         # Add animations to orchestrator
         for animation in animations.values():
             orchestrator.add(animation)
@@ -157,13 +212,38 @@ def main() -> None:
             animations=animations,
             gpio_state={},
             config=config,
+            show_log=show_log,
         )
         state_machine = StateMachine(state_context)
         # Set up web UI
         webui.config_path = args.config
+        webui.config_store = config_store
+        # Let the running state machine see saved settings without a restart
+        config_store.add_listener(
+            lambda new_config: setattr(state_context, "config", new_config)
+        )
         webui.marionette_animator = animations["webui"]
+        webui.slider_channel = SliderChannel(
+            animations["webui"],
+            clamp=io_controller.clamp,
+            **config.get("webui", {}).get("sliders", {}),
+        )
         webui.pose_estimator = pose_estimator
+        stream_config = dict(config.get("webui", {}).get("stream", {}))
+        webui.jpeg_cache = JpegCache(
+            pose_estimator, quality=stream_config.pop("quality", 80)
+        )
+        webui.streamer = MjpegStreamer(webui.jpeg_cache, **stream_config)
         webui.state_machine = state_machine
+        webui.scheduler = scheduler
+        # Push changes to the web UI instead of having it poll
+        events = LiveEvents(**config.get("webui", {}).get("events", {}))
+        events.add_source("state", state_summary, interval=1.0)
+        events.add_source("pose", lambda: pose_summary(pose_estimator, digits=2))
+        events.add_source("frame", frame_summary, interval=0.1)
+        state_machine.add_transition_listener(lambda state: events.refresh("state"))
+        pose_estimator.add_listener(lambda estimator: events.refresh("pose"))
+        webui.events = events
 
         local_ip = get_local_ip()
         if local_ip:
@@ -175,12 +255,8 @@ def main() -> None:
             target=webui.run, args=("0.0.0.0", args.port), daemon=True
         )
         server_thread.start()
-        # Main animation loop
-        previous_time = time.time()
-        while True:
-            current_time = time.time()
-            delta_time = current_time - previous_time
-            previous_time = current_time
+        # Main animation loop, paced by the scheduler
+        for delta_time in scheduler:
             # Update GPIO state
             state_context.gpio_state = {
                 "freigabe": GPIO.input(config["gpio"]["inputs"]["freigabe"])
@@ -0,0 +1,121 @@
+"""ServoBlender against the per-name blend loop it replaced."""
+
+import random
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pytest
+
+from diorama.blend import ServoBlender
+from diorama.io import Servo
+
+SERVO_NAMES = [f"servo{idx}" for idx in range(8)]
+STRENGTHS = (0.0, 1.0, 0.25, 0.5)
+
+# Layers in ascending priority: strength, values by name and, for array
+# layers, the channel list the values are pushed with
+Layer = Tuple[float, Dict[str, float], Optional[List[str]]]
+
+
+def make_servos(rng: random.Random) -> List[Servo]:
+    return [
+        Servo(name, idx, speed=100, position=rng.uniform(0, 180))
+        for idx, name in enumerate(SERVO_NAMES)
+    ]
+
+
+def random_layers(rng: random.Random) -> List[Layer]:
+    layers = []
+    for _ in range(rng.randint(1, 6)):
+        strength = rng.choice(STRENGTHS + (rng.random(),))
+        names = rng.sample(SERVO_NAMES, rng.randint(0, len(SERVO_NAMES)))
+        values = {name: rng.uniform(0, 180) for name in names}
+        channels = None
+        if rng.random() < 0.5:
+            # Array layers may carry channels they leave unset this tick
+            channels = names + rng.sample(SERVO_NAMES, 2)
+            rng.shuffle(channels)
+            channels = list(dict.fromkeys(channels))
+        layers.append((strength, values, channels))
+    return layers
+
+
+def reference_targets(servos: List[Servo], layers: List[Layer]) -> Dict[str, float]:
+    """The blend loop of Orchestrator.tick before ServoBlender."""
+    by_name = {servo.name: servo for servo in servos}
+    out_values: Dict[str, float] = {}
+    for strength, values, _ in layers:
+        for name, value in values.items():
+            if name not in out_values:
+                out_values[name] = by_name[name].position
+            out_values[name] = strength * value + (1 - strength) * out_values[name]
+    return out_values
+
+
+def blended_targets(servos: List[Servo], layers: List[Layer]) -> Dict[str, float]:
+    """Blend like Orchestrator._evaluate, from the highest priority downward."""
+    for servo in servos:
+        servo.target_position = None
+    blender = ServoBlender(servos)
+    blender.begin()
+    for strength, values, channels in reversed(layers):
+        if blender.fully_covered or (
+            channels is not None and blender.is_covered(channels)
+        ):
+            continue
+        if channels is None:
+            if strength == 0:
+                blender.touch_dict(values)
+            else:
+                blender.push_dict(strength, values)
+            continue
+        array = np.array([values.get(name, 0.0) for name in channels])
+        mask = np.array([name in values for name in channels])
+        if strength == 0:
+            blender.touch_array(channels, mask)
+        else:
+            blender.push_array(strength, channels, array, mask)
+    blender.apply()
+    return {
+        servo.name: servo.target_position
+        for servo in servos
+        if servo.target_position is not None
+    }
+
+
+@pytest.mark.parametrize("seed", range(500))
+def test_matches_per_name_loop(seed: int) -> None:
+    rng = random.Random(seed)
+    servos = make_servos(rng)
+    layers = random_layers(rng)
+    assert blended_targets(servos, layers) == reference_targets(servos, layers)
+
+
+def test_blends_repeatedly_with_shared_channel_lists() -> None:
+    rng = random.Random(0)
+    servos = make_servos(rng)
+    blender = ServoBlender(servos)
+    for _ in range(50):
+        layers = random_layers(rng)
+        expected = reference_targets(servos, layers)
+        blender.begin()
+        for strength, values, _ in reversed(layers):
+            # A new but equal channel list each tick, like a replayed dance
+            channels = list(SERVO_NAMES)
+            array = np.array([values.get(name, 0.0) for name in channels])
+            mask = np.array([name in values for name in channels])
+            if strength == 0:
+                blender.touch_array(channels, mask)
+            else:
+                blender.push_array(strength, channels, array, mask)
+        blender.apply()
+        for name, value in expected.items():
+            assert blender.servos[SERVO_NAMES.index(name)].target_position == value
+    assert len(blender._channel_maps) == 1
+
+
+def test_unknown_servos_are_ignored() -> None:
+    servos = make_servos(random.Random(1))
+    layers: List[Layer] = [(0.5, {"servo0": 10.0, "missing": 5.0}, None)]
+    expected = {"servo0": 0.5 * 10.0 + 0.5 * servos[0].position}
+    assert blended_targets(servos, layers) == expected
@@ -0,0 +1,117 @@
+"""Lossless conversion between the editor's JSON and binary keyframe files."""
+
+import json
+import sys
+
+import pytest
+
+from diorama import keyframes
+from diorama.keyframes import (
+    KeyframeData,
+    KeyframeFormatError,
+    decode_keyframes,
+    encode_keyframes,
+    read_keyframes,
+    write_keyframes,
+)
+
+
+def round_trip(animation):
+    data = KeyframeData.from_json(animation)
+    return decode_keyframes(encode_keyframes(data)).to_json()
+
+
+def make_animation(values, fps=10, **config):
+    return {
+        "keyframes": [
+            {"frameIndex": idx * 5, "values": row} for idx, row in enumerate(values)
+        ],
+        "config": {"totalFrames": len(values) * 5, "fps": fps, **config},
+    }
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [{"a": 0, "b": 180}, {"a": 90}],
+        [{"a": -5, "b": 70000}, {"b": 3}],
+        [{"a": 0.5, "b": 1.25}, {"a": 179.75}],
+        [{"a": 0.1, "b": 1 / 3}, {"a": 2.0000000001}],
+        [{"a": 10, "b": 0.1}, {"a": 12.0, "b": 7}],
+    ],
+    ids=["uint8", "int32", "float32", "float64", "mixed"],
+)
+def test_round_trip_is_lossless(values):
+    animation = make_animation(values)
+    result = round_trip(animation)
+    assert result == animation
+    # Integers and floats stay distinguishable, e.g. 12.0 versus 12
+    assert json.dumps(result) == json.dumps(animation)
+
+
+def test_round_trip_keeps_float_fps_and_extra_fields():
+    animation = make_animation([{"a": 1}, {"a": 2}], fps=12.5, currentFrameIndex=3)
+    animation["keyframes"][1]["selected"] = True
+    animation["name"] = "wave"
+    assert json.dumps(round_trip(animation)) == json.dumps(animation)
+
+
+def test_write_and_read_file(tmp_path):
+    animation = make_animation([{"a": 0.25}, {"a": 1.5}])
+    path = str(tmp_path / "dance.keyframes")
+    write_keyframes(path, KeyframeData.from_json(animation))
+    assert read_keyframes(path).to_json() == animation
+
+
+def test_truncated_file_raises_format_error(tmp_path):
+    buffer = encode_keyframes(
+        KeyframeData.from_json(make_animation([{"a": 0.25}, {"a": 1.5}]))
+    )
+    for size in (0, 10, len(buffer) - 1):
+        with pytest.raises(KeyframeFormatError):
+            decode_keyframes(buffer[:size])
+
+    path = tmp_path / "dance.keyframes"
+    path.write_bytes(buffer[: len(buffer) // 2])
+    with pytest.raises(KeyframeFormatError):
+        read_keyframes(str(path))
+
+
+def test_malformed_file_raises_format_error():
+    with pytest.raises(KeyframeFormatError):
+        decode_keyframes(b"NOPE" + bytes(64))
+
+
+@pytest.mark.parametrize(
+    "animation",
+    [
+        {"keyframes": []},
+        make_animation([{"a": "high"}]),
+        make_animation([{"a": 2**60}]),
+        {
+            "keyframes": [{"frameIndex": 2**31, "values": {"a": 1}}],
+            "config": {"totalFrames": 10, "fps": 10},
+        },
+        make_animation([{"a": 1}], totalFrames=2**32),
+    ],
+    ids=["no-config", "string", "inexact-int", "frame-index", "total-frames"],
+)
+def test_unencodable_animation_raises_format_error(animation):
+    with pytest.raises(KeyframeFormatError):
+        encode_keyframes(KeyframeData.from_json(animation))
+
+
+def test_cli_reports_out_of_range_frames(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "dance.json"
+    source.write_text(
+        json.dumps(
+            {
+                "keyframes": [{"frameIndex": 2**40, "values": {"a": 1}}],
+                "config": {"totalFrames": 10, "fps": 10},
+            }
+        )
+    )
+    monkeypatch.setattr(sys, "argv", ["keyframes", str(source)])
+    assert keyframes.main() == 1
+    assert "Failed to convert" in capsys.readouterr().out
+    assert not (tmp_path / "dance.keyframes").exists()
@@ -0,0 +1,45 @@
+"""Playback of dance directories through a DanceLibrary."""
+
+import json
+import shutil
+
+import pytest
+
+from diorama.animation import AnimationError, MultiKeyframeAnimation
+
+DANCE = {
+    "keyframes": [
+        {"frameIndex": 0, "values": {"head": 10}},
+        {"frameIndex": 5, "values": {"head": 20}},
+    ],
+    "config": {"totalFrames": 10, "fps": 10},
+}
+
+
+@pytest.fixture
+def dances(tmp_path):
+    for name in ("b", "c"):
+        (tmp_path / f"{name}.json").write_text(json.dumps(DANCE))
+    (tmp_path / "a_broken.json").write_text('{"keyframes": [')
+    return tmp_path
+
+
+def test_start_skips_dances_that_fail_to_load(dances):
+    animation = MultiKeyframeAnimation.from_path(str(dances))
+    started = []
+    for _ in range(4):
+        animation.start()
+        assert animation.is_running
+        started.append(animation.animation.name)
+    assert started == ["b.json", "c.json", "b.json", "c.json"]
+    assert animation.library.stats.failed_loads >= 1
+
+
+def test_start_fails_if_no_dance_loads(dances):
+    for name in ("b", "c"):
+        shutil.copy(dances / "a_broken.json", dances / f"{name}.json")
+    animation = MultiKeyframeAnimation.from_path(str(dances))
+    animation.start()
+    assert not animation.is_running
+    with pytest.raises(AnimationError):
+        animation._load_next()
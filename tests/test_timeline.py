@@ -0,0 +1,42 @@
+"""Reading of corrupt timeline files."""
+
+import os
+
+import numpy as np
+import pytest
+
+from diorama.animation import AnimationError, KeyFrameAnimation
+from diorama.timeline import TimelineError, read_timeline, write_timeline
+
+
+@pytest.fixture
+def timeline(tmp_path):
+    path = str(tmp_path / "dance.timeline")
+    frames = np.arange(40, dtype=float).reshape(10, 4)
+    write_timeline(path, frames, ["a", "b", "c", "d"], 20, 0.5)
+    return path
+
+
+def truncate(path: str, size: int) -> None:
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+
+def test_reads_complete_timeline(timeline):
+    track, duration = read_timeline(timeline)
+    assert track.channels == ["a", "b", "c", "d"]
+    assert duration == 0.5
+
+
+@pytest.mark.parametrize("keep", [-1, -40, 58])
+def test_truncated_timeline_raises_timeline_error(timeline, keep):
+    size = os.path.getsize(timeline)
+    truncate(timeline, keep if keep > 0 else size + keep)
+    with pytest.raises(TimelineError):
+        read_timeline(timeline)
+
+
+def test_truncated_timeline_fails_to_load_as_animation(timeline):
+    truncate(timeline, os.path.getsize(timeline) - 1)
+    with pytest.raises(AnimationError):
+        KeyFrameAnimation.from_path(timeline)
@@ -0,0 +1,51 @@
+"""Validation of keyframe animations against servo constraints."""
+
+import numpy as np
+
+from diorama.animation import KeyFrameAnimation
+from diorama.io import IoController, RangeConstraint, Servo
+from diorama.timeline import TimelineTrack
+from diorama.validation import AnimationValidator
+
+
+def make_validator(fps: float = 20) -> AnimationValidator:
+    servo = Servo("head", 0, speed=100, position=90)
+    io_controller = IoController([servo], [RangeConstraint(servo, 0, 180)])
+    return AnimationValidator(io_controller, fps)
+
+
+def make_animation(keyframes, total_frames: int = 30, fps: int = 30):
+    return KeyFrameAnimation(
+        {
+            "keyframes": [
+                {"frameIndex": frame, "values": {"head": value}}
+                for frame, value in keyframes
+            ],
+            "config": {"totalFrames": total_frames, "fps": fps},
+        }
+    )
+
+
+def test_in_range_animation_is_safe():
+    report = make_validator().validate(make_animation([(0, 10), (15, 170)]))
+    assert report.safe
+    assert report.ticks == 20
+
+
+def test_keyframe_between_loop_ticks_is_checked():
+    # Frame 7 at 30 fps lies between the 20 fps ticks at frames 6 and 7.5,
+    # whose interpolated values are both in range
+    animation = make_animation([(0, 90), (7, 185), (8, 90)])
+    report = make_validator().validate(animation)
+    assert not report.safe
+    assert [violation.frame for violation in report.violations] == [7]
+    assert report.violations[0].values == {"head": 185}
+
+
+def test_every_timeline_frame_is_checked():
+    frames = np.full((60, 1), 90.0)
+    frames[13] = -5
+    animation = make_animation([(0, 90), (15, 90)])
+    animation.track = TimelineTrack(frames, ["head"], fps=60)
+    report = make_validator().validate(animation)
+    assert [violation.time for violation in report.violations] == [13 / 60]
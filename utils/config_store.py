@@ -0,0 +1,144 @@
+"""Shared in-memory copy of the JSON configuration file."""
+
+import copy
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from threading import RLock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+ConfigListener = Callable[[Dict[str, Any]], None]
+
+
+class ConfigStore:
+    """Keeps the parsed configuration in memory and writes it atomically.
+
+    ``get`` only parses the file again when its modification time or size
+    changed, so it is cheap to call per request. Writes are serialized by a
+    lock, go to a temporary file in the same directory and replace the
+    config with a rename, so a power loss leaves either the old or the new
+    file but never a partial one. Listeners are called with the new config
+    after every write and after picking up an external change.
+
+    The returned config is shared and must be treated as read only, changes
+    go through ``update``.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the store.
+
+        Args:
+            path: Path of the JSON configuration file.
+        """
+        self.path = path
+        self._lock = RLock()
+        self._config: Optional[Dict[str, Any]] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._listeners: List[ConfigListener] = []
+
+    def add_listener(self, listener: ConfigListener) -> None:
+        """Call ``listener`` with the new config whenever it changes."""
+        self._listeners.append(listener)
+
+    def get(self) -> Dict[str, Any]:
+        """Return the current config, reloading it if the file changed."""
+        signature = self._stat()
+        config = self._config
+        if config is not None and signature == self._signature:
+            return config
+
+        with self._lock:
+            if self._config is None or self._stat() != self._signature:
+                self._load()
+                if config is not None:
+                    logger.info(f"Reloaded changed config {self.path}")
+                    self._notify()
+            return self._config
+
+    def update(
+        self, changes: Dict[str, Any], backup: bool = False
+    ) -> Dict[str, Any]:
+        """Replace top level sections of the config and save it.
+
+        Args:
+            changes: Sections to set, e.g. ``{"opening_hours": {...}}``.
+            backup: Whether to keep a timestamped copy of the old file.
+
+        Returns:
+            The new config.
+        """
+        with self._lock:
+            config = copy.deepcopy(self.get())
+            config.update(changes)
+            if backup:
+                self._backup()
+            self._write(config)
+            self._notify()
+            return config
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> None:
+        # Stat before reading, so a write during the read triggers a reload
+        signature = self._stat()
+        with open(self.path) as f:
+            self._config = json.load(f)
+        self._signature = signature
+
+    def _write(self, config: Dict[str, Any]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".config-", suffix=".tmp", dir=directory
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(config, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, tmp_path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Make the rename itself durable
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+        self._config = config
+        self._signature = self._stat()
+
+    def _backup(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        config_dir, config_filename = os.path.split(self.path)
+        name, ext = os.path.splitext(config_filename)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+        backup_path = os.path.join(config_dir, f"{name}_{timestamp}{ext}")
+        shutil.copy2(self.path, backup_path)
+
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            try:
+                listener(self._config)
+            except Exception as e:
+                logger.error(f"Config listener failed: {e}")
@@ -0,0 +1,64 @@
+"""Single slot mailbox passing the latest item between threads."""
+
+import time
+from threading import Condition
+from typing import Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class Mailbox(Generic[T]):
+    """Holds only the most recent item, older unread items are dropped.
+
+    A producer ``put``s items at its own rate and a consumer ``take``s
+    whatever is newest, so a slow consumer never works through a backlog
+    of stale items.
+    """
+
+    def __init__(self) -> None:
+        self._condition = Condition()
+        self._item: Optional[T] = None
+        self._stamp: float = 0.0
+        self._has_item = False
+        self.closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item: T) -> None:
+        """Store an item, replacing an unread one."""
+        with self._condition:
+            if self._has_item:
+                self.dropped += 1
+            self._item = item
+            self._stamp = time.monotonic()
+            self._has_item = True
+            self.put_count += 1
+            self._condition.notify()
+
+    def take(self, timeout: Optional[float] = None) -> Optional[Tuple[T, float]]:
+        """Wait for and remove the newest item.
+
+        Args:
+            timeout: Maximum time to wait in seconds, None waits forever.
+
+        Returns:
+            Tuple of the item and the monotonic time it was put, or None if
+            the timeout expired or the mailbox was closed while empty.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._has_item or self.closed, timeout
+            ):
+                return None
+            if not self._has_item:
+                return None
+            item, stamp = self._item, self._stamp
+            self._item = None
+            self._has_item = False
+            return item, stamp
+
+    def close(self) -> None:
+        """Wake up waiting consumers; items still stored can be taken."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
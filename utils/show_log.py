@@ -0,0 +1,211 @@
+"""Recorder of started shows with a running total.
+
+Every started show is appended as an ISO timestamp line to the show log.
+The log is rotated daily into ``<name>-<date><ext>`` next to it, and a
+small index file remembers how many shows the rotated files hold, so the
+total is known at startup after counting only the current day.
+"""
+
+import glob
+import json
+import logging
+import os
+from datetime import date, datetime
+from threading import Lock
+from typing import Callable, Dict, Optional, TextIO
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def count_lines(path: str) -> int:
+    """Count the lines of a file without loading it at once.
+
+    Every newline ends a line, a last line without a newline counts as well.
+    """
+    count = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            count += chunk.count(b"\n")
+            last = chunk[-1:]
+    # A last line without a newline still counts
+    return count + (last != b"\n")
+
+
+class ShowLog:
+    """Appends show events to a daily rotated log and keeps the totals.
+
+    Attributes:
+        path: Log file of the current day
+        archived: Number of shows in rotated log files
+    """
+
+    def __init__(
+        self,
+        path: str = "animation-log.log",
+        clock: Callable[[], datetime] = datetime.now,
+    ) -> None:
+        """Initialize the show log.
+
+        Args:
+            path: Log file of the current day.
+            clock: Function returning the local time of an event.
+        """
+        self.path = path
+        self.index_path = path + ".index"
+        self.archived = 0
+        self._current = 0
+        self._clock = clock
+        self._lock = Lock()
+        self._file: Optional[TextIO] = None
+        self._day: Optional[date] = None
+
+    @property
+    def current(self) -> int:
+        """Number of shows recorded today, rotating the log after midnight."""
+        with self._lock:
+            self._roll_over(self._clock().date())
+            return self._current
+
+    @property
+    def total(self) -> int:
+        """Number of shows ever recorded."""
+        # Read current first, rotating moves shows into archived
+        current = self.current
+        return self.archived + current
+
+    def open(self) -> None:
+        """Seed the counters from the index and the current log, then open it."""
+        with self._lock:
+            self._load_index()
+            today = self._clock().date()
+            day = self._first_day()
+            if day is not None and day != today:
+                self._rotate(day)
+            self._current = 0
+            complete = True
+            if os.path.exists(self.path):
+                self._current = count_lines(self.path)
+                complete = self._ends_with_newline()
+            self._day = today
+            self._file = open(self.path, "a")
+            if not complete:
+                self._file.write("\n")
+        logger.info(f"Show log {self.path}: {self.total} shows, {self.current} today")
+
+    def record(self) -> None:
+        """Record a started show."""
+        now = self._clock()
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("Show log is not open")
+            self._roll_over(now.date())
+            self._file.write(now.isoformat() + "\n")
+            # The handle stays open, flushing keeps the event if the process dies
+            self._file.flush()
+            self._current += 1
+
+    def close(self) -> None:
+        """Close the log file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> "ShowLog":
+        """Open the show log."""
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Close the show log."""
+        self.close()
+
+    def _roll_over(self, today: date) -> None:
+        """Rotate the open log once the day changed."""
+        if self._file is None or today == self._day:
+            return
+        self._file.close()
+        # Days without shows leave no rotated file
+        if self._current:
+            self._rotate(self._day)
+        self._current = 0
+        self._day = today
+        self._file = open(self.path, "a")
+
+    def _rotated_path(self, day: date) -> str:
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}-{day.isoformat()}{ext}"
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _first_day(self) -> Optional[date]:
+        """Date of the first event in the current log."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            line = f.readline().strip()
+        try:
+            return datetime.fromisoformat(line).date() if line else None
+        except ValueError:
+            return date.fromtimestamp(os.path.getmtime(self.path))
+
+    def _rotate(self, day: Optional[date]) -> None:
+        """Move the current log into the file of ``day`` and count it."""
+        if not os.path.exists(self.path):
+            return
+        target = self._rotated_path(day or self._clock().date())
+        if os.path.exists(target):
+            with open(self.path) as source, open(target, "a") as f:
+                f.write(source.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, target)
+        self._load_index(recount=os.path.basename(target))
+        logger.info(f"Rotated show log to {target}")
+
+    def _load_index(self, recount: Optional[str] = None) -> None:
+        """Read the index and count rotated files it does not know yet.
+
+        Files from before the index existed, e.g. yearly logs named like the
+        rotated ones, are counted once and added to the index.
+
+        Args:
+            recount: Name of a rotated file that changed and is counted again.
+        """
+        index: Dict[str, int] = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)["files"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Rebuilding broken show log index: {e}")
+
+        stem, ext = os.path.splitext(self.path)
+        counts = {}
+        for path in sorted(glob.glob(glob.escape(stem) + "-*" + ext)):
+            name = os.path.basename(path)
+            if name in index and name != recount:
+                counts[name] = index[name]
+            else:
+                counts[name] = count_lines(path)
+
+        self.archived = sum(counts.values())
+        if counts != index:
+            self._write_index(counts)
+
+    def _write_index(self, counts: Dict[str, int]) -> None:
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": counts}, f, indent=4)
+        os.replace(tmp_path, self.index_path)
@@ -5,25 +5,16 @@ Handles different states and transitions between them.
 
 from enum import Enum
 from dataclasses import dataclass
-from typing import Dict
+from typing import Callable, Dict, List, Optional
 
 from diorama.pose import PoseEstimator
 from diorama.animation import KeyFrameAnimation
 import time
 
-from datetime import datetime
+from utils.show_log import ShowLog
 from utils.time_utils import is_store_open, get_default_schedule
 
 
-def log_animation():
-    # Get the current date and time in ISO format
-    current_datetime = datetime.now().isoformat()
-
-    # Open the log file in append mode and write the current datetime
-    with open("./animation-log.log", "a") as log_file:
-        log_file.write(current_datetime + "\n")
-
-
 class State(Enum):
     NO_OBSERVERS = "no_observers"
     OBSERVER = "observer"
@@ -37,6 +28,7 @@ class StateContext:
     animations: Dict[str, KeyFrameAnimation]
     gpio_state: Dict[str, bool]
     config: Dict
+    show_log: Optional[ShowLog] = None
 
 
 class StateMachine:
@@ -45,10 +37,17 @@ class StateMachine:
         self.state = State.NO_OBSERVERS
         self.state_start_time = time.time()
         self.freigabe_off_start_time = None
+        self._transition_listeners: List[Callable[[State], None]] = []
+
+    def add_transition_listener(self, listener: Callable[[State], None]) -> None:
+        # Listeners run in the animation loop and must return quickly
+        self._transition_listeners.append(listener)
 
     def transition(self, new_state: State) -> None:
         self.state = new_state
         self.state_start_time = time.time()
+        for listener in self._transition_listeners:
+            listener(new_state)
 
     def time_in_state(self) -> float:
         return time.time() - self.state_start_time
@@ -121,7 +120,8 @@ class StateMachine:
             self.context.pose_estimator.presence_time > presence_trigger_time
             or self.context.gpio_state["start"]
         ):
-            log_animation()
+            if self.context.show_log is not None:
+                self.context.show_log.record()
 
             # Determine which animation set to use
             schedule = self.context.config.get("opening_hours", get_default_schedule())
@@ -0,0 +1,182 @@
+"""Server-sent events pushing live state changes to the web UI."""
+
+import json
+import logging
+import time
+from dataclasses import dataclass
+from threading import Condition, Thread
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EventStats:
+    """Usage of a LiveEvents hub."""
+
+    clients: int = 0
+    published: int = 0
+    sent: int = 0
+
+
+@dataclass
+class _Source:
+    sampler: Callable[[], Any]
+    interval: Optional[float]
+    next_sample: float = 0.0
+
+
+class LiveEvents:
+    """Publishes the latest value of named events to SSE clients.
+
+    Every event keeps only its newest value and a version. ``publish`` drops
+    values equal to the current one, so clients only hear about changes.
+    Each client sends at most one batch per ``min_interval``; several changes
+    of an event within that window are coalesced into its newest value.
+
+    Values come either from ``publish`` or from samplers registered with
+    ``add_source``. Samplers with an interval are polled by a thread that
+    only runs while clients are connected, ``refresh`` samples one right
+    away, e.g. from a state transition listener.
+
+    Example:
+        events.add_source("frame", lambda: {"index": animator.index}, 0.1)
+        return flask.Response(events.stream(), mimetype=events.mimetype)
+    """
+
+    mimetype = "text/event-stream"
+
+    def __init__(self, min_interval: float = 0.25, keepalive: float = 15.0) -> None:
+        """Initialize the hub.
+
+        Args:
+            min_interval: Minimum time in seconds between two sends to a client.
+            keepalive: Time in seconds after which an idle client gets a comment
+                line, so proxies and browsers keep the connection open.
+        """
+        self.min_interval = min_interval
+        self.keepalive = keepalive
+        self.stats = EventStats()
+
+        self._condition = Condition()
+        self._values: Dict[str, Tuple[int, Any]] = {}
+        self._version = 0
+        self._sources: Dict[str, _Source] = {}
+        self._poller: Optional[Thread] = None
+
+    def add_source(
+        self, event: str, sampler: Callable[[], Any], interval: Optional[float] = None
+    ) -> None:
+        """Register a function returning the JSON serializable value of an event.
+
+        Args:
+            event: Name of the event.
+            sampler: Function returning the current value.
+            interval: Time in seconds between samples while clients are
+                connected, None to sample only on ``refresh``.
+        """
+        self._sources[event] = _Source(sampler, interval)
+
+    def refresh(self, event: str) -> None:
+        """Sample the source of ``event`` now and publish its value."""
+        source = self._sources.get(event)
+        if source is None:
+            raise KeyError(f"No source for event {event}")
+        try:
+            value = source.sampler()
+        except Exception as e:
+            logger.error(f"Sampling event {event} failed: {e}")
+            return
+        self.publish(event, value)
+
+    def publish(self, event: str, data: Any) -> None:
+        """Set the value of an event, waking up clients if it changed."""
+        with self._condition:
+            current = self._values.get(event)
+            if current is not None and current[1] == data:
+                return
+            self._version += 1
+            self._values[event] = (self._version, data)
+            self.stats.published += 1
+            self._condition.notify_all()
+
+    def stream(self, topics: Optional[Iterable[str]] = None) -> Iterator[str]:
+        """Yield SSE messages for one client, starting with the current values.
+
+        Args:
+            topics: Events the client is interested in, None for all.
+        """
+        topics = set(topics) if topics else None
+        with self._condition:
+            self.stats.clients += 1
+            if self._poller is None and any(
+                source.interval is not None for source in self._sources.values()
+            ):
+                self._poller = Thread(target=self._poll, daemon=True)
+                self._poller.start()
+
+        seen: Dict[str, int] = {}
+        last_sent = 0.0
+        try:
+            # Let EventSource retry quickly after a restart
+            yield "retry: 2000\n\n"
+            while True:
+                wait = last_sent + self.min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+
+                with self._condition:
+                    changes = self._changes(seen, topics)
+                    if not changes:
+                        self._condition.wait(timeout=self.keepalive)
+                        changes = self._changes(seen, topics)
+                    for event, (version, _) in changes.items():
+                        seen[event] = version
+                    if changes:
+                        self.stats.sent += len(changes)
+
+                if not changes:
+                    yield ": keepalive\n\n"
+                    continue
+                last_sent = time.monotonic()
+                yield "".join(
+                    f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                    for event, (_, data) in changes.items()
+                )
+        finally:
+            with self._condition:
+                self.stats.clients -= 1
+
+    def _changes(
+        self, seen: Dict[str, int], topics: Optional[set]
+    ) -> Dict[str, Tuple[int, Any]]:
+        return {
+            event: value
+            for event, value in self._values.items()
+            if (topics is None or event in topics) and seen.get(event) != value[0]
+        }
+
+    def _poll(self) -> None:
+        """Poller thread sampling the sources while clients are connected."""
+        logger.debug("Starting event poller")
+        while True:
+            with self._condition:
+                if self.stats.clients <= 0:
+                    self._poller = None
+                    logger.debug("Stopping event poller, no clients left")
+                    return
+
+            now = time.monotonic()
+            next_sample = now + 1.0
+            for event, source in list(self._sources.items()):
+                if source.interval is None:
+                    continue
+                if source.next_sample <= now:
+                    self.refresh(event)
+                    source.next_sample = max(source.next_sample + source.interval, now)
+                next_sample = min(next_sample, source.next_sample)
+            time.sleep(max(next_sample - time.monotonic(), 0.01))
@@ -1,16 +1,20 @@
 import flask
-import cv2
-import json
 import os
 import sys
 import math
-import shutil
-from datetime import datetime
 from functools import wraps
 from flask import request, Response, send_from_directory
 from werkzeug.utils import secure_filename
 from utils.time_utils import is_store_open, get_default_schedule
+from diorama.keyframes import KEYFRAMES_EXTENSION
 import subprocess
+from dataclasses import asdict
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    # Without flask-sock the sliders fall back to /marionette/set
+    Sock = None
 
 def check_auth(username, password):
     # Replace these with your desired credentials
@@ -38,10 +42,13 @@ def requires_auth(f):
 
 
 webui = flask.Flask(__name__)
+sock = Sock(webui) if Sock is not None else None
 
 BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
 ANIMATIONS_OPEN_PATH = os.path.join(BASE_DIR, "animations", "dances_open")
 ANIMATIONS_CLOSED_PATH = os.path.join(BASE_DIR, "animations", "dances_closed")
+# Editor JSON and the compact binary keyframe format
+ANIMATION_EXTENSIONS = (".json", KEYFRAMES_EXTENSION)
 
 
 def get_animation_path(category):
@@ -52,6 +59,16 @@ def get_animation_path(category):
     return ValueError("Invalid category")
 
 
+def refresh_dances(category):
+    # Let the running dance library pick up the change without a restart
+    state_machine = getattr(webui, "state_machine", None)
+    if state_machine is None:
+        return
+    dances = state_machine.context.animations.get(f"dances_{category}")
+    if dances is not None:
+        dances.library.refresh()
+
+
 @webui.context_processor
 def inject_globals():
     return dict(local_url=webui.config.get("LOCAL_URL"))
@@ -66,8 +83,7 @@ def index():
 @webui.route("/animation")
 @requires_auth
 def animation():
-    with open(webui.config_path) as f:
-        config = json.load(f)
+    config = webui.config_store.get()
     servos = sorted(list(config["gpio"]["servos"].values()), key=lambda x: x["name"])
     gpios = sorted(list(config["gpio"]["gpios"].values()), key=lambda x: x["name"])
     servo_half = math.ceil(len(servos) / 2)
@@ -99,16 +115,25 @@ def manage_animations():
 
         if file.filename == "":
             return flask.redirect(request.url)
-        if file and file.filename.endswith(".json"):
+        if file and file.filename.endswith(ANIMATION_EXTENSIONS):
             filename = secure_filename(file.filename)
             file.save(os.path.join(target_path, filename))
+            refresh_dances(category)
         return flask.redirect(flask.url_for("manage_animations"))
 
     animations_open = sorted(
-        [f for f in os.listdir(ANIMATIONS_OPEN_PATH) if f.endswith(".json")]
+        [
+            f
+            for f in os.listdir(ANIMATIONS_OPEN_PATH)
+            if f.endswith(ANIMATION_EXTENSIONS)
+        ]
     )
     animations_closed = sorted(
-        [f for f in os.listdir(ANIMATIONS_CLOSED_PATH) if f.endswith(".json")]
+        [
+            f
+            for f in os.listdir(ANIMATIONS_CLOSED_PATH)
+            if f.endswith(ANIMATION_EXTENSIONS)
+        ]
     )
 
     return flask.render_template(
@@ -134,6 +159,7 @@ def delete_animation(category, filename):
     file_path = os.path.join(target_path, filename)
     if os.path.exists(file_path):
         os.remove(file_path)
+        refresh_dances(category)
     return flask.redirect(flask.url_for("manage_animations"))
 
 
@@ -155,43 +181,100 @@ def state():  # Changed from settings() to state()
     return flask.render_template("state.html")
 
 
-@webui.route("/get_state")
-@requires_auth
-def get_state():
-    pose_estimator = webui.state_machine.context.pose_estimator
+def opening_status():
+    # Reading through the store also picks up edits made outside the web UI
+    schedule = webui.config_store.get().get("opening_hours", get_default_schedule())
+    return is_store_open(schedule)
 
-    schedule = webui.state_machine.context.config.get(
-        "opening_hours", get_default_schedule()
-    )
-    is_open = is_store_open(schedule)
-
-    target_anim_key = "dances_open" if is_open else "dances_closed"
-    dance_animations = webui.state_machine.context.animations.get(target_anim_key)
 
-    with open("animation-log-2026.log", "r") as f:
-        timestamps = f.read().strip().split("\n")
+def state_summary():
+    """State machine, opening status, show counts and the current dance."""
+    context = webui.state_machine.context
+    show_log = context.show_log
+    is_open = opening_status()
 
-    response = {
+    summary = {
         "state": webui.state_machine.state.value,
         "is_open": "Open" if is_open else "Closed",
-        "presence_time": pose_estimator.presence_time,
-        "wave_time": pose_estimator.wave_time,
-        "pose_x": pose_estimator.pose_x,
-        "n_started": len(timestamps),
+        "n_started": show_log.total if show_log is not None else 0,
+        "n_started_today": show_log.current if show_log is not None else 0,
     }
 
+    target_anim_key = "dances_open" if is_open else "dances_closed"
+    dance_animations = context.animations.get(target_anim_key)
     if dance_animations:
-        response["dance_index"] = dance_animations.index
+        index = dance_animations.index
+        names = dance_animations.dance_names
+        summary["dance_index"] = index
         # Check index bounds
-        if 0 <= dance_animations.index < len(dance_animations.animations):
-            response["current_dance"] = dance_animations.animations[
-                dance_animations.index
-            ].name
+        if 0 <= index < len(names):
+            summary["current_dance"] = names[index]
         else:
-            response["current_dance"] = "Index out of bounds"
+            summary["current_dance"] = "Index out of bounds"
     else:
-        response["dance_index"] = "N/A"
-        response["current_dance"] = "No animation set found"
+        summary["dance_index"] = "N/A"
+        summary["current_dance"] = "No animation set found"
+    return summary
+
+
+def pose_summary(pose_estimator, digits=None):
+    """Presence, wave time and position of the detected pose."""
+    summary = {
+        "presence_time": pose_estimator.presence_time,
+        "wave_time": pose_estimator.wave_time,
+        "pose_x": pose_estimator.pose_x,
+    }
+    if digits is not None:
+        # Rounded values only change, and get pushed, when visibly different
+        summary = {
+            key: None if value is None else round(value, digits)
+            for key, value in summary.items()
+        }
+    return summary
+
+
+def frame_summary():
+    """Frame index of the animation played from the web UI, None if stopped."""
+    animator = webui.marionette_animator
+    if animator.animation is None:
+        return {"current_index": None}
+    return {"current_index": animator.get_current_frame()}
+
+
+@webui.route("/get_state")
+@requires_auth
+def get_state():
+    pose_estimator = webui.state_machine.context.pose_estimator
+
+    response = {
+        **state_summary(),
+        **pose_summary(pose_estimator),
+        "pose_timing": asdict(pose_estimator.timing),
+        "pose_governor": asdict(pose_estimator.governor.stats),
+    }
+
+    scheduler = getattr(webui, "scheduler", None)
+    if scheduler is not None:
+        response["loop"] = scheduler.stats.as_dict()
+
+    streamer = getattr(webui, "streamer", None)
+    if streamer is not None:
+        response["stream"] = asdict(streamer.stats)
+        response["jpeg_cache"] = asdict(streamer.cache.stats)
+
+    events = getattr(webui, "events", None)
+    if events is not None:
+        response["events"] = asdict(events.stats)
+
+    response["dance_library"] = {
+        key: asdict(animation.library.stats)
+        for key, animation in webui.state_machine.context.animations.items()
+        if hasattr(animation, "library")
+    }
+
+    slider_channel = getattr(webui, "slider_channel", None)
+    if slider_channel is not None:
+        response["sliders"] = slider_channel.as_dict()
 
     return flask.jsonify(response)
 
@@ -199,32 +282,51 @@ def get_state():
 @webui.route("/capture_image")
 @requires_auth
 def capture_image():
-    frame = webui.pose_estimator.get_image()
-    ret, buffer = cv2.imencode(".jpg", frame)
-    frame_bytes = buffer.tobytes()
-    return flask.Response(frame_bytes, mimetype="image/jpeg")
+    annotate = request.args.get("annotate", "1") != "0"
+    entry = webui.jpeg_cache.get(annotate=annotate)
+    if entry is None:
+        response = flask.Response(
+            webui.jpeg_cache.placeholder(), mimetype="image/jpeg"
+        )
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    etag, jpeg = entry
+    response = flask.Response(jpeg, mimetype="image/jpeg")
+    response.set_etag(etag)
+    # Browsers have to revalidate, which is answered with 304 until a new frame
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@webui.route("/stream")
+@requires_auth
+def stream():
+    streamer = webui.streamer
+    return flask.Response(streamer.frames(), mimetype=streamer.mimetype)
+
+
+@webui.route("/events")
+@requires_auth
+def events():
+    # Optional comma separated event names, e.g. ?topics=frame
+    topics = request.args.get("topics")
+    topics = topics.split(",") if topics else None
+    response = flask.Response(
+        webui.events.stream(topics), mimetype=webui.events.mimetype
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @webui.route("/gpio_config", methods=["GET", "POST"])
 @requires_auth
 def gpio_config():
     if request.method == "POST":
-        if os.path.exists(webui.config_path):
-            config_dir, config_filename = os.path.split(webui.config_path)
-            name, ext = os.path.splitext(config_filename)
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-            backup_filename = f"{name}_{timestamp}{ext}"
-            backup_path = os.path.join(config_dir, backup_filename)
-            shutil.copy2(webui.config_path, backup_path)
-        with open(webui.config_path, "r") as f:
-            config = json.load(f)
-        config["gpio"] = request.json
-        with open(webui.config_path, "w") as f:
-            json.dump(config, f, indent=4)
+        webui.config_store.update({"gpio": request.json}, backup=True)
         return flask.jsonify({"message": "Configuration saved successfully."})
     else:
-        with open(webui.config_path) as f:
-            config = json.load(f)
+        config = webui.config_store.get()
         return flask.jsonify(config.get("gpio", {}))
 
 
@@ -232,20 +334,10 @@ def gpio_config():
 @requires_auth
 def config_schedule():
     if request.method == "POST":
-        with open(webui.config_path, "r") as f:
-            config = json.load(f)
-
-        config["opening_hours"] = request.json
-
-        with open(webui.config_path, "w") as f:
-            json.dump(config, f, indent=4)
+        webui.config_store.update({"opening_hours": request.json})
         return flask.jsonify({"message": "Schedule saved successfully."})
     else:
-        with open(webui.config_path) as f:
-            config = json.load(f)
-
-        from utils.time_utils import get_default_schedule
-
+        config = webui.config_store.get()
         return flask.jsonify(config.get("opening_hours", get_default_schedule()))
 
 
@@ -279,6 +371,20 @@ def get_image():
     return flask.jsonify({"status": "ok"})
 
 
+if sock is not None:
+
+    @sock.route("/marionette/ws")
+    def marionette_ws(ws):
+        # The handshake is a plain request, so it carries the Basic auth
+        # credentials of the page like /marionette/set
+        auth = request.authorization
+        if not auth or not check_auth(auth.username, auth.password):
+            ws.close(reason=1008, message="Authentication required")
+            return
+        # Partial slider updates, acknowledged once applied
+        webui.slider_channel.serve(ws)
+
+
 @webui.route("/marionette/play", methods=["POST"])
 @requires_auth
 def play():
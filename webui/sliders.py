@@ -0,0 +1,173 @@
+"""WebSocket channel for live servo slider control from the web UI."""
+
+import itertools
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from diorama.animation import WebUIAnimation
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SliderConnectionStats:
+    """Traffic of one slider connection, times in seconds."""
+
+    connected_at: float = 0.0
+    received_messages: int = 0
+    received_values: int = 0
+    coalesced_values: int = 0
+    invalid_messages: int = 0
+    sent_acks: int = 0
+    late_acks: int = 0
+    ack_latency: float = 0.0
+    mean_ack_latency: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the statistics as a JSON serializable dictionary."""
+        stats = asdict(self)
+        duration = max(time.time() - self.connected_at, 1e-6)
+        stats["messages_per_second"] = self.received_messages / duration
+        return stats
+
+
+class SliderChannel:
+    """Applies partial slider updates sent over a WebSocket and acknowledges them.
+
+    Clients send ``{"seq": 1, "values": {"head": 90}}`` with only the sliders
+    that changed. Messages that arrived while the previous one was applied
+    are merged, values are clamped to the servo ranges and handed to the
+    WebUIAnimation, which merges them with updates of other connections
+    until the next orchestrator tick. After that tick the client gets
+    ``{"seq": 1, "applied": {"head": 90.0}}`` with the values that were
+    actually applied, or ``"applied": null`` if no tick happened within
+    ``ack_timeout``.
+
+    Clients should keep only one message in flight and merge further slider
+    moves until its ack arrives, so a slow connection never builds a queue.
+    """
+
+    def __init__(
+        self,
+        animator: WebUIAnimation,
+        clamp: Optional[Callable[[Dict[str, float]], Dict[str, float]]] = None,
+        ack_timeout: float = 0.5,
+        smoothing: float = 0.1,
+    ) -> None:
+        """Initialize the channel.
+
+        Args:
+            animator: Animation receiving the slider values.
+            clamp: Function limiting values to the servo ranges, e.g.
+                ``IoController.clamp``.
+            ack_timeout: Maximum time in seconds to wait for a tick.
+            smoothing: Weight of the newest sample in the running means.
+        """
+        self.animator = animator
+        self.clamp = clamp
+        self.ack_timeout = ack_timeout
+        self.smoothing = smoothing
+
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+        self._connections: Dict[int, SliderConnectionStats] = {}
+
+    def serve(self, ws: Any) -> None:
+        """Handle one WebSocket connection until it is closed.
+
+        Args:
+            ws: Connection with blocking ``receive(timeout)`` and ``send``.
+        """
+        connection_id = next(self._ids)
+        stats = SliderConnectionStats(connected_at=time.time())
+        with self._lock:
+            self._connections[connection_id] = stats
+        logger.info(f"Slider connection {connection_id} opened")
+
+        try:
+            while True:
+                message = ws.receive()
+                if message is None:
+                    continue
+                # Take everything that is already waiting, newest value wins
+                sequence, values = None, {}
+                while message is not None:
+                    stats.received_messages += 1
+                    parsed = self._parse(message)
+                    if parsed is None:
+                        stats.invalid_messages += 1
+                    else:
+                        sequence = parsed[0]
+                        stats.received_values += len(parsed[1])
+                        stats.coalesced_values += len(values.keys() & parsed[1].keys())
+                        values.update(parsed[1])
+                    message = ws.receive(timeout=0)
+
+                if sequence is None:
+                    ws.send(json.dumps({"error": "invalid message"}))
+                    continue
+                ws.send(json.dumps(self._apply(sequence, values, stats)))
+        finally:
+            with self._lock:
+                del self._connections[connection_id]
+            logger.info(
+                f"Slider connection {connection_id} closed: "
+                f"{stats.received_messages} messages, {stats.sent_acks} acks"
+            )
+
+    def _parse(self, message: Any) -> Optional[Tuple[Any, Dict[str, float]]]:
+        """Return the sequence and finite slider values of a message."""
+        try:
+            data = json.loads(message)
+            values = {
+                str(name): float(value) for name, value in data["values"].items()
+            }
+            if not all(math.isfinite(value) for value in values.values()):
+                raise ValueError("Slider values must be finite")
+            return data.get("seq"), values
+        except (TypeError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"Invalid slider message: {e}")
+            return None
+
+    def _apply(
+        self,
+        sequence: Any,
+        values: Dict[str, float],
+        stats: SliderConnectionStats,
+    ) -> Dict[str, Any]:
+        """Submit values, wait for the tick applying them and build the ack."""
+        start = time.monotonic()
+        if self.clamp is not None:
+            values = self.clamp(values)
+        submitted = self.animator.submit_slider_values(values)
+        slider_values = self.animator.wait_applied(submitted, self.ack_timeout)
+
+        latency = time.monotonic() - start
+        stats.sent_acks += 1
+        stats.ack_latency = latency
+        stats.mean_ack_latency += self.smoothing * (latency - stats.mean_ack_latency)
+        if slider_values is None:
+            stats.late_acks += 1
+            return {"seq": sequence, "applied": None}
+        return {
+            "seq": sequence,
+            "applied": {name: slider_values.get(name) for name in values},
+        }
+
+    def as_dict(self) -> Dict[str, List[Dict[str, float]]]:
+        """Return the statistics of the open connections."""
+        with self._lock:
+            return {
+                "connections": [
+                    stats.as_dict() for stats in self._connections.values()
+                ]
+            }
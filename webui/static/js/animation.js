@@ -1,6 +1,7 @@
 // Define variables to hold animation state
 let isPlaying = false;
 let animationInterval = null;
+let frameEvents = null;
 let currentFrameIndex = 0;
 let keyframes = [];
 let timelineCanvas = null;
@@ -34,7 +35,18 @@ async function startAnimation() {
                 throw new Error('Failed to start animation');
             }
 
-            animationInterval = setInterval(animate, 250); // Adjust interval as needed
+            if (window.EventSource) {
+                // The server pushes the frame index whenever it changes
+                frameEvents = new EventSource('/events?topics=frame');
+                frameEvents.addEventListener('frame', (event) => {
+                    const data = JSON.parse(event.data);
+                    if (data.current_index !== null) {
+                        showFrameIndex(data.current_index);
+                    }
+                });
+            } else {
+                animationInterval = setInterval(animate, 250); // Adjust interval as needed
+            }
         } catch (error) {
             console.error('Error starting animation:', error);
         }
@@ -46,6 +58,10 @@ async function stopAnimation() {
     if (isPlaying) {
         isPlaying = false;
         clearInterval(animationInterval);
+        if (frameEvents) {
+            frameEvents.close();
+            frameEvents = null;
+        }
 
         try {
             const response = await fetch('/marionette/pause', {
@@ -71,18 +87,22 @@ async function animate() {
         }
 
         const data = await response.json();
-        currentFrameIndex = data.current_index;
-
-        // Calculate the position of the green marker
-        markerX = (currentFrameIndex / totalFrames) * timelineWidth;
-
-        // Redraw the timeline canvas with the updated marker position
-        drawTimeline();
+        showFrameIndex(data.current_index);
     } catch (error) {
         console.error('Error fetching current index:', error);
     }
 }
 
+function showFrameIndex(index) {
+    currentFrameIndex = index;
+
+    // Calculate the position of the green marker
+    markerX = (currentFrameIndex / totalFrames) * timelineWidth;
+
+    // Redraw the timeline canvas with the updated marker position
+    drawTimeline();
+}
+
 function drawPose() {
     // Find keyframe before and keyframe after
     let keyframeBefore = null;
@@ -8,16 +8,98 @@ const imageName = document.getElementById("imageName");
 const sliders = document.querySelectorAll("input[type='range']");
 const checkboxes = document.querySelectorAll("input[type='checkbox']");
 
+// Live slider channel, the whole form is posted to /marionette/set without it
+const sliderChannel = {
+    socket: null,
+    open: false,
+    everOpened: false,
+    inFlight: false,
+    sequence: 0,
+    sent: {},
+    pending: {},
+};
+
+function connectSliderChannel() {
+    if (!window.WebSocket) {
+        return;
+    }
+    const protocol = location.protocol === "https:" ? "wss:" : "ws:";
+    const socket = new WebSocket(`${protocol}//${location.host}/marionette/ws`);
+
+    socket.addEventListener("open", () => {
+        sliderChannel.open = true;
+        sliderChannel.everOpened = true;
+        sliderChannel.inFlight = false;
+        sliderChannel.sent = {};
+        sliderChannel.pending = {};
+        // Send all sliders once, the server may have restarted
+        handleSliderChange();
+    });
+
+    socket.addEventListener("message", (event) => {
+        const ack = JSON.parse(event.data);
+        if (ack.applied) {
+            showAppliedValues(ack.applied);
+        }
+        sliderChannel.inFlight = false;
+        flushSliderChannel();
+    });
+
+    socket.addEventListener("close", (event) => {
+        sliderChannel.open = false;
+        sliderChannel.socket = null;
+        // Servers without the channel or rejecting the credentials (policy
+        // violation) are not asked again
+        if (sliderChannel.everOpened && event.code !== 1008) {
+            setTimeout(connectSliderChannel, 2000);
+        }
+    });
+
+    sliderChannel.socket = socket;
+}
+
+// Send the changed sliders, one message at a time
+function flushSliderChannel() {
+    const values = sliderChannel.pending;
+    if (sliderChannel.inFlight || Object.keys(values).length === 0) {
+        return;
+    }
+    sliderChannel.pending = {};
+    sliderChannel.inFlight = true;
+    sliderChannel.sequence += 1;
+    sliderChannel.socket.send(JSON.stringify({ seq: sliderChannel.sequence, values: values }));
+}
+
+// Values outside the servo range come back clamped
+function showAppliedValues(applied) {
+    for (const [name, value] of Object.entries(applied)) {
+        if (value === null || name in sliderChannel.pending) {
+            continue;
+        }
+        const slider = document.getElementById(name);
+        if (slider && Number(slider.value) !== value) {
+            slider.value = value;
+            sliderChannel.sent[name] = value;
+        }
+    }
+}
+
 // Function to handle slider change event
 function handleSliderChange() {
     // Get form data
     const formData = new FormData(form);
 
-    for (const pair of formData.entries()) {
-        const [name, value] = pair;
-    }
-
-    if(!isPlaying){
+    if (!isPlaying && sliderChannel.open) {
+        // Only sliders that changed are sent, moves during a pending ack are merged
+        for (const [name, value] of formData.entries()) {
+            const number = Number(value);
+            if (sliderChannel.sent[name] !== number) {
+                sliderChannel.pending[name] = number;
+                sliderChannel.sent[name] = number;
+            }
+        }
+        flushSliderChannel();
+    } else if (!isPlaying) {
         // Send AJAX request
         fetch("/marionette/set", {
             method: "POST",
@@ -39,5 +121,5 @@ checkboxes.forEach(checkbox => {
     checkbox.addEventListener("input", handleSliderChange);
 });
 
-
+connectSliderChannel();
 handleSliderChange()
@@ -0,0 +1,264 @@
+"""Encoding of camera images for snapshots and MJPEG streams."""
+
+import logging
+import secrets
+import time
+from dataclasses import dataclass
+from threading import Condition, Lock, Thread
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BOUNDARY = "frame"
+
+
+@dataclass
+class JpegCacheStats:
+    """Usage of a JpegCache, durations in seconds."""
+
+    hits: int = 0
+    encoded_frames: int = 0
+    encode_duration: float = 0.0
+    mean_encode_duration: float = 0.0
+
+
+@dataclass
+class StreamStats:
+    """Usage of an MjpegStreamer."""
+
+    clients: int = 0
+    sent_frames: int = 0
+    repeated_frames: int = 0
+    failed_frames: int = 0
+
+
+class JpegCache:
+    """Encodes the newest camera image at most once per variant.
+
+    The encoded annotated and raw JPEGs of the newest image id are kept
+    until the pose estimator publishes a new image. Every entry has an ETag
+    that contains a random token of this cache, so tags from before a
+    restart never match restarted image ids.
+    """
+
+    def __init__(
+        self, pose_estimator: Any, quality: int = 80, smoothing: float = 0.1
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            pose_estimator: Estimator providing ``image_id`` and ``get_frame``.
+            quality: JPEG quality in [0, 100].
+            smoothing: Weight of the newest sample in the running means.
+        """
+        self.pose_estimator = pose_estimator
+        self.quality = quality
+        self.smoothing = smoothing
+        self.stats = JpegCacheStats()
+
+        self._token = secrets.token_hex(4)
+        self._lock = Lock()
+        self._image_id: Optional[int] = None
+        self._entries: Dict[bool, Tuple[str, bytes]] = {}
+        self._placeholder: Optional[bytes] = None
+
+    def get(self, annotate: bool = True) -> Optional[Tuple[str, bytes]]:
+        """Return the ETag and JPEG bytes of the newest image.
+
+        Args:
+            annotate: Whether to draw the pose landmarks.
+
+        Returns:
+            Tuple of ETag and JPEG bytes, None if there is no image yet
+        """
+        with self._lock:
+            entry = self._entries.get(annotate)
+            if entry is not None and self._image_id == self.pose_estimator.image_id:
+                self.stats.hits += 1
+                return entry
+
+            frame = self.pose_estimator.get_frame(annotate=annotate)
+            if frame is None:
+                return None
+            image_id, image = frame
+            if image_id != self._image_id:
+                self._image_id = image_id
+                self._entries = {}
+
+            jpeg = self._encode(image)
+            if jpeg is None:
+                return None
+            variant = "annotated" if annotate else "raw"
+            entry = (f"{self._token}-{image_id}-{variant}", jpeg)
+            self._entries[annotate] = entry
+            return entry
+
+    def placeholder(self) -> bytes:
+        """Return a small gray JPEG shown while there is no camera image."""
+        if self._placeholder is None:
+            image = np.full((120, 160, 3), 64, dtype=np.uint8)
+            cv2.putText(
+                image,
+                "No image",
+                (30, 65),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (200, 200, 200),
+                1,
+            )
+            self._placeholder = self._encode(image, record=False) or b""
+        return self._placeholder
+
+    def _encode(self, image: np.ndarray, record: bool = True) -> Optional[bytes]:
+        start = time.monotonic()
+        success, buffer = cv2.imencode(
+            ".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        )
+        if not success:
+            logger.error("Could not encode camera image")
+            return None
+        if record:
+            duration = time.monotonic() - start
+            stats = self.stats
+            stats.encoded_frames += 1
+            stats.encode_duration = duration
+            stats.mean_encode_duration += self.smoothing * (
+                duration - stats.mean_encode_duration
+            )
+        return buffer.tobytes()
+
+
+class MjpegStreamer:
+    """Encodes each new camera image once and fans it out to all clients.
+
+    A producer thread runs only while at least one client is connected. It
+    polls the JpegCache at up to ``max_fps`` and whenever the image changed
+    wakes up all client generators, which send the same JPEG bytes as parts
+    of a ``multipart/x-mixed-replace`` response. While the image does not
+    change, the last frame is sent again every ``keepalive`` seconds, since
+    the server only notices a disconnected client when it writes to it.
+
+    Example:
+        streamer = MjpegStreamer(JpegCache(pose_estimator), max_fps=10)
+        return flask.Response(streamer.frames(), mimetype=streamer.mimetype)
+    """
+
+    mimetype = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+
+    def __init__(
+        self,
+        cache: JpegCache,
+        max_fps: float = 10,
+        annotate: bool = True,
+        keepalive: float = 1.0,
+    ) -> None:
+        """Initialize the streamer.
+
+        Args:
+            cache: Cache providing the encoded camera images.
+            max_fps: Maximum number of frames sent per second.
+            annotate: Whether to draw the pose landmarks.
+            keepalive: Time in seconds without a new image after which the
+                last frame is sent again.
+        """
+        self.cache = cache
+        self.max_fps = max_fps
+        self.annotate = annotate
+        self.keepalive = keepalive
+        self.stats = StreamStats()
+
+        self._condition = Condition()
+        self._producer: Optional[Thread] = None
+        self._jpeg: Optional[bytes] = None
+        self._sequence = 0
+
+    def frames(self) -> Iterator[bytes]:
+        """Yield multipart chunks with the newest frame for one client."""
+        with self._condition:
+            self.stats.clients += 1
+            if self._producer is None:
+                self._producer = Thread(target=self._produce, daemon=True)
+                self._producer.start()
+            # Send the current frame right away instead of waiting for a new one
+            sequence = self._sequence - 1 if self._jpeg is not None else self._sequence
+
+        jpeg: Optional[bytes] = None
+        try:
+            while True:
+                with self._condition:
+                    if self._sequence == sequence:
+                        self._condition.wait(timeout=self.keepalive)
+                    if self._sequence != sequence and self._jpeg is not None:
+                        sequence, jpeg = self._sequence, self._jpeg
+                        self.stats.sent_frames += 1
+                    elif jpeg is not None:
+                        self.stats.repeated_frames += 1
+                if jpeg is None:
+                    # Before the first part bytes are ignored as preamble, but
+                    # writing them still detects a closed connection
+                    yield b"\r\n"
+                    continue
+                yield (
+                    f"--{BOUNDARY}\r\n"
+                    "Content-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n"
+                ).encode("ascii") + jpeg + b"\r\n"
+        finally:
+            with self._condition:
+                self.stats.clients -= 1
+
+    def _produce(self) -> None:
+        """Producer thread encoding new images while clients are connected."""
+        logger.debug("Starting MJPEG producer")
+        try:
+            self._produce_frames()
+        except Exception:
+            logger.error("MJPEG producer crashed", exc_info=True)
+            # Let the next client start a new producer
+            with self._condition:
+                self._producer = None
+                self._jpeg = None
+
+    def _produce_frames(self) -> None:
+        period = 1 / self.max_fps
+        last_tag = None
+        failing = False
+        next_frame = time.monotonic()
+        while True:
+            with self._condition:
+                if self.stats.clients <= 0:
+                    self._producer = None
+                    self._jpeg = None
+                    logger.debug("Stopping MJPEG producer, no clients left")
+                    return
+
+            now = time.monotonic()
+            if now < next_frame:
+                time.sleep(next_frame - now)
+            next_frame = max(next_frame + period, time.monotonic())
+
+            try:
+                entry = self.cache.get(annotate=self.annotate)
+            except Exception:
+                self.stats.failed_frames += 1
+                # Log once per failure streak, the camera may stay broken
+                if not failing:
+                    logger.error("Failed to encode MJPEG frame", exc_info=True)
+                failing = True
+                continue
+            failing = False
+            if entry is None or entry[0] == last_tag:
+                continue
+            last_tag, jpeg = entry
+
+            with self._condition:
+                self._jpeg = jpeg
+                self._sequence += 1
+                self._condition.notify_all()